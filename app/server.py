@@ -16,47 +16,328 @@ in `app.tools`.
 
 from __future__ import annotations
 
+import asyncio
+import importlib
 import logging
+import os
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
 
+import uvicorn
 from dotenv import load_dotenv
-from langchain_aws import ChatBedrockConverse
-from langchain_community.utilities import SQLDatabase
 from mcp.server.fastmcp import FastMCP
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
 
-from .tools import initialize_tools
-from .tools.clickhouse import build_clickhouse_uri
+from .tools import AsyncClickHouseClient, EnginePool, PoolSettings, initialize_tools
+from .tools.analytics import AnalysisPool, analysis_pool_from_env
+from .tools.clickhouse import build_clickhouse_uri, create_database
+from .tools.concurrency import limiter_from_env
+from .tools.metrics import mark_worker_dead, register_snapshot, render_latest
+from .tools.tracing import arm_profiling, profiler, slow_calls
 
 load_dotenv(".env")
 
 
 LOG = logging.getLogger(__name__)
 
+LLM_MODEL_ID = "us.anthropic.claude-3-5-haiku-20241022-v1:0"
+LLM_REGION = "us-east-1"
 
-def run_server(host: str = "0.0.0.0", port: int = 8080) -> None:
-    """Start an MCP server exposing tools via Streamable HTTP.
+
+def _env_flag(key: str, default: bool) -> bool:
+    """Read a boolean environment variable ("1", "true", "yes" and "on" are true)."""
+    value = os.environ.get(key)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _log_level() -> str:
+    """Return uvicorn's log level, following FastMCP's `FASTMCP_LOG_LEVEL` setting."""
+    return os.environ.get("FASTMCP_LOG_LEVEL", "INFO").lower()
+
+
+def lazy_startup_enabled() -> bool:
+    """Read `MCP_LAZY_STARTUP` (default true).
+
+    When enabled, ClickHouse table reflection is deferred until first needed,
+    the LLM and the pandas agent stack are created on the first `analyse_data`
+    call, and pool warmup runs in the background instead of delaying the
+    first request.
+    """
+    return _env_flag("MCP_LAZY_STARTUP", True)
+
+
+@dataclass(frozen=True)
+class WorkerSettings:
+    """Process layout of the server.
+
+    Attributes:
+        workers (int): Server processes sharing the listening port.
+        max_requests (Optional[int]): Requests after which a worker is replaced (multi-worker only).
+        stateless (bool): Serve streamable HTTP without sessions, so any worker can answer any request.
+        shared_dir (Optional[str]): Directory holding the caches and metrics shared by the workers.
+    """
+
+    workers: int = 1
+    max_requests: Optional[int] = None
+    stateless: bool = False
+    shared_dir: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "WorkerSettings":
+        """Create settings from environment variables.
+
+        Reads the following optional environment variables:
+            MCP_WORKERS (default 1)
+            MCP_WORKER_MAX_REQUESTS (default 0, never recycle)
+            MCP_STATELESS_HTTP (default true with more than one worker)
+            MCP_SHARED_DIR (default <tmp>/mcp-tools-shared with more than one worker)
+        """
+        workers = max(1, int(os.environ.get("MCP_WORKERS", "1")))
+        max_requests = int(os.environ.get("MCP_WORKER_MAX_REQUESTS", "0"))
+        shared_dir = os.environ.get("MCP_SHARED_DIR") or None
+        if shared_dir is None and workers > 1:
+            shared_dir = str(Path(tempfile.gettempdir()) / "mcp-tools-shared")
+        return cls(
+            workers=workers,
+            max_requests=max_requests or None,
+            stateless=_env_flag("MCP_STATELESS_HTTP", workers > 1),
+            shared_dir=shared_dir,
+        )
+
+    def shared_env(self) -> Dict[str, str]:
+        """Return the environment that points every worker at the shared caches and metrics."""
+        if self.shared_dir is None:
+            return {}
+        shared = Path(self.shared_dir)
+        return {
+            "SQL_RESULT_CACHE_DIR": str(shared / "sql_results"),
+            "RESULT_STORE_DIR": str(shared / "frames"),
+            "PROMETHEUS_MULTIPROC_DIR": str(shared / "prometheus"),
+        }
+
+
+def create_llm() -> Any:
+    """Create the Bedrock chat model used by `analyse_data`."""
+    from langchain_aws import ChatBedrockConverse
+
+    return ChatBedrockConverse(model_id=LLM_MODEL_ID, region_name=LLM_REGION)
+
+
+async def warmup_pools(pool: EnginePool, async_client: AsyncClickHouseClient) -> None:
+    """Open the configured number of connections in both ClickHouse pools, logging failures."""
+    try:
+        opened = await asyncio.to_thread(pool.warmup)
+        opened_async = await async_client.warmup()
+        LOG.info("Warmed up %d HTTP and %d native ClickHouse connections", opened, opened_async)
+    except Exception as e:
+        LOG.warning("ClickHouse pool warmup failed: %s", e)
+
+
+def attach_pool_lifecycle(
+    app: Starlette,
+    pool: EnginePool,
+    async_client: AsyncClickHouseClient,
+    background_warmup: bool = False,
+    analysis_pool: Optional[AnalysisPool] = None,
+) -> None:
+    """Warm up both ClickHouse pools on startup and health-check them while serving.
+
+    Wraps the app's existing lifespan (FastMCP's session manager) so the
+    pools are ready before the first request (or, with `background_warmup`,
+    filled while the first requests are already served) and closed on
+    shutdown. The `analysis_pool` workers are started (they warm up in
+    their own processes) and stopped alongside.
+    """
+    inner_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        async with inner_lifespan(app):
+            if analysis_pool is not None:
+                analysis_pool.start()
+            tasks = []
+            if pool.settings.warmup:
+                if background_warmup:
+                    tasks.append(asyncio.create_task(warmup_pools(pool, async_client)))
+                else:
+                    await warmup_pools(pool, async_client)
+            tasks += [
+                asyncio.create_task(pool.run_health_checks()),
+                asyncio.create_task(async_client.run_health_checks()),
+            ]
+            try:
+                yield
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await async_client.close()
+                pool.engine.dispose()
+                if analysis_pool is not None:
+                    await asyncio.to_thread(analysis_pool.close)
+
+    app.router.lifespan_context = lifespan
+
+
+def create_app(host: str = "0.0.0.0", port: int = 8080) -> Starlette:
+    """Build the MCP server's ASGI app (one per worker process).
 
     This function:
     - Initializes the local tool registry (no DB by default).
+    - Creates the ClickHouse engine and async client with pool settings
+        from the environment, warms both pools up at startup and health
+        checks them in the background.
+    - Creates an async ClickHouse client so SQL tools run as coroutines,
+        admitted per process by a `FairScheduler` (weighted-fair across
+        accounts) or, with `SQL_TOOL_FAIR_SCHEDULING=false`, a FIFO
+        `ConcurrencyLimiter`.
     - Loads descriptions from `app/tools/descriptions` and monkey-patches
         tool descriptions where a matching file exists.
-    - Starts a FastMCP server using the streamable HTTP transport.
+    - With `MCP_LAZY_STARTUP` (the default), defers table reflection, the
+        LLM and the analytics imports until first use and warms the pools
+        up in the background.
+    - Runs `analyse_data` in an `AnalysisPool` of worker processes unless
+        `ANALYTICS_WORKERS=0`.
+    - Exposes pool statistics at `GET /health` and Prometheus metrics at
+        `GET /metrics`.
+    - With `MCP_PROFILING_ENDPOINT` set (default off), profiles the next
+        `calls` tool calls of the serving process on
+        `POST /debug/profile?calls=N` (`calls=0` disarms).
+    - Serves FastMCP over streamable HTTP, statelessly when configured by
+        `WorkerSettings`.
     """
 
     LOG.info("Creating database and LLM instances")
-    db = SQLDatabase.from_uri(build_clickhouse_uri())
-    llm = ChatBedrockConverse(model_id="us.anthropic.claude-3-5-haiku-20241022-v1:0", region_name="us-east-1")
+    lazy = lazy_startup_enabled()
+    worker_settings = WorkerSettings.from_env()
+    pool_settings = PoolSettings.from_env()
+    db = create_database(build_clickhouse_uri(), pool_settings.engine_args(), lazy=lazy)
+    pool = EnginePool(db._engine, pool_settings)
+    limiter = limiter_from_env()
+    # Size the async pool to the limiter's capacity (light slots included) so
+    # admitted calls never queue a second time waiting for a connection.
+    async_client = AsyncClickHouseClient.from_env(pool_size=limiter.capacity, settings=pool_settings)
+    if lazy:
+        llm, llm_factory = None, create_llm
+    else:
+        importlib.import_module("langchain_experimental.agents")
+        llm, llm_factory = create_llm(), None
+    # Analyses run in pre-warmed worker processes, which create their own LLM.
+    analysis_pool = analysis_pool_from_env(create_llm)
 
     LOG.info("Initializing tools")
     # Provide the created DB and LLM instances so SQL and analytics tools
     # are initialized with the correct dependencies. Enable strict_check so
     # startup validates tool wiring.
-    tools = initialize_tools(db=db, llm=llm)
+    tools = initialize_tools(
+        db=db,
+        llm=llm,
+        async_client=async_client,
+        limiter=limiter,
+        pool=pool,
+        llm_factory=llm_factory,
+        analysis_pool=analysis_pool,
+    )
+
+    LOG.info("Creating MCP server for %s:%d (pid %d)", host, port, os.getpid())
+    mcp = FastMCP(host=host, port=port, tools=tools, stateless_http=worker_settings.stateless)
+
+    @mcp.custom_route("/health", methods=["GET"])
+    async def health(request: Request) -> JSONResponse:
+        pools = {"http": pool.snapshot(), "native": async_client.snapshot()}
+        healthy = all(stats["healthy"] for stats in pools.values())
+        return JSONResponse({"healthy": healthy, "pools": pools}, status_code=200 if healthy else 503)
+
+    register_snapshot("clickhouse_pool", pool.snapshot, pool="http")
+    register_snapshot("clickhouse_pool", async_client.snapshot, pool="native")
+
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def metrics(request: Request) -> Response:
+        body, content_type = render_latest()
+        return Response(body, media_type=content_type)
+
+    register_snapshot("slow_calls", slow_calls.snapshot)
+    register_snapshot("call_profiler", profiler.snapshot)
+
+    if _env_flag("MCP_PROFILING_ENDPOINT", False):
+
+        @mcp.custom_route("/debug/profile", methods=["POST"])
+        async def profile(request: Request) -> JSONResponse:
+            try:
+                calls = int(request.query_params.get("calls", "10"))
+            except ValueError:
+                return JSONResponse({"error": "calls must be an integer"}, status_code=400)
+            armed = arm_profiling(calls)
+            return JSONResponse({"pid": os.getpid(), "armed": armed, "directory": str(profiler.directory)})
+
+    app = mcp.streamable_http_app()
+    attach_pool_lifecycle(app, pool, async_client, background_warmup=lazy, analysis_pool=analysis_pool)
+    return app
+
+
+def prepare_shared_dir(settings: WorkerSettings) -> None:
+    """Create the shared directories, clear stale worker metrics and export them to the workers' environment."""
+    for key, value in settings.shared_env().items():
+        os.environ.setdefault(key, value)
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        Path(metrics_dir).mkdir(parents=True, exist_ok=True)
+
+
+def run_server(host: str = "0.0.0.0", port: int = 8080) -> None:
+    """Start an MCP server exposing tools via Streamable HTTP.
+
+    With `MCP_WORKERS` above one, uvicorn runs that many worker processes
+    (each building its app with `create_app`) behind the same port and
+    replaces a worker after `MCP_WORKER_MAX_REQUESTS` requests or when it
+    dies. The workers serve statelessly and share the SQL result cache,
+    the result store and the Prometheus metrics through `MCP_SHARED_DIR`.
+    """
+    settings = WorkerSettings.from_env()
+    if settings.workers == 1:
+        app = create_app(host, port)
+        LOG.info("Starting Streamable HTTP transport")
+        uvicorn.run(app, host=host, port=port, log_level=_log_level())
+        return
+
+    prepare_shared_dir(settings)
+    LOG.info("Starting %d Streamable HTTP workers sharing %s", settings.workers, settings.shared_dir)
+    uvicorn.run(
+        "app.server:create_worker_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=settings.workers,
+        limit_max_requests=settings.max_requests,
+        log_level=_log_level(),
+    )
+
+
+def create_worker_app() -> Starlette:
+    """uvicorn factory for worker processes; releases the worker's live metrics on shutdown."""
+    logging.basicConfig(level=logging.INFO)
+    app = create_app()
+    inner_lifespan = app.router.lifespan_context
 
-    LOG.info("Starting MCP server on %s:%d", host, port)
-    mcp = FastMCP(host=host, port=port, tools=tools)
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        try:
+            async with inner_lifespan(app):
+                yield
+        finally:
+            mark_worker_dead()
 
-    LOG.info("Starting Streamable HTTP transport")
-    mcp.run(transport="streamable-http")
+    app.router.lifespan_context = lifespan
+    return app
 
 
 def main() -> None:
@@ -1,36 +1,85 @@
-from typing import List
+import logging
+from typing import TYPE_CHECKING, Callable, List, Optional
 
-from langchain_aws.chat_models import ChatBedrockConverse
 from langchain_community.utilities import SQLDatabase
 from langchain_mcp_adapters.tools import to_fastmcp
+from mcp.server.fastmcp.tools import Tool as FastMCPTool
 
-from .analytics import AnalyticsTool
+from .analytics import AnalysisCodeCache, AnalysisPool, AnalyticsTool, DataOperationsTool
+from .budget import DeadlineExceeded, QueryBudget
+from .clickhouse import AsyncClickHouseClient, EnginePool, PoolSettings
+from .concurrency import ConcurrencyLimiter, FairScheduler, ToolBusyError
 from .decorators import tool, use_analytics_tools, use_group, use_sql_tools, use_tools
 from .groups import setup_tool_groups
 from .interfaces import BaseTool, Tool
+from .metrics import instrument_tool, register_snapshot
 from .registry import get_registry
+from .results import ResultStore
+from .singleflight import SingleFlight
 from .sql import SQLTool, SQLToolFactory
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
 
-def initialize_tools(db: SQLDatabase, llm: ChatBedrockConverse) -> List[Tool]:
-    """Initialize and register all tools.
+logger = logging.getLogger(__name__)
 
-    Simplified - no provider pattern, no complex abstractions.
+
+def initialize_tools(
+    db: SQLDatabase,
+    llm: Optional["BaseChatModel"] = None,
+    async_client: Optional[AsyncClickHouseClient] = None,
+    limiter: Optional[ConcurrencyLimiter] = None,
+    store: Optional[ResultStore] = None,
+    pool: Optional[EnginePool] = None,
+    llm_factory: Optional[Callable[[], "BaseChatModel"]] = None,
+    analysis_pool: Optional[AnalysisPool] = None,
+) -> List[FastMCPTool]:
+    """Initialize and register all tools and return them adapted as FastMCP tools.
+
+    Simplified - no provider pattern, no complex abstractions. When an
+    `async_client` is given, SQL tools execute natively on it, bounded by
+    `limiter` (or one built from the environment). SQL and analytics tools
+    share `store` (or one built from the environment) so SQL results can be
+    analysed by `result_id`. Synchronous SQL calls check out connections
+    through `pool` when given, so pool usage is instrumented. Every adapted
+    tool is wrapped with Prometheus instrumentation (see `metrics`). Pass
+    `llm_factory` instead of `llm` to create the LLM on first analysis.
+    With an `analysis_pool`, analyses run in its worker processes instead.
+    Generated analysis code is cached per question and frame structure
+    (`AnalysisCodeCache.from_env`).
     """
+    store = store if store is not None else ResultStore.from_env()
+    register_snapshot("result_store", store.snapshot)
+
     # Create SQL tools
-    sql_factory = SQLToolFactory(db=db)
+    sql_factory = SQLToolFactory(db=db, async_client=async_client, limiter=limiter, store=store, pool=pool)
     sql_tools = sql_factory.create_all_tools()
+    register_snapshot("sql_result_cache", sql_factory.cache.snapshot)
+    register_snapshot("sql_single_flight", sql_factory.flights.snapshot)
+    register_snapshot("campaign_day_cache", sql_factory.day_cache.snapshot)
+    register_snapshot("campaign_catalog", sql_factory.catalog.snapshot)
+    register_snapshot("sql_prefetch", sql_factory.prefetcher.snapshot)
+    if limiter is not None:
+        register_snapshot("sql_tool_slots", limiter.snapshot)
 
     # Create analytics tool directly
-    analytics_tool = AnalyticsTool.create_tool(llm=llm)
-    tools = sql_tools + [analytics_tool]
+    code_cache = AnalysisCodeCache.from_env()
+    analytics_tool = AnalyticsTool.create_tool(
+        llm=llm, store=store, llm_factory=llm_factory, pool=analysis_pool, code_cache=code_cache
+    )
+    if code_cache is not None:
+        register_snapshot("analysis_code_cache", code_cache.snapshot)
+    if analysis_pool is not None:
+        register_snapshot("analysis_pool", analysis_pool.snapshot)
+    operations_tool = DataOperationsTool.create_tool(store=store)
+    tools = sql_tools + [analytics_tool, operations_tool]
 
-    mcp_tools = []
+    mcp_tools: List[FastMCPTool] = []
     for _tool in tools:
         try:
-            mcp_tools.append(to_fastmcp(_tool.get_langchain_tool()))
+            mcp_tools.append(instrument_tool(to_fastmcp(_tool.get_langchain_tool())))
         except Exception as e:
-            print(f"Failed to adapt tool {_tool.name}: {e}")
+            logger.error(f"Failed to adapt tool {_tool.name}: {e}")
 
     return mcp_tools
 
@@ -46,7 +95,20 @@ __all__ = [
     "initialize_tools",
     "BaseTool",
     "Tool",
+    "AsyncClickHouseClient",
+    "EnginePool",
+    "PoolSettings",
+    "ConcurrencyLimiter",
+    "FairScheduler",
+    "ToolBusyError",
+    "QueryBudget",
+    "DeadlineExceeded",
+    "ResultStore",
+    "SingleFlight",
     "AnalyticsTool",
+    "AnalysisPool",
+    "AnalysisCodeCache",
+    "DataOperationsTool",
     "SQLTool",
     "SQLToolFactory",
 ]
@@ -1,3 +1,13 @@
 from .base import AnalyticsTool
+from .codecache import AnalysisCodeCache
+from .operations import DataOperationsTool
+from .pool import AnalysisError, AnalysisPool, analysis_pool_from_env
 
-__all__ = ["AnalyticsTool"]
+__all__ = [
+    "AnalyticsTool",
+    "DataOperationsTool",
+    "AnalysisPool",
+    "AnalysisError",
+    "AnalysisCodeCache",
+    "analysis_pool_from_env",
+]
@@ -1,40 +1,76 @@
 from __future__ import annotations
 
+import asyncio
 import json
-from io import StringIO
+import logging
+import threading
 from pathlib import Path
-from typing import Any, Type
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Type, Union
 
 import pandas as pd
 from langchain.tools import StructuredTool
-from langchain_aws.chat_models import ChatBedrockConverse
-from langchain_experimental.agents import create_pandas_dataframe_agent
 from pydantic import BaseModel
 from typing_extensions import override
 
 from ..interfaces import BaseTool
+from ..results import ResultStore
 from ..schemas import AnalyseDataInput
+from ..tracing import phase
+from .codecache import AnalysisCodeCache, CachedAnalysis, parse_answer, replay
+from .loading import load_csv
+from .pool import AgentRun, AnalysisError, AnalysisPool, run_agent
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+logger = logging.getLogger(__name__)
 
-class AnalyticsTool(BaseTool):
-    """Base class for analytics tools that can be used synchronously or asynchronously."""
 
-    def __init__(self, name: str, description: str, args_schema: Type[BaseModel], llm: ChatBedrockConverse):
+class AnalyticsTool(BaseTool):
+    """Base class for analytics tools that can be used synchronously or asynchronously.
+
+    The LLM may be given directly or as `llm_factory`, which is called on the
+    first analysis; the pandas agent stack (`langchain_experimental`) is
+    imported then too, so neither slows down server start. With an
+    `AnalysisPool`, analyses run out of process in its workers instead.
+    With an `AnalysisCodeCache`, repeated questions replay the agent's code.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        args_schema: Type[BaseModel],
+        llm: Optional[BaseChatModel] = None,
+        store: Optional[ResultStore] = None,
+        llm_factory: Optional[Callable[[], BaseChatModel]] = None,
+        pool: Optional[AnalysisPool] = None,
+        code_cache: Optional[AnalysisCodeCache] = None,
+    ):
         super().__init__(name=name, description=description, args_schema=args_schema)
 
         self.llm = llm
+        self.llm_factory = llm_factory
+        self.store = store
+        self.pool = pool
+        self.code_cache = code_cache
+        self._llm_lock = threading.Lock()
         self._lc_tool = StructuredTool.from_function(
-            name=name, description=description, func=self.invoke, args_schema=args_schema
+            name=name, description=description, func=self.invoke, coroutine=self.ainvoke, args_schema=args_schema
         )
 
     @classmethod
     def create_tool(
         cls,
-        llm: ChatBedrockConverse,
+        llm: Optional[BaseChatModel] = None,
+        store: Optional[ResultStore] = None,
+        llm_factory: Optional[Callable[[], BaseChatModel]] = None,
+        pool: Optional[AnalysisPool] = None,
+        code_cache: Optional[AnalysisCodeCache] = None,
     ) -> AnalyticsTool:
         """Create an AnalyticsTool instance from a description file."""
         name = "analyse_data"
-        desc_file = Path(__file__).parent.parent / "descriptions" / f"{name}.md"
+        desc_file = Path(__file__).parent / "descriptions" / f"{name}.md"
 
         if desc_file.exists():
             description = desc_file.read_text().strip()
@@ -46,6 +82,10 @@ class AnalyticsTool(BaseTool):
             description=description,
             args_schema=AnalyseDataInput,
             llm=llm,
+            store=store,
+            llm_factory=llm_factory,
+            pool=pool,
+            code_cache=code_cache,
         )
 
     @override
@@ -54,23 +94,103 @@ class AnalyticsTool(BaseTool):
 
         Accepts the same keyword-args signature as BaseTool.invoke and extracts
         `query` and `df_data` from the provided arguments or from the args_schema model.
+        When a `result_id` is given, the typed DataFrame stored by a data
+        retrieval tool is used directly instead of parsing `df_data`. With a
+        `pool`, the agent runs in one of its worker processes. Questions
+        answered before for a frame of the same structure replay the cached
+        code from `code_cache` instead of calling the LLM. Each stage is
+        timed as a `tracing.phase` of the call.
         """
+        with phase("prepare"):
+            prepared = self._prepare(kwargs)
+        if isinstance(prepared, dict):
+            return prepared
+        query, structured_query, df = prepared
+
+        key, entry = self._cached_code(query, df)
+        if entry is not None:
+            try:
+                if self.pool is not None:
+                    output = self.pool.replay(entry.code, df)
+                else:
+                    with phase("replay"):
+                        output = replay(entry.code, df)
+                return self._replayed(entry, output)
+            except Exception as e:
+                self._replay_failed(key, e)
+
+        if self.pool is not None:
+            try:
+                return self._finish(key, self.pool.run(structured_query, df))
+            except AnalysisError as e:
+                return self._failure(e)
+
+        try:
+            llm = self._get_llm()
+        except Exception as e:
+            return {"error": f"Error creating the LLM: {str(e)}"}
+        if llm is None:
+            return {"error": "No LLM provided. Please initialise AnalyticsTool with an LLM to use this tool."}
+
+        try:
+            with phase("agent"):
+                run = run_agent(llm, structured_query, df)
+            return self._finish(key, run)
+        except Exception as agent_error:
+            return self._failure(agent_error)
+
+    @override
+    async def ainvoke(self, **kwargs: Any) -> Any:
+        """Execute data analysis, awaiting the pool's worker instead of holding a thread for the whole analysis."""
+        if self.pool is None:
+            return await super().ainvoke(**kwargs)
+
+        with phase("prepare"):
+            prepared = await asyncio.to_thread(self._prepare, kwargs)
+        if isinstance(prepared, dict):
+            return prepared
+        query, structured_query, df = prepared
+
+        key, entry = self._cached_code(query, df)
+        if entry is not None:
+            try:
+                return self._replayed(entry, await self.pool.areplay(entry.code, df))
+            except AnalysisError as e:
+                self._replay_failed(key, e)
+
+        try:
+            return self._finish(key, await self.pool.arun(structured_query, df))
+        except AnalysisError as e:
+            return self._failure(e)
+
+    def _prepare(self, kwargs: Dict[str, Any]) -> Union[Dict[str, Any], Tuple[str, str, pd.DataFrame]]:
+        """Return the question, the agent prompt and the DataFrame to analyse, or the error result to return."""
         try:
             args = self.args_schema(**kwargs)
             query = getattr(args, "query", kwargs.get("query", ""))
             df_data = getattr(args, "df_data", kwargs.get("df_data", ""))
+            result_id = getattr(args, "result_id", None)
         except Exception:
-            query = kwargs.get("query", "")
-            df_data = kwargs.get("df_data", "")
             return {"error": "No data provided. Please pass DataFrame as CSV using df.to_csv(index=False)."}
 
-        if self.llm is None:
-            return {"error": "No LLM provided. Please initialise AnalyticsTool with an LLM to use this tool."}
-
         try:
-            df = pd.read_csv(StringIO(df_data))
+            if result_id:
+                df = self.store.get(result_id) if self.store is not None else None
+                if df is None:
+                    return {
+                        "error": f"Unknown or expired result_id '{result_id}'. Re-run the data retrieval tool "
+                        "to get a fresh result_id."
+                    }
+            else:
+                df = load_csv(df_data)
+        except pd.errors.EmptyDataError:
+            return {"error": "Error: The provided data appears to be empty or invalid CSV format."}
+        except pd.errors.ParserError as parse_error:
+            return {"error": f"Error parsing CSV data: {str(parse_error)}"}
+        except Exception as e:
+            return {"error": f"Error analysing data: {str(e)}"}
 
-            structured_query = f"""
+        structured_query = f"""
             {query}
 
             IMPORTANT:
@@ -82,35 +202,50 @@ class AnalyticsTool(BaseTool):
             - Return the sums as JSON or a structured dictionary only.
             - Do NOT print or generate separate narrative numbers.
             """
-
-            agent = create_pandas_dataframe_agent(
-                llm=self.llm,
-                df=df,
-                verbose=False,
-                allow_dangerous_code=True,
-                return_intermediate_steps=False,
-            )
-
-            try:
-                result = agent.invoke({"input": structured_query})
-                output = result.get("output", str(result))
-                try:
-                    parsed = json.loads(output)
-                    return {"result": parsed}
-                except Exception:
-                    return {"result": output}
-
-            except Exception as agent_error:
-                return {
-                    "error": f"Analysis failed: {str(agent_error)}. Try simplifying your query or check data format."
-                }
-
-        except pd.errors.EmptyDataError:
-            return {"error": "Error: The provided data appears to be empty or invalid CSV format."}
-        except pd.errors.ParserError as parse_error:
-            return {"error": f"Error parsing CSV data: {str(parse_error)}"}
-        except Exception as e:
-            return {"error": f"Error analysing data: {str(e)}"}
+        return query, structured_query, df
+
+    def _cached_code(self, query: str, df: pd.DataFrame) -> Tuple[Optional[str], Optional[CachedAnalysis]]:
+        """Return the code cache key of a call and the cached code answering it, if any."""
+        if self.code_cache is None:
+            return None, None
+        key = self.code_cache.key(query, df)
+        return key, self.code_cache.get(key)
+
+    def _replayed(self, entry: CachedAnalysis, output: str) -> Dict[str, Any]:
+        assert self.code_cache is not None
+        self.code_cache.replayed(entry)
+        return {"result": parse_answer(output)}
+
+    def _replay_failed(self, key: Optional[str], error: Exception) -> None:
+        logger.info("Cached analysis code failed (%s); falling back to the agent", error)
+        if self.code_cache is not None and key is not None:
+            self.code_cache.failed(key)
+
+    def _finish(self, key: Optional[str], run: AgentRun) -> Dict[str, Any]:
+        """Cache the code of a finished agent run when it is replayable and return its result."""
+        if self.code_cache is not None and key is not None and run.code is not None:
+            self.code_cache.put(key, CachedAnalysis(run.code, run.llm_calls))
+        return self._result(run.output)
+
+    @staticmethod
+    def _result(output: str) -> Dict[str, Any]:
+        """Return the agent's output, decoded when it is JSON."""
+        try:
+            return {"result": json.loads(output)}
+        except Exception:
+            return {"result": output}
+
+    @staticmethod
+    def _failure(error: Exception) -> Dict[str, Any]:
+        return {"error": f"Analysis failed: {str(error)}. Try simplifying your query or check data format."}
+
+    def _get_llm(self) -> Optional[BaseChatModel]:
+        """Return the LLM, creating it with `llm_factory` on first use."""
+        if self.llm is None and self.llm_factory is not None:
+            with self._llm_lock:
+                if self.llm is None:
+                    self.llm = self.llm_factory()
+        return self.llm
 
     @override
     def get_langchain_tool(self) -> StructuredTool:
@@ -0,0 +1,198 @@
+"""Cache of the pandas code behind `analyse_data` answers.
+
+The pandas agent answers a question in several LLM round trips, each
+running a snippet in its Python tool. When the final answer is exactly the
+output of the last snippet, the snippets are cached under the normalized
+question and the DataFrame's column/dtype signature. A later call asking
+the same question of a frame with the same structure replays the snippets
+against its own data (no LLM call); if a snippet fails on the new data the
+entry is dropped and the call falls back to the agent.
+"""
+from __future__ import annotations
+
+import ast
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# The agent's Python tool; its inputs are the generated code.
+PYTHON_TOOL = "python_repl_ast"
+
+_ERROR_OBSERVATION = re.compile(r"^\w*(Error|Exception)\b.*:", re.DOTALL)
+_CODE_PREFIX = re.compile(r"^(\s|`)*(?i:python)?\s*")
+_CODE_SUFFIX = re.compile(r"(\s|`)*$")
+
+
+@dataclass(frozen=True)
+class CachedAnalysis:
+    """Generated code that answers a question, and the LLM calls it took the agent to write.
+
+    Attributes:
+        code (Tuple[str, ...]): Snippets run in order against `df`; the last one's output is the answer.
+        llm_calls (int): LLM calls of the agent run that produced the code.
+    """
+
+    code: Tuple[str, ...]
+    llm_calls: int
+
+
+def normalize_query(query: str) -> str:
+    """Return a question with case, whitespace and trailing punctuation normalized."""
+    return " ".join(query.casefold().split()).rstrip(" ?.!")
+
+
+def frame_signature(df: pd.DataFrame) -> List[Tuple[str, str]]:
+    """Return the column names and dtypes a replay depends on."""
+    return [(str(column), str(dtype)) for column, dtype in df.dtypes.items()]
+
+
+def sanitize_code(code: str) -> str:
+    """Strip the backticks and `python` prefix the agent wraps its tool input in."""
+    return _CODE_SUFFIX.sub("", _CODE_PREFIX.sub("", code))
+
+
+def parse_answer(text: str) -> Any:
+    """Return an answer decoded as JSON or a Python literal, or the stripped text when it is neither."""
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return text
+
+
+def replayable_code(output: str, steps: Sequence[Tuple[Any, Any]]) -> Optional[Tuple[str, ...]]:
+    """Return the code of an agent run when its final answer is the output of its last snippet.
+
+    `steps` are the agent's intermediate `(action, observation)` pairs;
+    snippets that raised are left out.
+    """
+    code: List[str] = []
+    observation: Any = None
+    for action, result in steps:
+        if getattr(action, "tool", None) != PYTHON_TOOL:
+            return None
+        tool_input = action.tool_input
+        if isinstance(tool_input, dict):
+            tool_input = tool_input.get("query", "")
+        if isinstance(result, str) and _ERROR_OBSERVATION.match(result.strip()):
+            continue
+        code.append(sanitize_code(str(tool_input)))
+        observation = result
+    if not code or observation is None:
+        return None
+    if parse_answer(output) != parse_answer(str(observation)):
+        return None
+    return tuple(code)
+
+
+def replay(code: Sequence[str], df: pd.DataFrame) -> str:
+    """Run cached snippets against `df` as the agent's Python tool does and return the last one's output.
+
+    Every snippet's final expression is evaluated and its value is the
+    output; otherwise the output is what the snippet printed.
+
+    Raises:
+        Exception: Whatever the code raises on this data.
+    """
+    namespace: Dict[str, Any] = {"df": df, "pd": pd}
+    output = ""
+    for snippet in code:
+        tree = ast.parse(snippet)
+        buffer = io.StringIO()
+        with redirect_stdout(buffer):
+            exec(compile(ast.Module(tree.body[:-1], type_ignores=[]), "<analysis>", "exec"), namespace)
+            value = None
+            last = tree.body[-1:] if tree.body else []
+            if last and isinstance(last[0], ast.Expr):
+                value = eval(compile(ast.Expression(last[0].value), "<analysis>", "eval"), namespace)
+            elif last:
+                exec(compile(ast.Module(last, type_ignores=[]), "<analysis>", "exec"), namespace)
+        output = buffer.getvalue() if value is None else str(value)
+    return output
+
+
+class AnalysisCodeCache:
+    """LRU of `CachedAnalysis` entries keyed by normalized question and frame signature.
+
+    Attributes:
+        max_entries (int): Most entries kept.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedAnalysis] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._replay_failures = 0
+        self._llm_calls_saved = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional[AnalysisCodeCache]:
+        """Create a cache from `ANALYTICS_CODE_CACHE_SIZE` (default 1024), or None when it is 0."""
+        max_entries = int(os.environ.get("ANALYTICS_CODE_CACHE_SIZE", "1024"))
+        return cls(max_entries) if max_entries > 0 else None
+
+    @staticmethod
+    def key(query: str, df: pd.DataFrame) -> str:
+        """Return the cache key of a question asked of a frame."""
+        normalized = json.dumps([normalize_query(query), frame_signature(df)], separators=(",", ":"))
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAnalysis]:
+        """Return the entry for `key`, if any."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedAnalysis) -> None:
+        """Store an entry, evicting the least recently used past `max_entries`."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._stores += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def replayed(self, entry: CachedAnalysis) -> None:
+        """Count a call answered by replaying `entry`."""
+        with self._lock:
+            self._hits += 1
+            self._llm_calls_saved += entry.llm_calls
+
+    def failed(self, key: str) -> None:
+        """Drop an entry whose replay failed."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._replay_failures += 1
+            self._misses += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the entry count, hits, misses, stores, failed replays and LLM calls saved."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "stores": self._stores,
+                "replay_failures": self._replay_failures,
+                "llm_calls_saved": self._llm_calls_saved,
+            }
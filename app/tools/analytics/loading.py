@@ -0,0 +1,95 @@
+"""Schema-driven CSV loading for analytics tools.
+
+CSV passed to analytics tools is usually the output of one of the SQL
+tools, whose column types are known from `CAMPAIGN_TOOL_CONFIGS`. Parsing
+with those types up front (via the pyarrow CSV reader) avoids pandas'
+object-dtype inference, parses dates once, stores string columns such as
+`event` and `campaign_name` as categoricals and downcasts integers to the
+smallest type that holds them.
+"""
+from __future__ import annotations
+
+import csv
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from ..sql.config import CAMPAIGN_TOOL_CONFIGS
+from ..sql.encoding import column_kind
+
+_ARROW_TYPES: Dict[str, pa.DataType] = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "bool": pa.bool_(),
+    "date": pa.timestamp("ns"),
+    "datetime": pa.timestamp("ns"),
+    "string": pa.dictionary(pa.int32(), pa.string()),
+}
+
+
+def _read_header(data: bytes) -> List[str]:
+    """Return the column names from the first line of a CSV payload."""
+    end = data.find(b"\n")
+    first_line = (data if end < 0 else data[:end]).decode("utf-8").rstrip("\r")
+    return next(csv.reader([first_line]), [])
+
+
+def schema_for_columns(columns: List[str]) -> Optional[List[Dict[str, str]]]:
+    """Return the configured output schema that best covers `columns`, if any covers them at all."""
+    best, best_overlap = None, 0
+    for config in CAMPAIGN_TOOL_CONFIGS:
+        if not config.output_schema:
+            continue
+        overlap = len({item["column"] for item in config.output_schema} & set(columns))
+        if overlap > best_overlap:
+            best, best_overlap = config.output_schema, overlap
+    return best
+
+
+def _downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast integer columns to the smallest lossless integer type."""
+    for column in df.columns:
+        if pd.api.types.is_integer_dtype(df[column].dtype):
+            df[column] = pd.to_numeric(df[column], downcast="integer")
+    return df
+
+
+def load_csv(df_data: str, output_schema: Optional[List[Dict[str, str]]] = None) -> pd.DataFrame:
+    """Parse CSV text into a compact, typed DataFrame.
+
+    Column types come from `output_schema`, or from the configured SQL tool
+    schema matching the CSV header. Columns the schema does not know are
+    inferred by pyarrow, with low-cardinality strings dictionary-encoded.
+    If the data does not fit the schema (e.g. hand-edited values), parsing
+    is retried with inference only.
+
+    Raises:
+        pd.errors.EmptyDataError: If `df_data` holds no CSV.
+        pd.errors.ParserError: If the CSV cannot be parsed.
+    """
+    if not df_data.strip():
+        raise pd.errors.EmptyDataError("No columns to parse from CSV data")
+
+    data = df_data.encode("utf-8")
+    schema = output_schema or schema_for_columns(_read_header(data))
+    column_types = {item["column"]: _ARROW_TYPES[column_kind(item["type"])] for item in schema or []}
+
+    table = None
+    for types in (column_types, {}):
+        try:
+            table = pa_csv.read_csv(
+                pa.py_buffer(data),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=types, auto_dict_encode=True, strings_can_be_null=True
+                ),
+            )
+            break
+        except pa.ArrowInvalid as e:
+            if not types:
+                raise pd.errors.ParserError(str(e)) from e
+
+    assert table is not None
+    df = table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get, self_destruct=True)
+    return _downcast(df)
@@ -0,0 +1,231 @@
+"""Declarative, LLM-free analytics over stored SQL results.
+
+`DataOperationsTool` answers the common aggregate questions (filter,
+group by with date bucketing, aggregate, derive ratios, sort, top-N)
+from a JSON spec, executed as vectorized pandas operations on a frame
+from the `ResultStore`. Column references are validated against the
+producing tool's `output_schema` (or the frame's own dtypes for tools
+without one) before anything runs.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type
+
+import numpy as np
+import pandas as pd
+from langchain.tools import StructuredTool
+from pydantic import BaseModel
+from typing_extensions import override
+
+from ..interfaces import BaseTool
+from ..results import ResultStore
+from ..schemas import AggregationSpec, DataOperationsInput, FilterSpec, GroupBySpec
+from ..sql.config import CONFIG_MAP
+from ..sql.encoding import column_kind
+
+_BUCKET_FREQS = {"day": "D", "week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+_NUMERIC_FUNCS = {"sum", "mean", "median"}
+_NUMERIC_KINDS = {"int", "float", "bool"}
+_DATE_KINDS = {"date", "datetime"}
+
+
+def column_kinds(df: pd.DataFrame) -> Dict[str, str]:
+    """Return the value kind of every column a spec may reference.
+
+    Frames produced by a SQL tool with an `output_schema` are described by
+    that schema; otherwise kinds are inferred from the frame's dtypes.
+    """
+    config = CONFIG_MAP.get(df.attrs.get("source_tool", ""))
+    if config is not None and config.output_schema:
+        return {item["column"]: column_kind(item["type"]) for item in config.output_schema if item["column"] in df}
+    return {str(column): column_kind(str(dtype)) for column, dtype in df.dtypes.items()}
+
+
+def _aggregation_name(agg: AggregationSpec) -> str:
+    """Return the output column name of an aggregation."""
+    return agg.alias or f"{agg.column}_{agg.func}"
+
+
+def _group_name(group: GroupBySpec) -> str:
+    """Return the output column name of a group key."""
+    return group.alias or group.column
+
+
+def _require(column: str, available: Any, context: str) -> None:
+    """Raise ValueError if `column` is not one of `available`."""
+    if column not in available:
+        raise ValueError(f"Unknown column '{column}' in {context}. Available: {sorted(available)}")
+
+
+def validate_spec(spec: DataOperationsInput, kinds: Dict[str, str]) -> List[str]:
+    """Validate every column reference in `spec` and return the output column names.
+
+    Raises:
+        ValueError: If a column is unknown or used with an incompatible operation.
+    """
+    for item in spec.filters:
+        _require(item.column, kinds, "filters")
+        if item.op in ("in", "not_in", "between") and not isinstance(item.value, list):
+            raise ValueError(f"Filter '{item.op}' on '{item.column}' needs a list value")
+        if item.op == "between" and len(item.value) != 2:
+            raise ValueError(f"Filter 'between' on '{item.column}' needs a [low, high] pair")
+
+    for group in spec.group_by:
+        _require(group.column, kinds, "group_by")
+        if group.bucket and kinds[group.column] not in _DATE_KINDS:
+            raise ValueError(f"Cannot bucket non-date column '{group.column}' by {group.bucket}")
+
+    for agg in spec.aggregations:
+        _require(agg.column, kinds, "aggregations")
+        if agg.func in _NUMERIC_FUNCS and kinds[agg.column] not in _NUMERIC_KINDS:
+            raise ValueError(f"Cannot {agg.func} non-numeric column '{agg.column}'")
+
+    if spec.group_by or spec.aggregations:
+        outputs = [_group_name(g) for g in spec.group_by] + [_aggregation_name(a) for a in spec.aggregations]
+        if not spec.aggregations:
+            outputs.append("row_count")
+    else:
+        for column in spec.columns or []:
+            _require(column, kinds, "columns")
+        outputs = list(spec.columns or kinds)
+
+    if len(set(outputs)) != len(outputs):
+        raise ValueError(f"Duplicate output columns: {outputs}; set distinct aliases")
+
+    for ratio in spec.ratios:
+        _require(ratio.numerator, outputs if spec.aggregations else kinds, "ratios")
+        _require(ratio.denominator, outputs if spec.aggregations else kinds, "ratios")
+        outputs.append(ratio.name)
+
+    for order in spec.sort:
+        _require(order.column, outputs, "sort")
+    return outputs
+
+
+def _filter_mask(df: pd.DataFrame, filters: List[FilterSpec], kinds: Dict[str, str]) -> pd.Series:
+    """Build one boolean mask for all filters (combined with AND)."""
+    mask = pd.Series(True, index=df.index)
+    for item in filters:
+        column = df[item.column]
+        value = item.value
+        if kinds[item.column] in _DATE_KINDS:
+            column = pd.to_datetime(column, errors="coerce")
+            value = [pd.Timestamp(v) for v in value] if isinstance(value, list) else pd.Timestamp(value)
+
+        if item.op == "==":
+            mask &= column == value
+        elif item.op == "!=":
+            mask &= column != value
+        elif item.op == ">":
+            mask &= column > value
+        elif item.op == ">=":
+            mask &= column >= value
+        elif item.op == "<":
+            mask &= column < value
+        elif item.op == "<=":
+            mask &= column <= value
+        elif item.op == "in":
+            mask &= column.isin(value)
+        elif item.op == "not_in":
+            mask &= ~column.isin(value)
+        elif item.op == "between":
+            mask &= column.between(value[0], value[1])
+        elif item.op == "contains":
+            mask &= column.astype(str).str.contains(str(value), case=False, regex=False)
+    return mask.fillna(False).astype(bool)
+
+
+def _group_key(df: pd.DataFrame, group: GroupBySpec) -> pd.Series:
+    """Return the grouping series, truncated to the bucket's period start when bucketed."""
+    key = df[group.column]
+    if group.bucket:
+        key = pd.to_datetime(key, errors="coerce").dt.to_period(_BUCKET_FREQS[group.bucket]).dt.start_time
+    return key.rename(_group_name(group))
+
+
+def run_operations(df: pd.DataFrame, spec: DataOperationsInput) -> pd.DataFrame:
+    """Validate `spec` against `df` and execute it with vectorized pandas operations."""
+    kinds = column_kinds(df)
+    outputs = validate_spec(spec, kinds)
+
+    frame = df[_filter_mask(df, spec.filters, kinds)] if spec.filters else df
+
+    named = {_aggregation_name(a): (a.column, a.func) for a in spec.aggregations}
+    if spec.group_by:
+        grouped = frame.groupby([_group_key(frame, g) for g in spec.group_by], sort=True)
+        result = grouped.agg(**named) if named else grouped.size().rename("row_count").to_frame()
+        result = result.reset_index()
+    elif named:
+        result = pd.DataFrame({name: [frame[column].agg(func)] for name, (column, func) in named.items()})
+    else:
+        result = frame[list(spec.columns or kinds)].copy()
+
+    for ratio in spec.ratios:
+        numerator = pd.to_numeric(result[ratio.numerator], errors="coerce").astype("float64")
+        denominator = pd.to_numeric(result[ratio.denominator], errors="coerce").astype("float64")
+        result[ratio.name] = numerator / denominator.replace(0, np.nan) * ratio.scale
+
+    if spec.sort:
+        result = result.sort_values(
+            by=[s.column for s in spec.sort], ascending=[not s.descending for s in spec.sort], kind="stable"
+        )
+    if spec.limit is not None:
+        result = result.head(spec.limit)
+    return result[outputs].reset_index(drop=True)
+
+
+class DataOperationsTool(BaseTool):
+    """Run declarative filter/group/aggregate specs over stored results without an LLM."""
+
+    def __init__(self, name: str, description: str, args_schema: Type[BaseModel], store: Optional[ResultStore] = None):
+        super().__init__(name=name, description=description, args_schema=args_schema)
+
+        self.store = store
+        self._lc_tool = StructuredTool.from_function(
+            name=name, description=description, func=self.invoke, coroutine=self.ainvoke, args_schema=args_schema
+        )
+
+    @classmethod
+    def create_tool(cls, store: Optional[ResultStore] = None) -> DataOperationsTool:
+        """Create a DataOperationsTool instance from its description file."""
+        name = "aggregate_data"
+        desc_file = Path(__file__).parent / "descriptions" / f"{name}.md"
+
+        if desc_file.exists():
+            description = desc_file.read_text().strip()
+        else:
+            description = "Filter, group, aggregate and rank a stored result with a declarative spec."
+
+        return cls(name=name, description=description, args_schema=DataOperationsInput, store=store)
+
+    @override
+    def invoke(self, **kwargs: Any) -> Any:
+        """Execute the spec against the stored frame for `result_id`."""
+        try:
+            spec = DataOperationsInput(**kwargs)
+        except Exception as e:
+            return {"error": f"Invalid operations spec: {e}"}
+
+        df = self.store.get(spec.result_id) if self.store is not None else None
+        if df is None:
+            return {
+                "error": f"Unknown or expired result_id '{spec.result_id}'. Re-run the data retrieval tool "
+                "to get a fresh result_id."
+            }
+
+        try:
+            result = run_operations(df, spec)
+        except ValueError as e:
+            return {"error": str(e)}
+        except Exception as e:
+            return {"error": f"Error running operations: {str(e)}"}
+
+        data = json.loads(result.to_json(orient="records", date_format="iso"))
+        return {"result": {"columns": list(result.columns), "data": data, "row_count": len(data)}}
+
+    @override
+    def get_langchain_tool(self) -> StructuredTool:
+        """Return a LangChain compatible tool instance."""
+        return self._lc_tool
@@ -0,0 +1,513 @@
+"""Out-of-process execution of pandas agent analyses.
+
+`analyse_data` runs LLM-generated pandas code. `AnalysisPool` runs each
+analysis in one of a few pre-warmed worker processes (pandas, pyarrow and
+the agent stack already imported, the LLM already created) so that code
+neither holds the server's GIL nor can stall its event loop:
+
+- Each worker has an address-space limit (`RLIMIT_AS`) and, per analysis,
+  a CPU-time limit (`RLIMIT_CPU`); exceeding it kills the worker, not the
+  server.
+- The DataFrame is written once as an Arrow IPC stream into a
+  `SharedMemory` block that the worker maps and reads; no CSV or pickle
+  round trip.
+- An analysis running past `timeout` (or whose caller is cancelled) has its
+  worker killed and replaced; workers are also replaced after `max_tasks`
+  analyses so leaks in generated code do not accumulate.
+
+Code replays for the generated-code cache (`codecache`) run in the same
+workers under the same limits.
+
+Workers are started with the `spawn` method and build the LLM with
+`llm_factory`, which therefore has to be a picklable module-level callable.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import threading
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from ..tracing import phase
+from .codecache import replay, replayable_code
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisError(Exception):
+    """Raised when an analysis fails in its worker process."""
+
+
+class AnalysisTimeout(AnalysisError):
+    """Raised when an analysis (or the wait for a free worker) runs past its timeout."""
+
+
+class AnalysisWorkerError(AnalysisError):
+    """Raised when a worker process dies during an analysis, e.g. on its CPU or memory limit."""
+
+
+def share_frame(df: pd.DataFrame) -> Tuple[SharedMemory, int]:
+    """Write a frame into a new shared memory block as an Arrow IPC stream and return the block and its size."""
+    table = pa.Table.from_pandas(df)
+    sizer = pa.MockOutputStream()
+    with pa.ipc.new_stream(sizer, table.schema) as writer:
+        writer.write_table(table)
+    size = sizer.size()
+    shm = SharedMemory(create=True, size=max(1, size))
+    try:
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)), table.schema) as writer:
+            writer.write_table(table)
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    return shm, size
+
+
+def read_shared_frame(name: str, size: int) -> pd.DataFrame:
+    """Read a frame written by `share_frame` from another process."""
+    shm = _attach(name)
+    try:
+        assert shm.buf is not None, "an attached segment is mapped until closed"
+        view = shm.buf[:size]
+        try:
+            table = pa.ipc.open_stream(pa.py_buffer(view)).read_all()
+            df = table.to_pandas()
+            del table
+        finally:
+            view.release()
+    finally:
+        shm.close()
+    return df
+
+
+def _attach(name: str) -> SharedMemory:
+    """Open a block owned by the parent, leaving its unlinking to the parent.
+
+    Before Python 3.13 the block is registered with the resource tracker,
+    which spawned workers share with the parent, so the parent's unlink
+    still releases it exactly once.
+    """
+    try:
+        return SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        return SharedMemory(name=name)
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class AgentRun(NamedTuple):
+    """Output of a pandas agent run, with its code when a replay reproduces the output (see `codecache`)."""
+
+    output: str
+    code: Optional[Tuple[str, ...]]
+    llm_calls: int
+
+
+def run_agent(llm: BaseChatModel, query: str, df: pd.DataFrame) -> AgentRun:
+    """Run the pandas dataframe agent on `df` and return its output and replayable code."""
+    from langchain_experimental.agents import create_pandas_dataframe_agent
+
+    agent = create_pandas_dataframe_agent(
+        llm=llm,
+        df=df,
+        verbose=False,
+        allow_dangerous_code=True,
+        return_intermediate_steps=True,
+    )
+    result = agent.invoke({"input": query})
+    output = result.get("output", str(result))
+    steps = result.get("intermediate_steps") or []
+    return AgentRun(output, replayable_code(output, steps), len(steps) + 1)
+
+
+def _worker_main(
+    conn: Connection, llm_factory: Callable[[], BaseChatModel], cpu_seconds: float, max_memory: int
+) -> None:
+    """Worker process loop: warm up, then run `(shm_name, size, kind, payload)` tasks until told to stop.
+
+    `agent` tasks run the agent on a question; `replay` tasks replay cached code.
+    """
+    if max_memory:
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+    from langchain_experimental.agents import create_pandas_dataframe_agent  # noqa: F401
+
+    llm: Optional[BaseChatModel] = None
+    try:
+        llm = llm_factory()
+    except Exception as e:
+        logger.warning("Analysis worker could not create the LLM at startup: %s", e)
+    conn.send(("ready", os.getpid()))
+
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        name, size, kind, payload = task
+        if cpu_seconds:
+            soft = math.ceil(_cpu_seconds() + cpu_seconds)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+        try:
+            df = read_shared_frame(name, size)
+            if kind == "replay":
+                conn.send(("ok", replay(payload, df)))
+                continue
+            if llm is None:
+                llm = llm_factory()
+            conn.send(("ok", run_agent(llm, payload, df)))
+        except MemoryError:
+            conn.send(("error", "the analysis ran out of memory"))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _Worker:
+    """One worker process and the parent's end of its pipe."""
+
+    def __init__(self, context: Any, llm_factory: Callable[[], Any], cpu_seconds: float, max_memory: int):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child, llm_factory, cpu_seconds, max_memory),
+            name="analysis-worker",
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.ready = False
+        self.tasks = 0
+
+    def wait_ready(self, timeout: float) -> None:
+        """Wait for the worker to finish warming up.
+
+        Raises:
+            AnalysisTimeout: If it is not ready within `timeout` seconds.
+            AnalysisWorkerError: If it died while warming up.
+        """
+        if self.ready:
+            return
+        if not self.conn.poll(max(0.0, timeout)):
+            raise AnalysisTimeout("The analysis worker did not start in time")
+        try:
+            self.conn.recv()
+        except EOFError:
+            raise AnalysisWorkerError(f"The analysis worker died on startup ({self.exit_reason()})") from None
+        self.ready = True
+
+    def exit_reason(self) -> str:
+        self.process.join(timeout=1)
+        code = self.process.exitcode
+        if code is None:
+            return "still running"
+        if code == -signal.SIGKILL:
+            return "killed, probably over its memory limit"
+        if code == -signal.SIGXCPU:
+            return "killed over its CPU time limit"
+        return f"exit code {code}"
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+
+def analysis_pool_from_env(llm_factory: Callable[[], BaseChatModel]) -> Optional[AnalysisPool]:
+    """Return the `AnalysisPool` configured by the environment, or None when `ANALYTICS_WORKERS=0`."""
+    pool = AnalysisPool.from_env(llm_factory)
+    return pool if pool.size > 0 else None
+
+
+class AnalysisPool:
+    """Pool of pre-warmed, resource-limited processes running pandas agent analyses.
+
+    Attributes:
+        llm_factory (Callable[[], BaseChatModel]): Picklable callable creating the LLM in each worker.
+        size (int): Worker processes kept running.
+        timeout (float): Seconds an analysis may take, waiting for a free worker included.
+        cpu_seconds (float): CPU seconds one analysis may use (`0` unlimited).
+        max_memory (int): Address space of a worker in bytes (`0` unlimited).
+        max_tasks (int): Analyses after which a worker is replaced (`0` never).
+    """
+
+    def __init__(
+        self,
+        llm_factory: Callable[[], BaseChatModel],
+        size: int = 2,
+        timeout: float = 120.0,
+        cpu_seconds: float = 60.0,
+        max_memory: int = 2 * 1024**3,
+        max_tasks: int = 100,
+    ):
+        self.llm_factory = llm_factory
+        self.size = size
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.max_memory = max_memory
+        self.max_tasks = max_tasks
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._started = False
+        self._closed = False
+        self._tasks = 0
+        self._failures = 0
+        self._timeouts = 0
+        self._crashes = 0
+        self._restarts = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, llm_factory: Callable[[], BaseChatModel]) -> AnalysisPool:
+        """Create a pool from environment variables.
+
+        Reads the following optional environment variables:
+            ANALYTICS_WORKERS (default 2; 0 runs analyses in the server process)
+            ANALYTICS_TIMEOUT (seconds, default 120)
+            ANALYTICS_WORKER_CPU_SECONDS (default 60; 0 unlimited)
+            ANALYTICS_WORKER_MAX_MEMORY (bytes, default 2 GiB; 0 unlimited)
+            ANALYTICS_WORKER_MAX_TASKS (default 100; 0 never recycles)
+        """
+        return cls(
+            llm_factory=llm_factory,
+            size=int(os.environ.get("ANALYTICS_WORKERS", "2")),
+            timeout=float(os.environ.get("ANALYTICS_TIMEOUT", "120")),
+            cpu_seconds=float(os.environ.get("ANALYTICS_WORKER_CPU_SECONDS", "60")),
+            max_memory=int(os.environ.get("ANALYTICS_WORKER_MAX_MEMORY", str(2 * 1024**3))),
+            max_tasks=int(os.environ.get("ANALYTICS_WORKER_MAX_TASKS", "100")),
+        )
+
+    def start(self) -> None:
+        """Start the worker processes; they warm up in the background. Idempotent."""
+        with self._lock:
+            if self._started or self._closed:
+                return
+            self._started = True
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+
+    def close(self) -> None:
+        """Stop every worker, killing those still running an analysis."""
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+    def run(self, query: str, df: pd.DataFrame) -> AgentRun:
+        """Run the agent on a question about `df` in a worker.
+
+        Raises:
+            AnalysisTimeout: If no worker is free, or the analysis does not finish, within `timeout`.
+            AnalysisWorkerError: If the worker dies during the analysis.
+            AnalysisError: If the analysis fails in the worker.
+        """
+        return self._run(("agent", query), df)
+
+    def replay(self, code: Tuple[str, ...], df: pd.DataFrame) -> str:
+        """Replay cached analysis code against `df` in a worker and return its output; raises like `run`."""
+        return self._run(("replay", code), df)
+
+    async def arun(self, query: str, df: pd.DataFrame) -> AgentRun:
+        """Async counterpart of `run`; the worker is killed when the calling task is cancelled."""
+        return await self._arun(("agent", query), df)
+
+    async def areplay(self, code: Tuple[str, ...], df: pd.DataFrame) -> str:
+        """Async counterpart of `replay`."""
+        return await self._arun(("replay", code), df)
+
+    def _run(self, task: Tuple[str, Any], df: pd.DataFrame) -> Any:
+        deadline = time.monotonic() + self.timeout
+        worker, shm = self._submit(task, df, deadline)
+        try:
+            with phase("analysis"):
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    raise AnalysisTimeout(f"The analysis did not finish within {self.timeout:g}s")
+                return self._receive(worker)
+        except BaseException as e:
+            self._discard(worker, e)
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def _arun(self, task: Tuple[str, Any], df: pd.DataFrame) -> Any:
+        deadline = time.monotonic() + self.timeout
+        cancelled = threading.Event()
+        submit = asyncio.ensure_future(asyncio.to_thread(self._submit, task, df, deadline, cancelled))
+        try:
+            worker, shm = await asyncio.shield(submit)
+        except asyncio.CancelledError:
+            cancelled.set()
+            submit.add_done_callback(self._abandon)
+            raise
+        try:
+            with phase("analysis"):
+                try:
+                    async with asyncio.timeout(max(0.0, deadline - time.monotonic())):
+                        await _readable(worker.conn)
+                except TimeoutError:
+                    raise AnalysisTimeout(f"The analysis did not finish within {self.timeout:g}s") from None
+                return self._receive(worker)
+        except BaseException as e:
+            self._discard(worker, e)
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return worker counts and analysis, failure, timeout, crash and restart counters."""
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "idle": self._idle.qsize(),
+                "tasks": self._tasks,
+                "failures": self._failures,
+                "timeouts": self._timeouts,
+                "crashes": self._crashes,
+                "restarts": self._restarts,
+            }
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, self.llm_factory, self.cpu_seconds, self.max_memory)
+        self._workers.append(worker)
+        return worker
+
+    def _submit(
+        self, task: Tuple[str, Any], df: pd.DataFrame, deadline: float, cancelled: Optional[threading.Event] = None
+    ) -> Tuple[_Worker, SharedMemory]:
+        """Check out a ready worker, share the frame and send it the task, unless the caller has `cancelled`."""
+        if self._closed:
+            raise AnalysisError("The analysis pool is closed")
+        self.start()
+        with phase("worker_wait"):
+            try:
+                worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                with self._lock:
+                    self._timeouts += 1
+                raise AnalysisTimeout(f"No analysis worker became free within {self.timeout:g}s") from None
+            try:
+                worker.wait_ready(deadline - time.monotonic())
+            except BaseException as e:
+                self._discard(worker, e)
+                raise
+        if cancelled is not None and cancelled.is_set():
+            self._idle.put(worker)
+            raise AnalysisError("The analysis was cancelled")
+        try:
+            with phase("share"):
+                shm, size = share_frame(df)
+        except BaseException:
+            self._idle.put(worker)
+            raise
+        try:
+            worker.conn.send((shm.name, size, *task))
+        except BaseException as e:
+            shm.close()
+            shm.unlink()
+            self._discard(worker, e)
+            raise
+        with self._lock:
+            self._tasks += 1
+        return worker, shm
+
+    def _receive(self, worker: _Worker) -> Any:
+        """Read a finished analysis and return the worker to the pool (or recycle it)."""
+        try:
+            status, value = worker.conn.recv()
+        except EOFError:
+            raise AnalysisWorkerError(f"The analysis worker died ({worker.exit_reason()})") from None
+        worker.tasks += 1
+        if self.max_tasks and worker.tasks >= self.max_tasks:
+            self._replace(worker, stop=True)
+        else:
+            self._idle.put(worker)
+        if status != "ok":
+            with self._lock:
+                self._failures += 1
+            raise AnalysisError(value)
+        return value
+
+    def _abandon(self, submit: asyncio.Future[Tuple[_Worker, SharedMemory]]) -> None:
+        """Kill the worker of a task submitted after its caller was cancelled."""
+        if submit.cancelled() or submit.exception() is not None:
+            return
+        worker, shm = submit.result()
+        shm.close()
+        shm.unlink()
+        self._discard(worker, asyncio.CancelledError())
+
+    def _discard(self, worker: _Worker, error: BaseException) -> None:
+        """Kill a worker whose analysis failed outside the agent and start a replacement."""
+        if isinstance(error, AnalysisError) and not isinstance(error, (AnalysisTimeout, AnalysisWorkerError)):
+            return
+        with self._lock:
+            if isinstance(error, AnalysisTimeout):
+                self._timeouts += 1
+            elif isinstance(error, AnalysisWorkerError):
+                self._crashes += 1
+        logger.warning("Replacing analysis worker %s: %s", worker.process.pid, str(error) or type(error).__name__)
+        self._replace(worker, stop=False)
+
+    def _replace(self, worker: _Worker, stop: bool) -> None:
+        worker.stop() if stop else worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            if self._closed:
+                return
+            self._restarts += 1
+            replacement = self._spawn()
+        self._idle.put(replacement)
+
+
+async def _readable(conn: Connection) -> None:
+    """Wait until a pipe has data (or its other end closed) without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    fd = conn.fileno()
+
+    def wake() -> None:
+        if not ready.done():
+            ready.set_result(None)
+
+    loop.add_reader(fd, wake)
+    try:
+        await ready
+    finally:
+        loop.remove_reader(fd)
@@ -0,0 +1,103 @@
+"""Per-call execution budgets for SQL tools.
+
+A `QueryBudget` bounds one tool call: `timeout` is a deadline measured
+from the start of the call (queueing for a slot included) and the row and
+memory limits cap what ClickHouse may spend on each query. Budgets map to
+ClickHouse settings (`max_execution_time`, `max_rows_to_read`,
+`max_memory_usage`) so the server enforces them even when nobody is left
+waiting; async calls additionally stop streaming at the deadline and kill
+the server-side query.
+
+The deadline of the call in progress lives in a context variable, so
+every query a call runs (pages, day buckets, batch groups) shares it.
+"""
+from __future__ import annotations
+
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterator, Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a tool call runs past its budget's deadline."""
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """Limits applied to one tool call; None (or 0) means unlimited or "use the default".
+
+    Attributes:
+        timeout (Optional[float]): Seconds from the start of the call until its deadline.
+        max_rows_to_read (Optional[int]): Rows ClickHouse may read per query.
+        max_memory_usage (Optional[int]): Bytes of memory ClickHouse may use per query.
+    """
+
+    timeout: Optional[float] = None
+    max_rows_to_read: Optional[int] = None
+    max_memory_usage: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> QueryBudget:
+        """Create the default budget from environment variables.
+
+        Reads the following optional environment variables (`0` is unlimited):
+            SQL_TOOL_TIMEOUT (default 60)
+            SQL_TOOL_MAX_ROWS_TO_READ (default 0)
+            SQL_TOOL_MAX_MEMORY_USAGE (default 0)
+        """
+        return cls(
+            timeout=float(os.environ.get("SQL_TOOL_TIMEOUT", "60")) or None,
+            max_rows_to_read=int(os.environ.get("SQL_TOOL_MAX_ROWS_TO_READ", "0")) or None,
+            max_memory_usage=int(os.environ.get("SQL_TOOL_MAX_MEMORY_USAGE", "0")) or None,
+        )
+
+    def merged(self, defaults: QueryBudget) -> QueryBudget:
+        """Return this budget with unset limits taken from `defaults`."""
+        return QueryBudget(**{f.name: getattr(self, f.name) or getattr(defaults, f.name) for f in fields(QueryBudget)})
+
+    def settings(self, remaining: Optional[float] = None) -> Dict[str, Any]:
+        """Return the ClickHouse settings for a query with `remaining` seconds left until the deadline."""
+        settings: Dict[str, Any] = {}
+        if remaining is not None:
+            settings["max_execution_time"] = max(1, math.ceil(remaining))
+        if self.max_rows_to_read:
+            settings["max_rows_to_read"] = self.max_rows_to_read
+        if self.max_memory_usage:
+            settings["max_memory_usage"] = self.max_memory_usage
+        return settings
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("tool_call_deadline", default=None)
+
+
+@contextmanager
+def call_deadline(timeout: Optional[float]) -> Iterator[None]:
+    """Set the deadline of the call in progress `timeout` seconds from now; an earlier outer deadline wins."""
+    deadline = _deadline.get()
+    if timeout:
+        ours = time.monotonic() + timeout
+        deadline = ours if deadline is None else min(deadline, ours)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Return the seconds left until the current call's deadline, or None without one.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Tool call exceeded its time budget")
+    return left
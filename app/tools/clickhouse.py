@@ -1,4 +1,45 @@
+import asyncio
+import json
+import logging
 import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+import requests
+from asynch import Pool
+from asynch.connection import Connection as AsyncConnection
+from clickhouse_sqlalchemy.drivers.native.base import ClickHouseDialect_native
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Connection, Engine
+
+from .metrics import record_query_summary
+from .tracing import phase, record_query_id
+
+logger = logging.getLogger(__name__)
+
+_REQUIRED_KEYS: List[str] = [
+    "CLICKHOUSE_USER",
+    "CLICKHOUSE_PASSWORD",
+    "CLICKHOUSE_HOST",
+    "CLICKHOUSE_PORT",
+    "CLICKHOUSE_DATABASE",
+]
+
+
+def _read_env(keys: List[str]) -> Dict[str, str]:
+    """Read required environment variables, raising KeyError on the first missing one."""
+    env = {}
+    for key in keys:
+        value = os.environ.get(key)
+        if not value:
+            raise KeyError(f"Missing required environment variable: {key}")
+        env[key] = value
+    return env
 
 
 def build_clickhouse_uri() -> str:
@@ -19,21 +60,466 @@ def build_clickhouse_uri() -> str:
     Raises:
         KeyError: If any required variable is missing.
     """
-    keys = [
-        "CLICKHOUSE_USER",
-        "CLICKHOUSE_PASSWORD",
-        "CLICKHOUSE_HOST",
-        "CLICKHOUSE_PORT",
-        "CLICKHOUSE_DATABASE",
-    ]
-    env = {}
-    for key in keys:
-        value = os.environ.get(key)
-        if not value:
-            raise KeyError(f"Missing required environment variable: {key}")
-        env[key] = value
+    env = _read_env(_REQUIRED_KEYS)
 
     return (
         f"clickhouse://{env['CLICKHOUSE_USER']}:{env['CLICKHOUSE_PASSWORD']}"
         f"@{env['CLICKHOUSE_HOST']}:{env['CLICKHOUSE_PORT']}/{env['CLICKHOUSE_DATABASE']}"
     )
+
+
+def build_clickhouse_native_dsn() -> str:
+    """
+    Build a ClickHouse native-protocol DSN for the async `asynch` driver.
+
+    The native protocol uses CLICKHOUSE_NATIVE_PORT (default 9000) instead
+    of the HTTP CLICKHOUSE_PORT. All other variables match
+    `build_clickhouse_uri`.
+
+    Returns:
+        str: ClickHouse DSN, e.g.,
+             clickhouse://<user>:<password>@<host>:<native_port>/<database>
+
+    Raises:
+        KeyError: If any required variable is missing.
+    """
+    env = _read_env(_REQUIRED_KEYS)
+    native_port = os.environ.get("CLICKHOUSE_NATIVE_PORT", "9000")
+
+    return (
+        f"clickhouse://{env['CLICKHOUSE_USER']}:{env['CLICKHOUSE_PASSWORD']}"
+        f"@{env['CLICKHOUSE_HOST']}:{native_port}/{env['CLICKHOUSE_DATABASE']}"
+    )
+
+
+def _record_summary_header(response: requests.Response, *args: Any, **kwargs: Any) -> None:
+    """Record a ClickHouse HTTP response's query id and the read statistics from its X-ClickHouse-Summary header.
+
+    For streamed responses ClickHouse sends the header before the body, so
+    the figures cover the work done up to that point.
+    """
+    record_query_id(response.headers.get("X-ClickHouse-Query-Id"))
+    header = response.headers.get("X-ClickHouse-Summary")
+    if not header:
+        return
+    try:
+        summary = json.loads(header)
+        elapsed_ns = summary.get("elapsed_ns")
+        record_query_summary(
+            read_rows=int(summary.get("read_rows", 0)),
+            read_bytes=int(summary.get("read_bytes", 0)),
+            elapsed=int(elapsed_ns) / 1e9 if elapsed_ns is not None else None,
+        )
+    except (ValueError, TypeError) as e:
+        logger.debug(f"Ignoring malformed X-ClickHouse-Summary header {header!r}: {e}")
+
+
+def summary_recording_session() -> requests.Session:
+    """Create an HTTP session for the ClickHouse driver that records query summaries."""
+    session = requests.Session()
+    session.hooks["response"].append(_record_summary_header)
+    return session
+
+
+def _env_flag(key: str, default: bool) -> bool:
+    """Read a boolean environment variable ("1", "true", "yes" and "on" are true)."""
+    value = os.environ.get(key)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """Connection pool configuration for ClickHouse engines and clients.
+
+    Attributes:
+        size (int): Connections kept open in the pool (and opened by warmup).
+        max_overflow (int): Extra connections allowed beyond `size` under load.
+        timeout (float): Seconds to wait for a free connection before failing.
+        recycle (int): Seconds after which a connection is replaced; -1 disables recycling.
+        pre_ping (bool): Test connections on checkout and transparently replace dead ones.
+        warmup (bool): Open `size` connections at startup instead of on first use.
+        health_check_interval (float): Seconds between background health checks; 0 disables them.
+    """
+
+    size: int = 10
+    max_overflow: int = 10
+    timeout: float = 30.0
+    recycle: int = 3600
+    pre_ping: bool = True
+    warmup: bool = True
+    health_check_interval: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        """Create settings from environment variables.
+
+        Reads the following optional environment variables:
+            CLICKHOUSE_POOL_SIZE (default 10)
+            CLICKHOUSE_POOL_MAX_OVERFLOW (default 10)
+            CLICKHOUSE_POOL_TIMEOUT (seconds, default 30)
+            CLICKHOUSE_POOL_RECYCLE (seconds, default 3600)
+            CLICKHOUSE_POOL_PRE_PING (default true)
+            CLICKHOUSE_POOL_WARMUP (default true)
+            CLICKHOUSE_HEALTH_CHECK_INTERVAL (seconds, default 30; 0 disables)
+        """
+        return cls(
+            size=int(os.environ.get("CLICKHOUSE_POOL_SIZE", "10")),
+            max_overflow=int(os.environ.get("CLICKHOUSE_POOL_MAX_OVERFLOW", "10")),
+            timeout=float(os.environ.get("CLICKHOUSE_POOL_TIMEOUT", "30")),
+            recycle=int(os.environ.get("CLICKHOUSE_POOL_RECYCLE", "3600")),
+            pre_ping=_env_flag("CLICKHOUSE_POOL_PRE_PING", True),
+            warmup=_env_flag("CLICKHOUSE_POOL_WARMUP", True),
+            health_check_interval=float(os.environ.get("CLICKHOUSE_HEALTH_CHECK_INTERVAL", "30")),
+        )
+
+    def engine_args(self) -> Dict[str, Any]:
+        """Return `create_engine` keyword arguments for these settings."""
+        return {
+            "pool_size": self.size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.timeout,
+            "pool_recycle": self.recycle,
+            "pool_pre_ping": self.pre_ping,
+            # Stream HTTP responses so SQL tools can read large results in chunks,
+            # and give every connection a session that records query summaries.
+            "connect_args": {"stream": True, "http_session": summary_recording_session},
+        }
+
+
+class DeferredSQLDatabase(SQLDatabase):
+    """`SQLDatabase` that reflects table metadata on first use instead of on creation.
+
+    SQL tools only use the engine, so a server built on this database starts
+    without a round trip to ClickHouse; attributes that need reflection
+    (table names, metadata, the inspector) trigger it transparently.
+    """
+
+    def __init__(self, engine: Engine, **kwargs: Any):
+        self._engine = engine
+        self._deferred_kwargs = kwargs
+        self._reflect_lock = threading.Lock()
+        self._reflected = False
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes `SQLDatabase.__init__` has not set yet.
+        if name.startswith("__") or self.__dict__.get("_reflected", True):
+            raise AttributeError(name)
+        with self._reflect_lock:
+            if not self._reflected:
+                SQLDatabase.__init__(self, self._engine, **self._deferred_kwargs)
+                self._reflected = True
+        return getattr(self, name)
+
+
+def create_database(uri: str, engine_args: Dict[str, Any], lazy: bool = True) -> SQLDatabase:
+    """Create the `SQLDatabase` the SQL tools run on, deferring table reflection when `lazy`."""
+    if not lazy:
+        return SQLDatabase.from_uri(uri, engine_args=engine_args)
+    return DeferredSQLDatabase(create_engine(uri, **engine_args))
+
+
+@dataclass
+class PoolStats:
+    """Connection acquisition and health counters shared by sync and async pools."""
+
+    waiters: int = 0
+    waits: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    connects: int = 0
+    invalidations: int = 0
+    health_checks: int = 0
+    health_check_failures: int = 0
+    healthy: bool = True
+    last_health_check: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def wait_started(self) -> float:
+        """Record a caller starting to wait for a connection and return the start time."""
+        with self._lock:
+            self.waiters += 1
+        return time.perf_counter()
+
+    def wait_finished(self, started: float) -> None:
+        """Record a caller that stopped waiting (with or without a connection)."""
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.waiters -= 1
+            self.waits += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def record_health(self, ok: bool) -> None:
+        """Record the outcome of a health check."""
+        with self._lock:
+            self.health_checks += 1
+            self.health_check_failures += 0 if ok else 1
+            self.healthy = ok
+            self.last_health_check = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of the counters."""
+        with self._lock:
+            return {
+                "waiters": self.waiters,
+                "waits": self.waits,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "health_checks": self.health_checks,
+                "health_check_failures": self.health_check_failures,
+                "healthy": self.healthy,
+                "last_health_check": self.last_health_check,
+            }
+
+
+class EnginePool:
+    """Instrumented access to a SQLAlchemy engine's connection pool.
+
+    Wraps connection checkout to count waiters and wait time, listens to
+    pool events for connects and invalidations, and provides warmup and
+    health checks.
+    """
+
+    def __init__(self, engine: Engine, settings: Optional[PoolSettings] = None):
+        self.engine = engine
+        self.settings = settings or PoolSettings()
+        self.stats = PoolStats()
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    @contextmanager
+    def begin(self) -> Iterator[Connection]:
+        """Check out a connection and open a transaction on it, like `Engine.begin`."""
+        started = self.stats.wait_started()
+        try:
+            connection = self.engine.connect()
+        finally:
+            self.stats.wait_finished(started)
+        with connection, connection.begin():
+            yield connection
+
+    def warmup(self) -> int:
+        """Open up to `settings.size` connections and return them to the pool.
+
+        Returns:
+            int: The number of connections opened and verified.
+        """
+        connections = []
+        try:
+            for _ in range(self.settings.size):
+                connection = self.engine.connect()
+                connections.append(connection)
+                connection.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.warning(f"ClickHouse pool warmup stopped after {len(connections)} connections: {e}")
+        finally:
+            for connection in connections:
+                connection.close()
+        return len(connections)
+
+    def check_health(self) -> bool:
+        """Run `SELECT 1` on a pooled connection, discarding the pool if it fails."""
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            ok = True
+        except Exception as e:
+            logger.warning(f"ClickHouse health check failed: {e}")
+            self.engine.dispose()
+            ok = False
+        self.stats.record_health(ok)
+        return ok
+
+    async def run_health_checks(self) -> None:
+        """Run `check_health` every `settings.health_check_interval` seconds until cancelled."""
+        while self.settings.health_check_interval > 0:
+            await asyncio.sleep(self.settings.health_check_interval)
+            await asyncio.to_thread(self.check_health)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return pool occupancy together with the acquisition and health counters."""
+        pool = self.engine.pool
+        occupancy = {
+            "size": self.settings.size,
+            "max_overflow": self.settings.max_overflow,
+            "checked_out": getattr(pool, "checkedout", lambda: 0)(),
+            "idle": getattr(pool, "checkedin", lambda: 0)(),
+        }
+        return {**occupancy, **self.stats.snapshot()}
+
+    def _on_connect(self, dbapi_connection: Any, connection_record: Any) -> None:
+        with self.stats._lock:
+            self.stats.connects += 1
+
+    def _on_invalidate(self, dbapi_connection: Any, connection_record: Any, exception: Any) -> None:
+        with self.stats._lock:
+            self.stats.invalidations += 1
+
+
+def to_pyformat(query: str) -> str:
+    """Compile a SQLAlchemy `text()` query with `:name` binds into `%(name)s` pyformat SQL."""
+    return text(query).compile(dialect=ClickHouseDialect_native()).string
+
+
+class AsyncClickHouseClient:
+    """Async ClickHouse client backed by an `asynch` connection pool.
+
+    The pool is opened lazily on first use (or by `warmup`) so the client
+    can be created before the server's event loop starts.
+    """
+
+    def __init__(self, dsn: str, pool_size: int = 10, min_size: int = 1, health_check_interval: float = 30.0):
+        self._pool = Pool(minsize=min(max(1, min_size), pool_size), maxsize=pool_size, dsn=dsn)
+        self.health_check_interval = health_check_interval
+        self.stats = PoolStats()
+        self._kills: Set[asyncio.Task] = set()
+        self._killed = 0
+
+    @classmethod
+    def from_env(cls, pool_size: int = 10, settings: Optional[PoolSettings] = None) -> "AsyncClickHouseClient":
+        """Create a client for the DSN built by `build_clickhouse_native_dsn`.
+
+        `settings.size` connections are kept open (and opened by `warmup`);
+        the pool grows up to `pool_size`.
+        """
+        settings = settings or PoolSettings.from_env()
+        return cls(
+            dsn=build_clickhouse_native_dsn(),
+            pool_size=pool_size,
+            min_size=settings.size,
+            health_check_interval=settings.health_check_interval,
+        )
+
+    async def execute(self, query: str, params: Dict[str, Any]) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Run a pyformat query and return its column names, column types and rows."""
+        columns: List[str] = []
+        types: Dict[str, str] = {}
+        rows: List[Any] = []
+        async for columns, types, chunk in self.stream(query, params):
+            rows.extend(chunk)
+        return columns, types, rows
+
+    async def stream(
+        self, query: str, params: Dict[str, Any], chunk_size: int = 1000, settings: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[List[str], Dict[str, str], List[Any]]]:
+        """Run a pyformat query, yielding its column names, column types and rows in chunks.
+
+        Rows are streamed from the server block by block, so at most about
+        `chunk_size` rows are held per chunk. At least one (possibly empty)
+        chunk is always yielded so callers learn the result columns.
+
+        The query runs with ClickHouse `settings` under a fresh `query_id`,
+        which is attached to the current call's trace.
+        If the caller is cancelled or stops iterating before the result is
+        drained, the connection is dropped and the query killed on the server.
+        """
+        query_id = str(uuid.uuid4())
+        async with self._connection() as connection:
+            async with connection.cursor() as cursor:
+                started = time.perf_counter()
+                cursor.set_query_id(query_id)
+                cursor.set_settings(dict(settings or {}))
+                cursor.set_stream_results(True, chunk_size)
+                record_query_id(query_id)
+                try:
+                    with phase("execute"):
+                        await cursor.execute(query, params)
+                    description = cursor.description or []
+                    columns = [col.name for col in description]
+                    types = {col.name: col.type_code for col in description}
+
+                    with phase("fetch"):
+                        chunk = await cursor.fetchmany(chunk_size)
+                    yield columns, types, chunk
+                    while len(chunk) == chunk_size:
+                        with phase("fetch"):
+                            chunk = await cursor.fetchmany(chunk_size)
+                        if chunk:
+                            yield columns, types, chunk
+                except (asyncio.CancelledError, GeneratorExit):
+                    await self._abandon(connection, query_id)
+                    raise
+
+                last_query = connection._connection.last_query
+                if last_query is not None:
+                    progress = last_query.progress
+                    record_query_summary(progress.rows, progress.bytes, time.perf_counter() - started)
+
+    async def kill_query(self, query_id: str) -> None:
+        """Kill `query_id` on the server (a no-op once it has finished), logging failures."""
+        try:
+            async with self._connection() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute("KILL QUERY WHERE query_id = %(query_id)s ASYNC", {"query_id": query_id})
+                    await cursor.fetchall()
+            self._killed += 1
+        except Exception as e:
+            logger.warning(f"Failed to kill ClickHouse query {query_id}: {e}")
+
+    async def _abandon(self, connection: AsyncConnection, query_id: str) -> None:
+        """Drop a connection left mid-result and kill its query in the background."""
+        # A half-read connection cannot be reused; closing it makes the pool replace it.
+        await connection.close()
+        task = asyncio.ensure_future(self.kill_query(query_id))
+        self._kills.add(task)
+        task.add_done_callback(self._kills.discard)
+
+    async def warmup(self) -> int:
+        """Open the pool's minimum number of connections and return how many are open."""
+        await self._pool.startup()
+        return self._pool.free_connections
+
+    async def check_health(self) -> bool:
+        """Run `SELECT 1` on a pooled connection."""
+        try:
+            async with self._connection() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute("SELECT 1")
+                    await cursor.fetchall()
+            ok = True
+        except Exception as e:
+            logger.warning(f"ClickHouse async health check failed: {e}")
+            ok = False
+        self.stats.record_health(ok)
+        return ok
+
+    async def run_health_checks(self) -> None:
+        """Run `check_health` every `health_check_interval` seconds until cancelled."""
+        while self.health_check_interval > 0:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check_health()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return pool occupancy together with the acquisition and health counters."""
+        occupancy = {
+            "size": self._pool.minsize,
+            "max_size": self._pool.maxsize,
+            "checked_out": self._pool.acquired_connections if self._pool.opened else 0,
+            "idle": self._pool.free_connections if self._pool.opened else 0,
+        }
+        return {**occupancy, **self.stats.snapshot(), "killed_queries": self._killed}
+
+    async def close(self) -> None:
+        """Close all pooled connections once pending query kills are sent."""
+        if self._kills:
+            await asyncio.gather(*self._kills, return_exceptions=True)
+        await self._pool.shutdown()
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[AsyncConnection]:
+        """Acquire a pooled connection, recording how long the caller waited for it."""
+        await self._pool.startup()
+        started = self.stats.wait_started()
+        acquired = False
+        try:
+            async with self._pool.connection() as connection:
+                acquired = True
+                self.stats.wait_finished(started)
+                yield connection
+        finally:
+            if not acquired:
+                self.stats.wait_finished(started)
@@ -0,0 +1,353 @@
+"""Per-process concurrency limiting for async tool execution.
+
+`ConcurrencyLimiter` bounds how many tool calls may hold a backend resource
+(e.g. a ClickHouse connection) at the same time and how many more may wait
+for one. Calls arriving while the wait queue is full are rejected
+immediately with `ToolBusyError` so the server sheds load instead of
+piling up requests it cannot serve in time.
+
+`FairScheduler` admits calls in weighted-fair order across accounts
+instead of first come, first served: each account's queued calls are
+tagged with a virtual finish time that grows by their cost class, so an
+account issuing many heavy calls cannot crowd out others, and no account
+holds more than `max_per_account` slots. Light calls bypass the queue on
+a pool of their own.
+
+Synchronous executions run in worker threads started with
+`to_thread_admitted`; they take their slot with `blocking_slot`, which
+acquires it through `slot()` on the event loop that started the thread, so
+they queue in the same order and under the same limits as async calls.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from .metrics import record_queue_wait
+
+LIGHT = "light"
+STANDARD = "standard"
+HEAVY = "heavy"
+# Virtual cost of one call per cost class; light calls do not queue.
+COST_CLASSES: Dict[str, float] = {LIGHT: 0.0, STANDARD: 1.0, HEAVY: 4.0}
+
+
+class ToolBusyError(RuntimeError):
+    """Raised when a tool call cannot be admitted by a `ConcurrencyLimiter`."""
+
+
+T = TypeVar("T")
+
+# The event loop that started the current worker thread, set by `to_thread_admitted`.
+_calling_loop: ContextVar[Optional[asyncio.AbstractEventLoop]] = ContextVar("limiter_calling_loop", default=None)
+
+
+async def to_thread_admitted(fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """Run `fn` in a worker thread whose `blocking_slot`s are admitted on the calling event loop."""
+    loop = asyncio.get_running_loop()
+
+    def run() -> T:
+        token = _calling_loop.set(loop)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _calling_loop.reset(token)
+
+    return await asyncio.to_thread(run)
+
+
+class ConcurrencyLimiter:
+    """Bound concurrent async executions with a bounded wait queue.
+
+    Attributes:
+        max_concurrency (int): Maximum number of calls executing at once.
+        max_waiting (int): Maximum number of calls waiting for a free slot.
+        acquire_timeout (Optional[float]): Seconds a call may wait for a slot, or None to wait indefinitely.
+    """
+
+    def __init__(self, max_concurrency: int = 100, max_waiting: int = 500, acquire_timeout: Optional[float] = 30.0):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max(0, max_waiting)
+        self.acquire_timeout = acquire_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+
+    @classmethod
+    def from_env(cls) -> ConcurrencyLimiter:
+        """Create a limiter from environment variables.
+
+        Reads the following optional environment variables:
+            SQL_TOOL_MAX_CONCURRENCY (default 100)
+            SQL_TOOL_MAX_QUEUED (default 500)
+            SQL_TOOL_QUEUE_TIMEOUT (seconds, default 30; 0 disables the timeout)
+        """
+        timeout = float(os.environ.get("SQL_TOOL_QUEUE_TIMEOUT", "30"))
+        return cls(
+            max_concurrency=int(os.environ.get("SQL_TOOL_MAX_CONCURRENCY", "100")),
+            max_waiting=int(os.environ.get("SQL_TOOL_MAX_QUEUED", "500")),
+            acquire_timeout=timeout if timeout > 0 else None,
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently holding a slot."""
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        """Number of calls currently waiting for a slot."""
+        return self._waiting
+
+    @property
+    def capacity(self) -> int:
+        """Most calls that can hold a slot at once (the backend pool size needed)."""
+        return self.max_concurrency
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the calls holding and waiting for a slot."""
+        return {"in_flight": self.in_flight, "waiting": self.waiting}
+
+    @asynccontextmanager
+    async def slot(self, account: Optional[str] = None, cost_class: str = STANDARD) -> AsyncIterator[None]:
+        """Hold one execution slot for the duration of the context.
+
+        `account` and `cost_class` are accepted for interface compatibility
+        with `FairScheduler`; this limiter admits calls in arrival order.
+
+        Raises:
+            ToolBusyError: If the wait queue is full or the slot could not be acquired in time.
+        """
+        # Count calls still acquiring too: a burst arriving in one loop tick has not taken the semaphore yet.
+        if self._in_flight + self._waiting >= self.max_concurrency + self.max_waiting:
+            raise ToolBusyError(f"Too many queued calls ({self._waiting}); try again later")
+
+        self._waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise ToolBusyError(f"No execution slot available within {self.acquire_timeout}s") from None
+        finally:
+            self._waiting -= 1
+            record_queue_wait(time.perf_counter() - started, cost_class)
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+    @contextmanager
+    def blocking_slot(
+        self, account: Optional[str] = None, cost_class: str = STANDARD, timeout: Optional[float] = None
+    ) -> Iterator[None]:
+        """Hold one execution slot from a worker thread started with `to_thread_admitted`.
+
+        The slot is taken with `slot()` on the loop that started the thread,
+        which keeps serving while this thread blocks. Outside such a thread
+        (a script calling a tool synchronously) there is no loop to queue
+        on and nothing is admitted.
+
+        Raises:
+            ToolBusyError: If the wait queue is full or the slot could not be acquired in time.
+            TimeoutError: If no slot was granted within `timeout` seconds.
+        """
+        loop = _calling_loop.get()
+        if loop is None or loop.is_closed():
+            yield
+            return
+
+        granted: concurrent.futures.Future[asyncio.Event] = concurrent.futures.Future()
+
+        async def hold() -> None:
+            release = asyncio.Event()
+            async with self.slot(account, cost_class):
+                granted.set_result(release)
+                await release.wait()
+
+        holder = asyncio.run_coroutine_threadsafe(hold(), loop)
+        pending: List[concurrent.futures.Future[Any]] = [granted, holder]
+        done, _ = concurrent.futures.wait(pending, timeout, concurrent.futures.FIRST_COMPLETED)
+        if granted not in done:
+            holder.cancel()
+            if holder in done:
+                holder.result()
+            raise TimeoutError(f"No execution slot granted within {timeout:g}s")
+        release = granted.result()
+        try:
+            yield
+        finally:
+            loop.call_soon_threadsafe(release.set)
+
+
+@dataclass(order=True)
+class _Waiter:
+    tag: float
+    seq: int
+    account: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class FairScheduler(ConcurrencyLimiter):
+    """Weighted-fair admission across accounts with per-account and queue-depth limits.
+
+    Start-time fair queuing: a queued call's tag is the later of the
+    scheduler's virtual time and its account's previous tag, plus the call's
+    cost; free slots go to the lowest tag whose account is below
+    `max_per_account`. Light calls skip the queue and run on their own
+    `light_concurrency` slots.
+
+    Attributes:
+        max_per_account (int): Most slots one account may hold at once.
+        light_concurrency (int): Slots reserved for light calls.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 100,
+        max_waiting: int = 500,
+        acquire_timeout: Optional[float] = 30.0,
+        max_per_account: int = 8,
+        light_concurrency: int = 20,
+    ):
+        super().__init__(max_concurrency, max_waiting, acquire_timeout)
+        self.max_per_account = max(1, max_per_account)
+        self.light_concurrency = light_concurrency
+        self._light = ConcurrencyLimiter(max(1, light_concurrency), max_waiting, acquire_timeout)
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_tag: Dict[str, float] = {}
+        self._running: Dict[str, int] = {}
+        self._rejected = 0
+
+    @classmethod
+    def from_env(cls) -> FairScheduler:
+        """Create a scheduler from environment variables.
+
+        Reads the `ConcurrencyLimiter` variables plus these optional ones:
+            SQL_TOOL_MAX_PER_ACCOUNT (default 8)
+            SQL_TOOL_LIGHT_CONCURRENCY (default 20)
+        """
+        base = ConcurrencyLimiter.from_env()
+        return cls(
+            max_concurrency=base.max_concurrency,
+            max_waiting=base.max_waiting,
+            acquire_timeout=base.acquire_timeout,
+            max_per_account=int(os.environ.get("SQL_TOOL_MAX_PER_ACCOUNT", "8")),
+            light_concurrency=int(os.environ.get("SQL_TOOL_LIGHT_CONCURRENCY", "20")),
+        )
+
+    @property
+    def waiting(self) -> int:
+        """Number of calls currently queued (light calls included)."""
+        return sum(1 for waiter in self._queue if not waiter.future.done()) + self._light.waiting
+
+    @property
+    def capacity(self) -> int:
+        """Most calls that can hold a slot at once, light slots included."""
+        return self.max_concurrency + self._light.max_concurrency
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return slot usage, queue depth, accounts holding slots and rejected calls."""
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self.waiting,
+            "light_in_flight": self._light.in_flight,
+            "accounts_running": len(self._running),
+            "rejected": self._rejected,
+        }
+
+    @asynccontextmanager
+    async def slot(self, account: Optional[str] = None, cost_class: str = STANDARD) -> AsyncIterator[None]:
+        """Hold one execution slot for `account`, admitted in weighted-fair order.
+
+        Raises:
+            ToolBusyError: If the queue is full or no slot was granted within `acquire_timeout`.
+        """
+        if cost_class == LIGHT:
+            async with self._light.slot(account, cost_class):
+                yield
+            return
+
+        key = account or ""
+        if len(self._queue) >= self.max_waiting and self._in_flight >= self.max_concurrency:
+            self._rejected += 1
+            raise ToolBusyError(f"Too many queued calls ({len(self._queue)}); try again later")
+
+        tag = max(self._virtual_time, self._last_tag.get(key, 0.0)) + COST_CLASSES.get(cost_class, 1.0)
+        self._last_tag[key] = tag
+        waiter = _Waiter(tag, next(self._seq), key, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        self._dispatch()
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.acquire_timeout)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(key)  # granted just as the wait ended
+            else:
+                waiter.future.cancel()
+                self._queue = [w for w in self._queue if w is not waiter]
+                heapq.heapify(self._queue)
+            if isinstance(e, asyncio.TimeoutError):
+                self._rejected += 1
+                raise ToolBusyError(f"No execution slot available within {self.acquire_timeout}s") from None
+            raise
+        finally:
+            record_queue_wait(time.perf_counter() - started, cost_class)
+
+        try:
+            yield
+        finally:
+            self._release(key)
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the lowest-tag waiters whose accounts are below their limit."""
+        skipped: List[_Waiter] = []
+        while self._queue and self._in_flight < self.max_concurrency:
+            waiter = heapq.heappop(self._queue)
+            if waiter.future.done():
+                continue
+            if self._running.get(waiter.account, 0) >= self.max_per_account:
+                skipped.append(waiter)
+                continue
+            self._virtual_time = max(self._virtual_time, waiter.tag - 1e-9)
+            self._in_flight += 1
+            self._running[waiter.account] = self._running.get(waiter.account, 0) + 1
+            waiter.future.set_result(None)
+        for waiter in skipped:
+            heapq.heappush(self._queue, waiter)
+
+    def _release(self, key: str) -> None:
+        self._in_flight -= 1
+        running = self._running.get(key, 0) - 1
+        if running > 0:
+            self._running[key] = running
+        else:
+            self._running.pop(key, None)
+        if not self._running and not self._queue:
+            # Idle: drop per-account history so tags do not grow without bound.
+            self._last_tag.clear()
+            self._virtual_time = 0.0
+        self._dispatch()
+
+
+def limiter_from_env() -> ConcurrencyLimiter:
+    """Create the SQL tools' limiter: a `FairScheduler` unless `SQL_TOOL_FAIR_SCHEDULING` is false."""
+    if os.environ.get("SQL_TOOL_FAIR_SCHEDULING", "true").strip().lower() in ("1", "true", "yes", "on"):
+        return FairScheduler.from_env()
+    return ConcurrencyLimiter.from_env()
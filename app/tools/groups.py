@@ -6,10 +6,16 @@ def setup_tool_groups() -> None:
     registry = get_registry()
 
     # Campaign tools
-    registry.register_group("campaign_tools", ["get_recent_campaigns", "lookup_campaigns", "get_campaign_metrics"])
+    registry.register_group(
+        "campaign_tools",
+        ["get_recent_campaigns", "lookup_campaigns", "get_campaign_metrics", "get_campaign_metrics_timeseries"],
+    )
 
     # Analytics tools
-    registry.register_group("analytics_tools", ["analyse_data"])
+    registry.register_group("analytics_tools", ["analyse_data", "aggregate_data"])
 
     # All SQL tools
-    registry.register_group("sql_tools", ["get_recent_campaigns", "lookup_campaigns", "get_campaign_metrics"])
+    registry.register_group(
+        "sql_tools",
+        ["get_recent_campaigns", "lookup_campaigns", "get_campaign_metrics", "get_campaign_metrics_timeseries"],
+    )
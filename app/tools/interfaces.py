@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Any, Protocol, Type, runtime_checkable
 
@@ -15,13 +16,22 @@ class Tool(Protocol):
         """Synchronous tool execution."""
         ...
 
+    async def ainvoke(self, **kwargs: Any) -> Any:
+        """Asynchronous tool execution."""
+        ...
+
     def get_langchain_tool(self) -> Any:
         """Return a LangChain compatible tool instance."""
         ...
 
 
 class BaseTool(Tool, ABC):
-    """Abstract base class for synchronous tools."""
+    """Abstract base class for tools.
+
+    Subclasses must implement the synchronous `invoke`. The default `ainvoke`
+    runs `invoke` in a worker thread; tools with a native async backend
+    override it so calls do not hold a thread while waiting on I/O.
+    """
 
     def __init__(self, name: str, description: str, args_schema: Type[BaseModel]):
         self.name = name
@@ -33,6 +43,10 @@ class BaseTool(Tool, ABC):
         """Synchronous tool execution."""
         pass
 
+    async def ainvoke(self, **kwargs: Any) -> Any:
+        """Asynchronous tool execution, delegating to `invoke` in a worker thread."""
+        return await asyncio.to_thread(self.invoke, **kwargs)
+
     @abstractmethod
     def get_langchain_tool(self) -> Any:
         """Return a LangChain compatible tool instance."""
@@ -0,0 +1,266 @@
+"""Prometheus metrics for tool calls and ClickHouse queries.
+
+`instrument_tool` wraps any FastMCP tool so every call records its count,
+errors, latency, in-flight gauge and serialized response size. While a
+call runs, the tool (and the ClickHouse clients beneath it) can attach
+call-specific facts through module functions that find the current call
+via a context variable:
+
+- `record_rows` for the number of result rows,
+- `record_error` for failures reported as a result instead of raised,
+- `record_coalesced` for calls that joined an identical in-flight execution,
+- `record_query_summary` for ClickHouse's read_rows/read_bytes/elapsed.
+
+Each call is also traced (`tracing.trace_call`) for its phase breakdown,
+the slow-call log and on-demand profiling.
+
+Point-in-time state owned by other components (pool occupancy, cache
+counters) is exported by registering a snapshot function with
+`register_snapshot`; it is read on every scrape.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from mcp.server.fastmcp.tools import Tool as FastMCPTool
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from .tracing import trace_call
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = CollectorRegistry()
+
+TOOL_CALLS = Counter("mcp_tool_calls_total", "Tool calls started.", ["tool"], registry=REGISTRY)
+TOOL_ERRORS = Counter(
+    "mcp_tool_errors_total", "Tool calls that raised or returned an error.", ["tool"], registry=REGISTRY
+)
+TOOL_IN_FLIGHT = Gauge(
+    "mcp_tool_in_flight", "Tool calls currently executing.", ["tool"], registry=REGISTRY, multiprocess_mode="livesum"
+)
+TOOL_LATENCY = Histogram(
+    "mcp_tool_latency_seconds",
+    "Tool call latency.",
+    ["tool"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+    registry=REGISTRY,
+)
+TOOL_RESULT_ROWS = Histogram(
+    "mcp_tool_result_rows",
+    "Rows returned by tool calls that executed a query.",
+    ["tool"],
+    buckets=(0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000),
+    registry=REGISTRY,
+)
+TOOL_RESPONSE_BYTES = Histogram(
+    "mcp_tool_response_bytes",
+    "Serialized size of tool results.",
+    ["tool"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+    registry=REGISTRY,
+)
+TOOL_COALESCED = Counter(
+    "mcp_tool_coalesced_total",
+    "Tool calls that shared an identical in-flight execution instead of querying.",
+    ["tool"],
+    registry=REGISTRY,
+)
+TOOL_QUEUE_WAIT = Histogram(
+    "mcp_tool_queue_wait_seconds",
+    "Time SQL tool calls waited for an execution slot.",
+    ["tool", "cost_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    registry=REGISTRY,
+)
+CLICKHOUSE_READ_ROWS = Counter(
+    "clickhouse_read_rows_total", "Rows read by ClickHouse for tool queries.", ["tool"], registry=REGISTRY
+)
+CLICKHOUSE_READ_BYTES = Counter(
+    "clickhouse_read_bytes_total", "Bytes read by ClickHouse for tool queries.", ["tool"], registry=REGISTRY
+)
+CLICKHOUSE_ELAPSED = Histogram(
+    "clickhouse_query_elapsed_seconds",
+    "Query time reported by (or measured around) ClickHouse.",
+    ["tool"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+    registry=REGISTRY,
+)
+
+
+@dataclass
+class CallMetrics:
+    """Facts recorded about the tool call in progress."""
+
+    tool: str
+    rows: Optional[int] = None
+    error: bool = False
+
+
+_current_call: ContextVar[Optional[CallMetrics]] = ContextVar("current_tool_call", default=None)
+
+
+def current_tool() -> Optional[str]:
+    """Return the name of the instrumented tool call in progress, if any."""
+    call = _current_call.get()
+    return call.tool if call is not None else None
+
+
+def record_rows(count: int) -> None:
+    """Record the number of rows the current call returns."""
+    call = _current_call.get()
+    if call is not None:
+        call.rows = count
+
+
+def record_error() -> None:
+    """Mark the current call as failed even though it returns normally."""
+    call = _current_call.get()
+    if call is not None:
+        call.error = True
+
+
+def record_coalesced() -> None:
+    """Count the current call as served by another call's in-flight execution."""
+    TOOL_COALESCED.labels(current_tool() or "unknown").inc()
+
+
+def record_queue_wait(seconds: float, cost_class: str) -> None:
+    """Record how long the current call waited for an execution slot."""
+    TOOL_QUEUE_WAIT.labels(current_tool() or "unknown", cost_class).observe(seconds)
+
+
+def record_query_summary(read_rows: int, read_bytes: int, elapsed: Optional[float] = None) -> None:
+    """Record ClickHouse's read statistics for a query run by the current call."""
+    tool = current_tool() or "unknown"
+    CLICKHOUSE_READ_ROWS.labels(tool).inc(read_rows)
+    CLICKHOUSE_READ_BYTES.labels(tool).inc(read_bytes)
+    if elapsed is not None:
+        CLICKHOUSE_ELAPSED.labels(tool).observe(elapsed)
+
+
+def _response_bytes(result: Any) -> int:
+    """Return the serialized size of a tool result."""
+    if isinstance(result, str):
+        return len(result) if result.isascii() else len(result.encode("utf-8"))
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return len(str(result))
+
+
+def _is_error(result: Any) -> bool:
+    """Return whether a result is an `{"error": ...}` payload."""
+    return isinstance(result, dict) and "error" in result
+
+
+def instrument_tool(tool: FastMCPTool) -> FastMCPTool:
+    """Wrap a FastMCP tool's function so each call is measured and traced."""
+    name = tool.name
+    fn = tool.fn
+
+    @wraps(fn)
+    async def instrumented(**arguments: Any) -> Any:
+        call = CallMetrics(tool=name)
+        token = _current_call.set(call)
+        TOOL_CALLS.labels(name).inc()
+        TOOL_IN_FLIGHT.labels(name).inc()
+        started = time.perf_counter()
+        try:
+            with trace_call(name, arguments):
+                result = await fn(**arguments)
+        except Exception:
+            TOOL_ERRORS.labels(name).inc()
+            raise
+        finally:
+            TOOL_LATENCY.labels(name).observe(time.perf_counter() - started)
+            TOOL_IN_FLIGHT.labels(name).dec()
+            _current_call.reset(token)
+
+        if call.error or _is_error(result):
+            TOOL_ERRORS.labels(name).inc()
+        if call.rows is not None:
+            TOOL_RESULT_ROWS.labels(name).observe(call.rows)
+        TOOL_RESPONSE_BYTES.labels(name).observe(_response_bytes(result))
+        return result
+
+    tool.fn = instrumented
+    return tool
+
+
+class _SnapshotCollector(Collector):
+    """Expose numeric values of registered snapshot functions as gauges."""
+
+    def __init__(self) -> None:
+        self._sources: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Callable[[], Dict[str, Any]]] = {}
+
+    def register(self, prefix: str, snapshot: Callable[[], Dict[str, Any]], labels: Dict[str, str]) -> None:
+        self._sources[(prefix, tuple(sorted(labels.items())))] = snapshot
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        families: Dict[str, GaugeMetricFamily] = {}
+        for (prefix, labels), snapshot in list(self._sources.items()):
+            try:
+                values = snapshot()
+            except Exception as e:
+                logger.warning(f"Metrics snapshot {prefix} failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                if name not in families:
+                    families[name] = GaugeMetricFamily(name, f"{prefix} {key}", labels=[k for k, _ in labels])
+                families[name].add_metric([v for _, v in labels], value)
+        yield from families.values()
+
+
+_snapshots = _SnapshotCollector()
+REGISTRY.register(_snapshots)
+
+
+def register_snapshot(prefix: str, snapshot: Callable[[], Dict[str, Any]], **labels: str) -> None:
+    """Export the numeric fields of `snapshot()` as `<prefix>_<field>` gauges on every scrape.
+
+    Registering the same prefix and labels again replaces the earlier source.
+    """
+    _snapshots.register(prefix, snapshot, labels)
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Return the current metrics in the Prometheus text format with its content type.
+
+    With `PROMETHEUS_MULTIPROC_DIR` set (multi-worker serving), counters and
+    histograms are aggregated over all workers; snapshot gauges describe the
+    worker that serves the scrape.
+    """
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_snapshots)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    """Drop this worker's live gauges from the multi-worker aggregation (call on worker shutdown)."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,42 @@
+"""MCP progress notifications for long-running tool calls.
+
+Tools run inside the MCP server's request handler, so the current request
+context (and any progress token the client sent with the call) is available
+through `request_ctx`. Outside a request, or when the client did not ask
+for progress, reporting is a no-op.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Optional, Union
+
+from mcp.server.lowlevel.server import request_ctx
+
+logger = logging.getLogger(__name__)
+
+
+def progress_token() -> Optional[Union[str, int]]:
+    """Return the progress token of the current MCP request, if the client sent one."""
+    try:
+        ctx = request_ctx.get()
+    except LookupError:
+        return None
+    return ctx.meta.progressToken if ctx.meta is not None else None
+
+
+async def report_progress(progress: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+    """Send a progress notification for the current MCP request.
+
+    Failures are logged and swallowed: progress is advisory and must never
+    fail the tool call itself.
+    """
+    token = progress_token()
+    if token is None:
+        return
+    ctx = request_ctx.get()
+    try:
+        await ctx.session.send_progress_notification(
+            token, progress, total=total, message=message, related_request_id=str(ctx.request_id)
+        )
+    except Exception as e:
+        logger.warning(f"Failed to send progress notification: {e}")
@@ -0,0 +1,213 @@
+"""Server-side store of tool results as typed DataFrames.
+
+Data retrieval tools put their result frames here and hand the client a
+short `result_id`; analysis tools look the frame up by id instead of
+having the LLM re-serialize rows into CSV. The store is an in-memory LRU
+bounded by the frames' deep memory usage, so handles expire under memory
+pressure and callers must be ready to re-run the retrieval.
+
+With a `disk_dir`, frames are also written there as Arrow IPC files, so
+every worker process sharing the directory can resolve any `result_id`.
+Only ids of the form `SQLTool` generates (`res_` and 16 hex digits) are
+looked up there; any other id is simply not found.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+_ATTRS_KEY = b"mcp_frame_attrs"
+# Result ids that may name a file in the disk tier.
+RESULT_ID = re.compile(r"^res_[0-9a-f]{16}$")
+# Seconds between scans of the disk tier for files other workers wrote.
+DISK_SCAN_INTERVAL = 60.0
+
+
+class ResultStore:
+    """Memory-bounded LRU of DataFrames keyed by result id, optionally backed by a shared directory.
+
+    Attributes:
+        max_bytes (int): Upper bound on the total memory usage of stored frames.
+        disk_dir (Optional[Path]): Directory of the on-disk tier shared between worker processes.
+        disk_max_bytes (int): Upper bound on the size of the on-disk tier.
+    """
+
+    def __init__(
+        self, max_bytes: int = 256 * 1024 * 1024, disk_dir: Optional[str] = None, disk_max_bytes: int = 1024**3
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._frames: OrderedDict[str, Tuple[pd.DataFrame, int]] = OrderedDict()
+        self._size = 0
+        self._evictions = 0
+        self._disk_hits = 0
+        # Disk tier size at the last scan plus what this process wrote since; None until the first scan.
+        self._disk_bytes: Optional[int] = None
+        self._disk_scanned = 0.0
+        self._lock = threading.Lock()
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            logger.info("Result store disk tier at %s", self.disk_dir)
+
+    @classmethod
+    def from_env(cls) -> ResultStore:
+        """Create a store from environment variables.
+
+        Reads the following optional environment variables:
+            RESULT_STORE_MAX_BYTES (default 256 MiB)
+            RESULT_STORE_DIR (enables the shared on-disk tier when set)
+            RESULT_STORE_DISK_MAX_BYTES (default 1 GiB)
+        """
+        return cls(
+            max_bytes=int(os.environ.get("RESULT_STORE_MAX_BYTES", str(256 * 1024 * 1024))),
+            disk_dir=os.environ.get("RESULT_STORE_DIR") or None,
+            disk_max_bytes=int(os.environ.get("RESULT_STORE_DISK_MAX_BYTES", str(1024**3))),
+        )
+
+    def put(self, result_id: str, df: pd.DataFrame) -> bool:
+        """Store a frame under `result_id`, evicting least recently used frames past `max_bytes`.
+
+        Returns:
+            bool: False if the frame alone exceeds `max_bytes` and was not stored.
+        """
+        if not self._put_memory(result_id, df):
+            return False
+        if self.disk_dir is not None:
+            try:
+                self._put_disk(result_id, df)
+            except (OSError, pa.ArrowException, TypeError, ValueError) as e:
+                logger.warning("Could not write result %s to the disk tier: %s", result_id, e)
+        return True
+
+    def get(self, result_id: str) -> Optional[pd.DataFrame]:
+        """Return the stored frame (loading it from the disk tier if another worker stored it), or None."""
+        with self._lock:
+            entry = self._frames.get(result_id)
+            if entry is not None:
+                self._frames.move_to_end(result_id)
+                return entry[0]
+        df = self._get_disk(result_id)
+        if df is not None:
+            self._put_memory(result_id, df)
+        return df
+
+    def __contains__(self, result_id: str) -> bool:
+        with self._lock:
+            if result_id in self._frames:
+                return True
+        path = self._path(result_id)
+        return path is not None and path.exists()
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the number of stored frames, their total size, the eviction count and disk-tier hits."""
+        with self._lock:
+            return {
+                "entries": len(self._frames),
+                "bytes": self._size,
+                "evictions": self._evictions,
+                "disk_hits": self._disk_hits,
+            }
+
+    def _put_memory(self, result_id: str, df: pd.DataFrame) -> bool:
+        """Insert into the LRU, evicting least recently used frames past `max_bytes`."""
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if result_id in self._frames:
+                self._remove(result_id)
+            if size > self.max_bytes:
+                return False
+            self._frames[result_id] = (df, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._frames)))
+                self._evictions += 1
+        return True
+
+    def _path(self, result_id: str) -> Optional[Path]:
+        """Return the disk tier file of a result, or None without a disk tier or for an id it cannot hold."""
+        if self.disk_dir is None or not RESULT_ID.match(result_id):
+            return None
+        return self.disk_dir / f"{result_id}.arrow"
+
+    def _put_disk(self, result_id: str, df: pd.DataFrame) -> None:
+        """Write a frame (with its `attrs`) atomically, then trim the disk tier when it may be past `disk_max_bytes`.
+
+        The tier's size is tracked from this process's writes and rescanned
+        every `DISK_SCAN_INTERVAL` seconds to account for other workers.
+        """
+        path = self._path(result_id)
+        if path is None:
+            raise ValueError(f"Invalid result id {result_id!r}")
+        table = pa.Table.from_pandas(df)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _ATTRS_KEY: json.dumps(df.attrs)})
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+
+        written = path.stat().st_size
+        now = time.monotonic()
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += written
+                if self._disk_bytes <= self.disk_max_bytes and now - self._disk_scanned < DISK_SCAN_INTERVAL:
+                    return
+            self._disk_scanned = now
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Scan the disk tier and delete the least recently used files past `disk_max_bytes`."""
+        assert self.disk_dir is not None
+        files = []
+        for candidate in self.disk_dir.glob("*.arrow"):
+            try:
+                stat = candidate.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, candidate))
+        total = sum(size for _, size, _ in files)
+        for _, size, candidate in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            candidate.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+    def _get_disk(self, result_id: str) -> Optional[pd.DataFrame]:
+        """Load a frame written by any worker, or return None when there is none."""
+        path = self._path(result_id)
+        if path is None:
+            return None
+        try:
+            with pa.OSFile(str(path), "rb") as source:
+                table = pa.ipc.open_file(source).read_all()
+            os.utime(path, (time.time(), time.time()))
+        except FileNotFoundError:
+            return None
+        except (OSError, pa.ArrowException) as e:
+            logger.warning("Could not read result %s from the disk tier: %s", result_id, e)
+            return None
+        df = table.to_pandas()
+        df.attrs.update(json.loads((table.schema.metadata or {}).get(_ATTRS_KEY, b"{}")))
+        with self._lock:
+            self._disk_hits += 1
+        return df
+
+    def _remove(self, result_id: str) -> None:
+        """Drop a frame and release its bytes."""
+        _, size = self._frames.pop(result_id)
+        self._size -= size
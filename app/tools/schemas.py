@@ -1,32 +1,179 @@
-from typing import List, Optional
+from typing import Any, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
-class CampaignRecentParams(BaseModel):  # type: ignore[misc]
+class ResultFormatArgs(BaseModel):  # type: ignore[misc]
+    output_format: Optional[Literal["rows", "columnar", "arrow", "handle"]] = Field(
+        default=None,
+        description=(
+            "Result encoding: 'rows' (list of row objects), 'columnar' (typed arrays per column), "
+            "'arrow' (base64 Arrow IPC stream) or 'handle' (no rows, only a result_id for analyse_data). "
+            "Defaults to the tool's configured format."
+        ),
+    )
+    page_size: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=10000,
+        description=(
+            "Maximum rows to return; defaults to the tool's page size. "
+            "When more rows remain the result includes a next_cursor."
+        ),
+    )
+    cursor: Optional[str] = Field(
+        default=None, description="Opaque next_cursor from a previous result to fetch the following page."
+    )
+
+
+class WhereSpec(BaseModel):  # type: ignore[misc]
+    column: str
+    op: Literal["==", "!=", ">", ">=", "<", "<=", "in", "not_in", "between"]
+    value: Any = Field(description="Comparison value; a list for 'in'/'not_in', a [low, high] pair for 'between'")
+
+    @model_validator(mode="after")
+    def _value_matches_op(self) -> "WhereSpec":
+        if self.op in ("in", "not_in") and not (isinstance(self.value, list) and self.value):
+            raise ValueError(f"'{self.op}' needs a non-empty list value")
+        if self.op == "between" and not (isinstance(self.value, list) and len(self.value) == 2):
+            raise ValueError("'between' needs a [low, high] pair")
+        if self.op not in ("in", "not_in", "between") and isinstance(self.value, (list, dict)):
+            raise ValueError(f"'{self.op}' needs a single value")
+        return self
+
+
+class SortSpec(BaseModel):  # type: ignore[misc]
+    column: str
+    descending: bool = Field(default=True)
+
+
+class ResultShapeArgs(BaseModel):  # type: ignore[misc]
+    fields: Optional[List[str]] = Field(
+        default=None, description="Columns to return, in order; defaults to all columns of the tool's output"
+    )
+    where: List[WhereSpec] = Field(default_factory=list, description="Row filters on output columns, combined with AND")
+    order_by: List[SortSpec] = Field(default_factory=list, description="Sort keys on output columns; nulls sort last")
+    limit: Optional[int] = Field(default=None, ge=1, le=10000, description="Return only the first N rows (top-N)")
+
+
+class CampaignRecentParams(ResultFormatArgs):  # type: ignore[misc]
     account_id: str
     num_campaigns: int = Field(default=10)
 
 
-class CampaignLookupParams(BaseModel):  # type: ignore[misc]
+class CampaignLookupParams(ResultFormatArgs):  # type: ignore[misc]
     account_id: str
     campaign_names: Optional[List[str]] = Field(default=None)
     campaign_ids: Optional[List[str]] = Field(default=None)
+    match: Literal["exact", "case_insensitive", "prefix", "fuzzy"] = Field(
+        default="exact", description="How campaign_names are compared with campaign names"
+    )
+
 
+def _sorted_campaign_ids(value: Optional[List[str]]) -> Optional[List[str]]:
+    """Order campaign ids, so calls naming the same campaigns share a fingerprint, cache key and prefetch."""
+    return sorted(value) if value is not None else None
 
-class KPIQueryArgs(BaseModel):  # type: ignore[misc]
+
+class KPIQueryArgs(ResultShapeArgs, ResultFormatArgs):  # type: ignore[misc]
+    account_id: str
+    campaign_id: Optional[List[str]] = ["ALL"]
+    start_date: str = Field(default="1970-01-01")
+    end_date: str = Field(default="2027-01-01")
+
+    _sort_campaign_ids = field_validator("campaign_id")(_sorted_campaign_ids)
+
+
+class KPITimeseriesArgs(ResultShapeArgs, ResultFormatArgs):  # type: ignore[misc]
     account_id: str
     campaign_id: Optional[List[str]] = ["ALL"]
     start_date: str = Field(default="1970-01-01")
     end_date: str = Field(default="2027-01-01")
+    bucket: Literal["day", "week", "month"] = Field(default="week", description="Width of one series point")
+    per_campaign: bool = Field(default=False, description="One series per campaign instead of one for all of them")
+    max_points: int = Field(
+        default=100,
+        ge=1,
+        le=1000,
+        description="Most points per series; adjacent buckets are merged (bucket_size > 1) to stay within it",
+    )
 
+    _sort_campaign_ids = field_validator("campaign_id")(_sorted_campaign_ids)
 
-class AggregateKPIQueryArgs(BaseModel):  # type: ignore[misc]
+
+class AggregateKPIQueryArgs(ResultShapeArgs, ResultFormatArgs):  # type: ignore[misc]
     account_id: str
     start_date: str = Field(default="1970-01-01")
     end_date: str = Field(default="2027-01-01")
 
 
+class AccountDateRange(BaseModel):  # type: ignore[misc]
+    account_id: str
+    start_date: str = Field(default="1970-01-01")
+    end_date: str = Field(default="2027-01-01")
+
+
+class BatchAggregateKPIQueryArgs(ResultShapeArgs, ResultFormatArgs):  # type: ignore[misc]
+    account_ids: List[str] = Field(
+        default_factory=list, max_length=1000, description="Accounts sharing start_date/end_date"
+    )
+    start_date: str = Field(default="1970-01-01")
+    end_date: str = Field(default="2027-01-01")
+    ranges: List[AccountDateRange] = Field(
+        default_factory=list, max_length=1000, description="Accounts with their own date range"
+    )
+
+    @model_validator(mode="after")
+    def _unique_accounts(self) -> "BatchAggregateKPIQueryArgs":
+        accounts = self.account_ids + [r.account_id for r in self.ranges]
+        if not accounts:
+            raise ValueError("Pass at least one account in account_ids or ranges")
+        if len(set(accounts)) != len(accounts):
+            raise ValueError("Each account may appear only once across account_ids and ranges")
+        return self
+
+
 class AnalyseDataInput(BaseModel):  # type: ignore[misc]
     query: str = Field(description="Natural language question about the data")
     df_data: str = Field(default="", description="DataFrame data as CSV string")
+    result_id: Optional[str] = Field(
+        default=None, description="result_id returned by a data retrieval tool; used instead of df_data"
+    )
+
+
+class FilterSpec(BaseModel):  # type: ignore[misc]
+    column: str
+    op: Literal["==", "!=", ">", ">=", "<", "<=", "in", "not_in", "between", "contains"]
+    value: Any = Field(description="Comparison value; a list for 'in'/'not_in', a [low, high] pair for 'between'")
+
+
+class GroupBySpec(BaseModel):  # type: ignore[misc]
+    column: str
+    bucket: Optional[Literal["day", "week", "month", "quarter", "year"]] = Field(
+        default=None, description="Truncate a date column to this period before grouping"
+    )
+    alias: Optional[str] = Field(default=None, description="Output column name; defaults to the column")
+
+
+class AggregationSpec(BaseModel):  # type: ignore[misc]
+    column: str
+    func: Literal["sum", "mean", "median", "min", "max", "count", "nunique"]
+    alias: Optional[str] = Field(default=None, description="Output column name; defaults to '<column>_<func>'")
+
+
+class RatioSpec(BaseModel):  # type: ignore[misc]
+    name: str
+    numerator: str = Field(description="Aggregated (or, without aggregations, source) column")
+    denominator: str = Field(description="Aggregated (or, without aggregations, source) column; zero yields null")
+    scale: float = Field(default=1.0, description="Multiplier, e.g. 100 for percentages")
+
+
+class DataOperationsInput(BaseModel):  # type: ignore[misc]
+    result_id: str = Field(description="result_id returned by a data retrieval tool")
+    filters: List[FilterSpec] = Field(default_factory=list, description="Row filters, combined with AND")
+    group_by: List[GroupBySpec] = Field(default_factory=list)
+    aggregations: List[AggregationSpec] = Field(default_factory=list)
+    ratios: List[RatioSpec] = Field(default_factory=list, description="Derived columns computed after aggregation")
+    columns: Optional[List[str]] = Field(default=None, description="Columns to return when not aggregating")
+    sort: List[SortSpec] = Field(default_factory=list)
+    limit: Optional[int] = Field(default=None, ge=1, le=10000, description="Return only the first N rows (top-N)")
@@ -0,0 +1,145 @@
+"""Single-flight coalescing of identical concurrent tool executions.
+
+When several sessions ask the same question at once, only the first call
+(the leader) runs the query; callers arriving with the same key while it
+is in flight (followers) wait for it and share its result or exception.
+Nothing is kept once the execution finishes, so this complements rather
+than replaces the result cache.
+
+Async followers wait on a shielded task: a cancelled caller stops waiting
+without affecting the others, and the execution itself is cancelled only
+when every caller waiting on it has gone away.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from .metrics import record_coalesced
+
+T = TypeVar("T")
+
+
+@dataclass
+class _AsyncFlight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+@dataclass
+class _SyncFlight:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent executions that share a key.
+
+    Synchronous (`run_sync`) and asynchronous (`run`) callers are tracked
+    separately; they never share an execution with each other.
+
+    Attributes:
+        enabled (bool): When False every call executes on its own.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[str, _AsyncFlight] = {}
+        self._sync_flights: Dict[str, _SyncFlight] = {}
+        self._lock = threading.Lock()
+        self._executions = 0
+        self._coalesced = 0
+
+    @classmethod
+    def from_env(cls) -> SingleFlight:
+        """Create a group from environment variables.
+
+        Reads the following optional environment variable:
+            SQL_TOOL_SINGLE_FLIGHT (default true)
+        """
+        return cls(
+            enabled=os.environ.get("SQL_TOOL_SINGLE_FLIGHT", "true").strip().lower() in ("1", "true", "yes", "on")
+        )
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn()`, or the execution already in flight for `key`."""
+        if not self.enabled:
+            return await fn()
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _AsyncFlight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._count(coalesced=False)
+        else:
+            self._count(coalesced=True)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # The last interested caller left; stop the query and let new callers start afresh.
+                self._forget(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def run_sync(self, key: str, fn: Callable[[], T]) -> T:
+        """Call `fn()`, or wait for the call already in flight for `key` in another thread."""
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            flight = self._sync_flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._sync_flights[key] = _SyncFlight()
+        self._count(coalesced=not leader)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._sync_flights.pop(key, None)
+            flight.done.set()
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the executions in flight, the executions started and the calls that joined one."""
+        with self._lock:
+            return {
+                "in_flight": len(self._flights) + len(self._sync_flights),
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+            }
+
+    def _count(self, coalesced: bool) -> None:
+        """Count a leader or a follower, reporting followers to the metrics of the current tool call."""
+        with self._lock:
+            if coalesced:
+                self._coalesced += 1
+            else:
+                self._executions += 1
+        if coalesced:
+            record_coalesced()
+
+    def _forget(self, key: str, flight: _AsyncFlight) -> None:
+        """Drop `flight` from the in-flight table unless a newer flight replaced it."""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -1,4 +1,20 @@
 from .base import SQLTool
+from .batch import BatchSQLTool
+from .cache import CacheStats, ResultCache
+from .catalog import CampaignCatalog, CampaignCatalogTool
+from .daily import CampaignDayCache, DayCachedSQLTool
 from .factory import SQLToolFactory
+from .prefetch import MetricsPrefetcher
 
-__all__ = ["SQLTool", "SQLToolFactory"]
+__all__ = [
+    "SQLTool",
+    "BatchSQLTool",
+    "DayCachedSQLTool",
+    "CampaignDayCache",
+    "CampaignCatalogTool",
+    "CampaignCatalog",
+    "MetricsPrefetcher",
+    "SQLToolFactory",
+    "ResultCache",
+    "CacheStats",
+]
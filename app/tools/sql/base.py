@@ -1,20 +1,50 @@
-import json
+import asyncio
 import logging
+from contextlib import AbstractContextManager, AsyncExitStack, ExitStack
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Type
 
 from langchain.tools import StructuredTool
 from langchain_community.utilities import SQLDatabase
 from pydantic import BaseModel
 from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import TextClause
 from typing_extensions import override
 
+from ..budget import DeadlineExceeded, QueryBudget, call_deadline, remaining
+from ..clickhouse import AsyncClickHouseClient, EnginePool
+from ..concurrency import STANDARD, ConcurrencyLimiter, ToolBusyError, to_thread_admitted
 from ..interfaces import BaseTool
+from ..metrics import record_error, record_rows
+from ..progress import progress_token, report_progress
+from ..results import ResultStore
+from ..schemas import ResultFormatArgs, ResultShapeArgs
+from ..singleflight import SingleFlight
+from ..tracing import phase
+from .cache import ResultCache
+from .encoding import OUTPUT_FORMATS, encode_payload, rows_to_dataframe
+from .pagination import Page, encode_cursor, fingerprint, resolve_page
+from .shaping import ResultShape, shaped_variant
+from .variants import CompiledVariant, QueryVariants, VariantDimension
+
+if TYPE_CHECKING:
+    from .prefetch import MetricsPrefetcher
+
+# Receives each streamed chunk with its columns, database types and row offset.
+ChunkCallback = Callable[[List[str], Dict[str, str], List[Any], int], Awaitable[None]]
+
+CONTROL_FIELDS = frozenset(ResultFormatArgs.model_fields) | frozenset(ResultShapeArgs.model_fields)
+# Most distinct query strings whose `text()` constructs are kept.
+MAX_CACHED_CLAUSES = 512
 
 
 class SQLTool(BaseTool):
     """Base class for SQL-based tools."""
 
+    # Whether a call's `ResultShape` is pushed into the query (otherwise subclasses apply it to their rows).
+    pushdown_shape = True
+
     def __init__(
         self,
         name: str,
@@ -23,14 +53,46 @@ class SQLTool(BaseTool):
         args_schema: Type[BaseModel],
         db: Optional[SQLDatabase] = None,
         output_schema: Optional[List[Dict[str, str]]] = None,
+        async_client: Optional[AsyncClickHouseClient] = None,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        cache: Optional[ResultCache] = None,
+        output_format: str = "rows",
+        page_size: Optional[int] = None,
+        chunk_size: int = 1000,
+        store: Optional[ResultStore] = None,
+        pool: Optional[EnginePool] = None,
+        flights: Optional[SingleFlight] = None,
+        variants: Sequence[VariantDimension] = (),
+        cost_class: str = STANDARD,
+        budget: Optional[QueryBudget] = None,
     ):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format for {name}: {output_format}")
         super().__init__(name=name, description=description, args_schema=args_schema)
         self.query = query
         self.db: Optional[SQLDatabase] = db
         self.output_schema = output_schema
+        self.async_client = async_client
+        self.limiter = limiter
+        self.cache = cache
+        self.output_format = output_format
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.store = store
+        self.pool = pool
+        self.flights = flights
+        self.variants = QueryVariants(query, variants)
+        self.cost_class = cost_class
+        self.budget = budget if budget is not None else QueryBudget()
+        # Set by `SQLToolFactory` when discovery calls prefetch this tool's results.
+        self.prefetcher: Optional[MetricsPrefetcher] = None
+        self._clauses: Dict[str, TextClause] = {}
+        for variant in self.variants:
+            self._text(variant.query)
+            self._text(variant.page_query)
 
         self._lc_tool = StructuredTool.from_function(
-            name=name, description=description, func=self.invoke, args_schema=args_schema
+            name=name, description=description, func=self.invoke, coroutine=self.ainvoke, args_schema=args_schema
         )
 
     @classmethod
@@ -42,8 +104,21 @@ class SQLTool(BaseTool):
         description_file: str,
         db: Optional[SQLDatabase] = None,
         output_schema: Optional[List[Dict[str, str]]] = None,
+        async_client: Optional[AsyncClickHouseClient] = None,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        cache: Optional[ResultCache] = None,
+        output_format: str = "rows",
+        page_size: Optional[int] = None,
+        chunk_size: int = 1000,
+        store: Optional[ResultStore] = None,
+        pool: Optional[EnginePool] = None,
+        flights: Optional[SingleFlight] = None,
+        variants: Sequence[VariantDimension] = (),
+        cost_class: str = STANDARD,
+        budget: Optional[QueryBudget] = None,
+        **kwargs: Any,
     ) -> "SQLTool":
-        """Create tool from SQL and description files."""
+        """Create tool from SQL and description files; extra keyword arguments go to the subclass constructor."""
         sql_path = Path(sql_file)
         desc_path = Path(description_file)
 
@@ -59,59 +134,387 @@ class SQLTool(BaseTool):
             args_schema=args_schema,
             db=db,
             output_schema=output_schema,
+            async_client=async_client,
+            limiter=limiter,
+            cache=cache,
+            output_format=output_format,
+            page_size=page_size,
+            chunk_size=chunk_size,
+            store=store,
+            pool=pool,
+            flights=flights,
+            variants=variants,
+            cost_class=cost_class,
+            budget=budget,
+            **kwargs,
         )
 
     @override
     def invoke(self, **kwargs: Any) -> Any:
-        """Execute SQL query synchronously."""
+        """Execute SQL query synchronously, serving repeated calls from the result cache.
+
+        Rows are read from the database cursor in `chunk_size` batches; with
+        a page size only one page (plus a look-ahead row) is ever fetched.
+        Identical concurrent calls share one execution through `flights`.
+        The call's `budget` is sent to ClickHouse as query settings. Each
+        stage is timed as a `tracing.phase` of the call. Run from `ainvoke`,
+        executions take a limiter slot like async ones (see `_execute`).
+        """
         logging.debug(f"Executing SQL query for {self.name}: {self.query}")
         logging.debug(f"With parameters: {kwargs}")
 
         try:
-            args = self.args_schema(**kwargs)
+            with call_deadline(self.budget.timeout):
+                with phase("validate"):
+                    args = self.args_schema(**kwargs)
 
-            db_inst = self._get_db()
+                with phase("prepare"):
+                    variant = self._variant(args)
+                    query, params, page, digest = self._prepare(args, variant.query, variant.page_query)
+                    cache = self.cache
+                    cache_key = cache.make_key(self.name, args) if cache is not None else None
+                if self.prefetcher is not None:
+                    self.prefetcher.observe(params.get("account_id"), digest)
+                if cache is not None and cache_key is not None and self._has_stored_result(params):
+                    with phase("cache"):
+                        cached = cache.get(cache_key)
+                    if cached is not None:
+                        return cached
 
-            with db_inst._engine.begin() as connection:
-                result = connection.execute(text(self.query), args.model_dump())
-                columns = list(result.keys())
-                rows = result.fetchall()
-
-            if self.output_schema:
-                column_types = self.output_schema
-                try:
-                    columns = [
-                        item["column"] if isinstance(item, dict) else getattr(item, "column", str(item))
-                        for item in self.output_schema
-                    ]
-                except Exception:
-                    pass
-            else:
-                try:
-                    meta_cols = getattr(result._metadata, "_columns", {})
-                    column_types = [
-                        {"column": c, "type": str(meta_cols[c].type) if c in meta_cols else "string"} for c in columns
-                    ]
-                except Exception:
-                    column_types = [{"column": c, "type": "string"} for c in columns]
-
-            if rows:
-                data = [dict(zip(columns, [str(value) for value in row])) for row in rows]
-                return json.dumps(
-                    {"columns": columns, "column_types": column_types, "data": data, "row_count": len(data)}
-                )
-            else:
-                return json.dumps({"columns": columns, "column_types": column_types, "data": [], "row_count": 0})
+                columns, db_types, rows = self._fetch(args, page, query, params)
+
+                columns, column_types = self._resolve_columns(columns, db_types, self._shape(args))
+                payload = self._encode(args, params, page, digest, columns, column_types, rows)
+                if cache is not None and cache_key is not None:
+                    with phase("cache"):
+                        cache.set(cache_key, payload, cache.ttl_for(args))
+                return payload
+
+        except ToolBusyError as e:
+            logging.warning(f"SQL execution rejected for {self.name}: {e}")
+            record_error()
+            return f"SQL execution rejected: {e}"
+        except DeadlineExceeded as e:
+            logging.warning(f"SQL execution timed out for {self.name}: {e}")
+            record_error()
+            return f"SQL execution failed: {e}"
+        except Exception as e:
+            logging.exception(f"SQL execution failed for {self.name}: {e}")
+            record_error()
+            return f"SQL execution failed: {e}"
+
+    @override
+    async def ainvoke(self, **kwargs: Any) -> Any:
+        """Execute SQL query on the async ClickHouse client.
+
+        Falls back to running `invoke` in a worker thread when no async client
+        is configured. Calls are admitted through the shared limiter either
+        way, so a full queue is reported back to the caller instead of
+        waiting forever.
 
+        Rows are streamed from ClickHouse in `chunk_size` batches. When the
+        client sent a progress token, every batch is also sent as an MCP
+        progress notification (encoded like the final result, with a
+        `chunk_offset`), so the first rows arrive before the query drains.
+        Identical concurrent calls share one execution through `flights`;
+        only the caller that started it receives the progress notifications.
+        Queries run within the call's `budget`: past its deadline, or when
+        the MCP client cancels the call, the ClickHouse query is killed.
+        """
+        if self.async_client is None:
+            return await to_thread_admitted(self.invoke, **kwargs)
+
+        logging.debug(f"Executing async SQL query for {self.name}: {self.query}")
+        logging.debug(f"With parameters: {kwargs}")
+
+        try:
+            with call_deadline(self.budget.timeout):
+                with phase("validate"):
+                    args = self.args_schema(**kwargs)
+
+                with phase("prepare"):
+                    variant = self._variant(args)
+                    query, params, page, digest = self._prepare(args, variant.async_query, variant.async_page_query)
+                    cache = self.cache
+                    cache_key = cache.make_key(self.name, args) if cache is not None else None
+                if self.prefetcher is not None:
+                    self.prefetcher.observe(params.get("account_id"), digest)
+                if cache is not None and cache_key is not None and self._has_stored_result(params):
+                    with phase("cache"):
+                        cached = await cache.aget(cache_key)
+                    if cached is not None:
+                        return cached
+
+                columns, db_types, rows = await self._afetch(args, page, query, params)
+
+                columns, column_types = self._resolve_columns(columns, db_types, self._shape(args))
+                payload = self._encode(args, params, page, digest, columns, column_types, rows)
+                if cache is not None and cache_key is not None:
+                    with phase("cache"):
+                        await cache.aset(cache_key, payload, cache.ttl_for(args))
+                return payload
+
+        except ToolBusyError as e:
+            logging.warning(f"SQL execution rejected for {self.name}: {e}")
+            record_error()
+            return f"SQL execution rejected: {e}"
+        except DeadlineExceeded as e:
+            logging.warning(f"SQL execution timed out for {self.name}: {e}")
+            record_error()
+            return f"SQL execution failed: {e}"
         except Exception as e:
             logging.exception(f"SQL execution failed for {self.name}: {e}")
+            record_error()
             return f"SQL execution failed: {e}"
 
+    def call_fingerprint(self, args: BaseModel) -> str:
+        """Return the fingerprint of a call's result, which its `result_id` and cursors are derived from."""
+        variant = self._variant(args)
+        return self._prepare(args, variant.query, variant.page_query)[3]
+
+    def _fetch(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Return the columns, database types and rows of a call, sharing identical in-flight executions."""
+        if self.flights is None:
+            return self._execute(query, params)
+        return self.flights.run_sync(self._flight_key(params), lambda: self._execute(query, params))
+
+    async def _afetch(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Async counterpart of `_fetch` on the async client."""
+        if self.flights is None:
+            return await self._aexecute(args, page, query, params)
+        return await self.flights.run(self._flight_key(params), lambda: self._aexecute(args, page, query, params))
+
+    def _execute(self, query: str, params: Dict[str, Any]) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Run the query on a pooled connection within a limiter slot and return its columns, database types and rows.
+
+        The slot is taken on the event loop that started the worker thread
+        (see `concurrency.to_thread_admitted`); plain synchronous callers run
+        unadmitted.
+
+        Raises:
+            DeadlineExceeded: If the call's deadline passes while queued.
+        """
+        with ExitStack() as stack:
+            if self.limiter is not None:
+                with phase("queue"):
+                    try:
+                        stack.enter_context(
+                            self.limiter.blocking_slot(self._fair_key(params), self.cost_class, remaining())
+                        )
+                    except TimeoutError:
+                        raise DeadlineExceeded(f"Tool call exceeded its {self.budget.timeout}s time budget") from None
+            with phase("connection"):
+                connection = stack.enter_context(self._begin())
+            connection.execution_options(yield_per=self.chunk_size, settings=self.budget.settings(remaining()))
+            with phase("execute"):
+                result = connection.execute(self._text(query), params)
+            with phase("fetch"):
+                columns = list(result.keys())
+                rows = [row for chunk in result.partitions() for row in chunk]
+        return columns, self._result_types(result, columns), rows
+
+    async def _aexecute(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Stream the query from the async client, reporting chunks as progress when the client asked for it."""
+
+        async def report(columns: List[str], db_types: Dict[str, str], chunk: List[Any], offset: int) -> None:
+            await self._report_chunk(args, page, columns, db_types, chunk, offset)
+
+        return await self._astream(query, params, report if progress_token() is not None else None)
+
+    async def _astream(
+        self, query: str, params: Dict[str, Any], on_chunk: Optional[ChunkCallback] = None
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Stream a query within a limiter slot and the call's budget and return its columns, types and rows.
+
+        Raises:
+            DeadlineExceeded: If the call's deadline passes while queued or streaming.
+        """
+        client = self.async_client
+        assert client is not None, "only called when the tool has an async client"
+        columns: List[str] = []
+        db_types: Dict[str, str] = {}
+        rows: List[Any] = []
+        deadline = asyncio.timeout(remaining())
+        try:
+            async with deadline, AsyncExitStack() as stack:
+                if self.limiter is not None:
+                    with phase("queue"):
+                        await stack.enter_async_context(self.limiter.slot(self._fair_key(params), self.cost_class))
+                settings = self.budget.settings(remaining())
+                async for columns, db_types, chunk in client.stream(query, params, self.chunk_size, settings):
+                    if on_chunk is not None:
+                        with phase("progress"):
+                            await on_chunk(columns, db_types, chunk, len(rows))
+                    rows.extend(chunk)
+        except TimeoutError:
+            if deadline.expired():
+                raise DeadlineExceeded(f"Tool call exceeded its {self.budget.timeout}s time budget") from None
+            raise
+        return columns, db_types, rows
+
+    def _fair_key(self, params: Dict[str, Any]) -> Optional[str]:
+        """Return the key the limiter shares slots fairly across: the queried account."""
+        account = params.get("account_id")
+        return str(account) if account is not None else None
+
+    def _text(self, query: str) -> TextClause:
+        """Return the `text()` construct of a query, compiled once per query string."""
+        clause = self._clauses.get(query)
+        if clause is None:
+            clause = text(query)
+            if len(self._clauses) < MAX_CACHED_CLAUSES:
+                self._clauses[query] = clause
+        return clause
+
     @override
     def get_langchain_tool(self) -> Any:
         """Return the LangChain tool."""
         return self._lc_tool
 
+    @staticmethod
+    def _result_types(result: Any, columns: List[str]) -> Dict[str, str]:
+        """Return database column types reported by a result, keyed by column name."""
+        try:
+            meta_cols = getattr(result._metadata, "_columns", {})
+            return {c: str(meta_cols[c].type) for c in columns if c in meta_cols}
+        except Exception:
+            return {}
+
+    def _resolve_columns(
+        self, columns: List[str], db_types: Dict[str, str], shape: Optional[ResultShape] = None
+    ) -> Tuple[List[str], List[Dict[str, str]]]:
+        """Return output column names and types, preferring the configured output schema (projected by `shape`)."""
+        if self.output_schema:
+            column_types = shape.output_schema(self.output_schema) if shape is not None else self.output_schema
+            try:
+                columns = [
+                    item["column"] if isinstance(item, dict) else getattr(item, "column", str(item))
+                    for item in column_types
+                ]
+            except Exception:
+                pass
+        else:
+            column_types = [{"column": c, "type": db_types.get(c, "string")} for c in columns]
+        return columns, column_types
+
+    async def _report_chunk(
+        self,
+        args: BaseModel,
+        page: Optional[Page],
+        columns: List[str],
+        db_types: Dict[str, str],
+        chunk: List[Any],
+        offset: int,
+    ) -> None:
+        """Send one streamed chunk of rows as a progress notification, leaving out the look-ahead row."""
+        if self._output_format(args) == "handle":
+            return
+        if page is not None:
+            chunk = chunk[: max(0, page.size - offset)]
+        if not chunk:
+            return
+        columns, column_types = self._resolve_columns(columns, db_types, self._shape(args))
+        message = encode_payload(self._output_format(args), columns, column_types, chunk, {"chunk_offset": offset})
+        await report_progress(offset + len(chunk), message=message)
+
+    def _prepare(self, args: BaseModel, query: str, page_query: str) -> Tuple[str, Dict[str, Any], Optional[Page], str]:
+        """Return the query, bind parameters, requested page and argument fingerprint for a call."""
+        params = self._bind_params(args)
+        shape = self._shape(args)
+        if shape is not None:
+            params.update(shape.bind_params())
+        digest = fingerprint(self.name, params)
+        page = resolve_page(getattr(args, "cursor", None), getattr(args, "page_size", None), self.page_size, digest)
+        if page is None:
+            return query, params, None, digest
+        return page_query, {**params, **page.bind_params()}, page, digest
+
+    def _encode(
+        self,
+        args: BaseModel,
+        params: Dict[str, Any],
+        page: Optional[Page],
+        digest: str,
+        columns: List[str],
+        column_types: List[Dict[str, str]],
+        rows: List[Any],
+    ) -> str:
+        """Encode the result, trimming the look-ahead row and attaching `next_cursor` when paginated.
+
+        With a result store configured, the rows are also stored as a typed
+        DataFrame and the payload carries its `result_id`.
+        """
+        output_format = self._output_format(args)
+        extra: Dict[str, Any] = {}
+        if page is not None:
+            extra["next_cursor"] = encode_cursor(page, digest) if len(rows) > page.size else None
+            rows = rows[: page.size]
+        record_rows(len(rows))
+
+        if self.store is not None:
+            with phase("store"):
+                result_id = self._result_id(params)
+                df = rows_to_dataframe(columns, column_types, rows)
+                df.attrs["source_tool"] = self.name
+                if self.store.put(result_id, df):
+                    extra["result_id"] = result_id
+        if output_format == "handle" and "result_id" not in extra:
+            raise ValueError("The 'handle' output format needs a result store with room for this result")
+
+        with phase("encode"):
+            return encode_payload(output_format, columns, column_types, rows, extra or None)
+
+    def _flight_key(self, params: Dict[str, Any]) -> str:
+        """Return the single-flight key for a call's bound (and page) parameters."""
+        return f"{self.name}:{fingerprint(self.name, params)}"
+
+    def _result_id(self, params: Dict[str, Any]) -> str:
+        """Return the deterministic result id for a call's bound (and page) parameters."""
+        return f"res_{fingerprint(self.name, params)}"
+
+    def _has_stored_result(self, params: Dict[str, Any]) -> bool:
+        """Return whether a cached payload for this call can be served.
+
+        Cached payloads embed a `result_id`; once its frame has been evicted
+        from the store the payload is stale and the query has to run again.
+        """
+        return self.store is None or self._result_id(params) in self.store
+
+    def _variant(self, args: BaseModel) -> CompiledVariant:
+        """Return the query variant for a call's arguments, wrapped in its result shape when pushed down."""
+        variant = self.variants.select(args)
+        shape = self._shape(args)
+        if shape is None or not self.pushdown_shape:
+            return variant
+        return shaped_variant(variant, shape.structure)
+
+    def _shape(self, args: BaseModel) -> Optional[ResultShape]:
+        """Return the projection, filters, sort keys and limit a call asks for, validated against `output_schema`."""
+        if not self.output_schema:
+            return None
+        return ResultShape.from_args(args, [item["column"] for item in self.output_schema])
+
+    @staticmethod
+    def _bind_params(args: BaseModel) -> Dict[str, Any]:
+        """Return the validated arguments that are bound into the SQL query."""
+        return args.model_dump(exclude=set(CONTROL_FIELDS))
+
+    def _output_format(self, args: BaseModel) -> str:
+        """Return the per-call output format, falling back to the tool default."""
+        return getattr(args, "output_format", None) or self.output_format
+
+    def _begin(self) -> AbstractContextManager[Connection]:
+        """Open a transaction on a pooled connection, instrumented when an `EnginePool` is configured."""
+        if self.pool is not None:
+            return self.pool.begin()
+        return self._get_db()._engine.begin()
+
     def _get_db(self) -> SQLDatabase:
         """Return the SQLDatabase instance, initializing if needed."""
         if isinstance(self.db, SQLDatabase):
@@ -0,0 +1,114 @@
+"""SQL tools that answer many accounts with a few grouped queries.
+
+A batched tool's query filters with `account_id IN :account_ids`, groups
+by `account_id` and returns `account_id` as its first column. Accounts
+that share a date range are answered together (in chunks of
+`ACCOUNTS_PER_QUERY`); accounts with different ranges run as separate
+queries, at most `max_parallel_queries` at a time on the async client.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+from pydantic import BaseModel
+
+from ..schemas import BatchAggregateKPIQueryArgs
+from .base import SQLTool
+from .pagination import Page, slice_page
+from .shaping import ResultShape
+
+ACCOUNTS_PER_QUERY = 200
+
+
+class BatchSQLTool(SQLTool):
+    """SQL tool returning one row per account, led by `account_id`, `start_date` and `end_date`.
+
+    The args schema provides `account_ids` with a shared `start_date` /
+    `end_date` and `ranges` of accounts with their own dates (see
+    `BatchAggregateKPIQueryArgs`). Rows are ordered by account; accounts
+    without data in their range are omitted. The call's result shape and
+    page are applied to the combined rows, and progress notifications are
+    not sent.
+    """
+
+    max_parallel_queries = 4
+    pushdown_shape = False
+
+    def _prepare(self, args: BaseModel, query: str, page_query: str) -> Tuple[str, Dict[str, Any], Optional[Page], str]:
+        """Return the unpaginated query; pages are sliced from the combined rows in `_combine`."""
+        return super()._prepare(args, query, query)
+
+    def _fetch(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Run one query per account group in turn and combine their rows."""
+        groups = self._groups(cast(BatchAggregateKPIQueryArgs, args))
+        parts = [super(BatchSQLTool, self)._fetch(args, None, query, g) for g in groups]
+        return self._combine(groups, parts, page, self._shape(args))
+
+    async def _afetch(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Run the account group queries concurrently, bounded by `max_parallel_queries`, and combine their rows."""
+        groups = self._groups(cast(BatchAggregateKPIQueryArgs, args))
+        semaphore = asyncio.Semaphore(self.max_parallel_queries)
+        fetch = super()._afetch
+
+        async def run(group: Dict[str, Any]) -> Tuple[List[str], Dict[str, str], List[Any]]:
+            async with semaphore:
+                return await fetch(args, None, query, group)
+
+        tasks = [asyncio.ensure_future(run(group)) for group in groups]
+        try:
+            parts = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return self._combine(groups, parts, page, self._shape(args))
+
+    def _fair_key(self, params: Dict[str, Any]) -> Optional[str]:
+        """Share one fair-queuing key across batches so a large batch cannot claim a share per account."""
+        return self.name
+
+    async def _report_chunk(self, *args: Any, **kwargs: Any) -> None:
+        """Skip progress notifications; chunks of concurrent group queries have no common offset."""
+
+    @staticmethod
+    def _groups(args: BatchAggregateKPIQueryArgs) -> List[Dict[str, Any]]:
+        """Return the bind parameters of each query: accounts grouped by date range, sorted and chunked."""
+        by_range: Dict[Tuple[str, str], List[str]] = {}
+        if args.account_ids:
+            by_range.setdefault((args.start_date, args.end_date), []).extend(args.account_ids)
+        for item in args.ranges:
+            by_range.setdefault((item.start_date, item.end_date), []).append(item.account_id)
+
+        groups = []
+        for (start_date, end_date), accounts in by_range.items():
+            accounts = sorted(accounts)
+            for start in range(0, len(accounts), ACCOUNTS_PER_QUERY):
+                chunk = accounts[start:][:ACCOUNTS_PER_QUERY]
+                groups.append({"account_ids": chunk, "start_date": start_date, "end_date": end_date})
+        return groups
+
+    @staticmethod
+    def _combine(
+        groups: List[Dict[str, Any]],
+        parts: List[Tuple[List[str], Dict[str, str], List[Any]]],
+        page: Optional[Page],
+        shape: Optional[ResultShape] = None,
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Merge group results into rows carrying each account's date range, ordered by account and shaped."""
+        columns, db_types, _ = parts[0]
+        columns = [columns[0], "start_date", "end_date", *columns[1:]]
+        db_types = {**db_types, "start_date": "Date", "end_date": "Date"}
+        rows = [
+            (row[0], group["start_date"], group["end_date"], *row[1:])
+            for group, (_, _, part) in zip(groups, parts)
+            for row in part
+        ]
+        rows.sort(key=lambda row: str(row[0]))
+        if shape is not None:
+            columns, rows = shape.apply(columns, rows)
+        return columns, db_types, slice_page(rows, page)
@@ -0,0 +1,217 @@
+"""Two-tier result cache for SQL tools.
+
+Results are cached as the serialized payload a tool returns, keyed on the
+tool name plus its normalized, validated arguments. The first tier is an
+in-memory LRU bounded by total payload bytes; the optional second tier is a
+SQLite file that survives restarts. Entries expire based on the requested
+date range: ranges that end before today describe settled data and get a
+long TTL, while ranges touching today (or without dates) get a short one.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheStats:
+    """Counters describing cache effectiveness."""
+
+    hits: int = 0
+    misses: int = 0
+    disk_hits: int = 0
+    stores: int = 0
+    evictions: int = 0
+    disk_evictions: int = 0
+
+
+class ResultCache:
+    """In-memory LRU with an optional on-disk tier and date-range-aware TTLs.
+
+    Attributes:
+        max_bytes (int): Upper bound on the total size of in-memory payloads.
+        past_ttl (float): TTL in seconds for ranges ending before today.
+        live_ttl (float): TTL in seconds for ranges touching today or without an end date.
+        stats (CacheStats): Hit, miss and eviction counters.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        past_ttl: float = 24 * 3600,
+        live_ttl: float = 300,
+        disk_path: Optional[str] = None,
+        disk_max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.past_ttl = past_ttl
+        self.live_ttl = live_ttl
+        self.disk_max_bytes = disk_max_bytes
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, Tuple[str, float, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._disk = self._open_disk(disk_path)
+
+    @classmethod
+    def from_env(cls) -> ResultCache:
+        """Create a cache from environment variables.
+
+        Reads the following optional environment variables:
+            SQL_RESULT_CACHE_MAX_BYTES (default 64 MiB)
+            SQL_RESULT_CACHE_PAST_TTL (seconds, default 86400)
+            SQL_RESULT_CACHE_LIVE_TTL (seconds, default 300)
+            SQL_RESULT_CACHE_DIR (enables the on-disk tier when set)
+            SQL_RESULT_CACHE_DISK_MAX_BYTES (default 1 GiB)
+        """
+        cache_dir = os.environ.get("SQL_RESULT_CACHE_DIR")
+        return cls(
+            max_bytes=int(os.environ.get("SQL_RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+            past_ttl=float(os.environ.get("SQL_RESULT_CACHE_PAST_TTL", "86400")),
+            live_ttl=float(os.environ.get("SQL_RESULT_CACHE_LIVE_TTL", "300")),
+            disk_path=str(Path(cache_dir) / "sql_results.sqlite3") if cache_dir else None,
+            disk_max_bytes=int(os.environ.get("SQL_RESULT_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024))),
+        )
+
+    @staticmethod
+    def make_key(tool_name: str, args: BaseModel) -> str:
+        """Build a cache key from a tool name and its validated arguments."""
+        normalized = json.dumps(
+            {"tool": tool_name, "args": args.model_dump(mode="json")}, sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, args: BaseModel) -> float:
+        """Return the TTL for a call, long when its `end_date` (and every per-range one) lies before today."""
+        end_dates = [getattr(args, "end_date", None)]
+        end_dates += [getattr(item, "end_date", None) for item in getattr(args, "ranges", None) or []]
+        if not all(end_dates):
+            return self.live_ttl
+        try:
+            end = max(date.fromisoformat(str(end_date)[:10]) for end_date in end_dates)
+        except ValueError:
+            return self.live_ttl
+        return self.past_ttl if end < date.today() else self.live_ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached payload, promoting disk hits into memory."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, size = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return value
+                self._remove(key)
+
+            if self._disk is not None:
+                row = self._disk.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    self._disk.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._put_memory(key, row[0], row[1])
+                    self.stats.hits += 1
+                    self.stats.disk_hits += 1
+                    return str(row[0])
+
+            self.stats.misses += 1
+            return None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        """Store a payload in both tiers for `ttl` seconds."""
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._put_memory(key, value, expires_at)
+            if self._disk is not None:
+                self._put_disk(key, value, expires_at)
+            self.stats.stores += 1
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Async `get`; disk lookups run in a worker thread."""
+        if self._disk is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str, ttl: float) -> None:
+        """Async `set`; disk writes run in a worker thread."""
+        if self._disk is None:
+            self.set(key, value, ttl)
+        else:
+            await asyncio.to_thread(self.set, key, value, ttl)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return current counters together with the in-memory footprint."""
+        with self._lock:
+            return {**asdict(self.stats), "entries": len(self._entries), "bytes": self._size}
+
+    def _put_memory(self, key: str, value: str, expires_at: float) -> None:
+        """Insert into the LRU, evicting least recently used entries past `max_bytes`."""
+        size = len(value.encode("utf-8"))
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, expires_at, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        """Drop an in-memory entry and release its bytes."""
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def _open_disk(self, path: str) -> sqlite3.Connection:
+        """Open (creating if needed) the SQLite file backing the disk tier."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        logger.info("SQL result cache disk tier at %s", path)
+        return conn
+
+    def _put_disk(self, key: str, value: str, expires_at: float) -> None:
+        """Write an entry to disk, trimming expired and least recently used rows past `disk_max_bytes`."""
+        assert self._disk is not None
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        self._disk.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, size, expires_at, now),
+        )
+        self._disk.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total = self._disk.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.disk_max_bytes:
+            row = self._disk.execute("SELECT key, size FROM entries ORDER BY accessed_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._disk.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            total -= row[1]
+            self.stats.disk_evictions += 1
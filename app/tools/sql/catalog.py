@@ -0,0 +1,441 @@
+"""Per-account campaign catalog behind `lookup_campaigns` and `get_recent_campaigns`.
+
+Both tools only need the account's `(campaign_name, campaign_id)` pairs and
+when each was last active. `CampaignCatalog` keeps them in memory per
+account, indexed by name, case-folded name and id: an account's entry is
+built on first use with `campaign_catalog.sql` and, once older than
+`refresh_interval`, brought up to date by querying only the events since its
+high-water mark (less `lag`, for late-arriving events). Name resolution,
+including case-insensitive, prefix and fuzzy matching, is then a dictionary
+or bisect lookup instead of a scan of the `event` table.
+
+With the catalog disabled (`max_bytes=0`) the tools run their own queries;
+only non-exact name matching still loads the account's pairs for the call.
+"""
+from __future__ import annotations
+
+import bisect
+import difflib
+import logging
+import math
+import os
+import threading
+import time
+from abc import abstractmethod
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type, Union, cast
+
+from pydantic import BaseModel
+from typing_extensions import override
+
+from ..clickhouse import to_pyformat
+from ..schemas import CampaignLookupParams, CampaignRecentParams
+from .base import SQLTool
+from .pagination import Page, fingerprint, slice_page
+from .variants import EPOCH
+
+logger = logging.getLogger(__name__)
+
+# Campaign ids returned by the catalog tool call in progress, collected for `CampaignCatalogTool.prefetch_target`.
+_returned_ids: ContextVar[Optional[List[Any]]] = ContextVar("catalog_returned_ids", default=None)
+
+# Arguments of the catalog tools; every catalog tool call names its account.
+CatalogArgs = Union[CampaignLookupParams, CampaignRecentParams]
+
+# Closest names returned per requested name by fuzzy matching (substring matches are always returned).
+FUZZY_MATCHES = 5
+FUZZY_CUTOFF = 0.6
+
+
+class CatalogEntry:
+    """Campaigns of one account: `(campaign_name, campaign_id)` pairs with their latest activity.
+
+    Attributes:
+        db_types (Dict[str, str]): Database types of the catalog query's columns.
+        high_water (Any): Latest activity seen, where the next refresh resumes.
+        refreshed_at (float): `time.monotonic()` of the last refresh.
+    """
+
+    def __init__(self) -> None:
+        self.db_types: Dict[str, str] = {}
+        self.high_water: Any = None
+        self.refreshed_at = 0.0
+        self._latest: Dict[Tuple[str, Any], Any] = {}
+        self._ids_by_name: Dict[str, Set[Any]] = {}
+        self._pairs_by_id: Dict[str, Set[Tuple[str, Any]]] = {}
+        self._names_by_folded: Dict[str, Set[str]] = {}
+        self._folded: List[str] = []
+        self._recent: Optional[List[Tuple[str, Any, Any]]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the entry."""
+        return 500 + sum(300 + 3 * len(name) for name, _ in self._latest)
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def merge(self, columns: List[str], db_types: Dict[str, str], rows: Iterable[Any]) -> None:
+        """Add rows of the catalog query, keeping each pair's latest activity."""
+        index = {column: i for i, column in enumerate(columns)}
+        name_at, id_at, latest_at = index["campaign_name"], index["campaign_id"], index["latest_date"]
+        with self._lock:
+            self.db_types.update(db_types)
+            added_names = False
+            for row in rows:
+                name, campaign_id, latest = row[name_at], row[id_at], row[latest_at]
+                key = (name, campaign_id)
+                previous = self._latest.get(key)
+                if previous is None:
+                    self._ids_by_name.setdefault(name, set()).add(campaign_id)
+                    self._pairs_by_id.setdefault(str(campaign_id), set()).add(key)
+                    folded = name.casefold()
+                    if folded not in self._names_by_folded:
+                        self._names_by_folded[folded] = set()
+                        added_names = True
+                    self._names_by_folded[folded].add(name)
+                if previous is None or (latest is not None and latest > previous):
+                    self._latest[key] = latest
+                if latest is not None and (self.high_water is None or latest > self.high_water):
+                    self.high_water = latest
+            if added_names:
+                self._folded = sorted(self._names_by_folded)
+            self._recent = None
+            self.refreshed_at = time.monotonic()
+
+    def lookup(
+        self, names: Optional[List[str]], ids: Optional[List[str]], match: str = "exact"
+    ) -> List[Tuple[str, Any]]:
+        """Return the pairs whose name matches one of `names` or whose id is in `ids`, ordered by name.
+
+        `match` is how names are compared: `exact`, `case_insensitive`,
+        `prefix` (case-insensitive) or `fuzzy` (case-insensitive substrings
+        plus the `FUZZY_MATCHES` most similar names).
+        """
+        with self._lock:
+            pairs: Set[Tuple[str, Any]] = set()
+            for name in self._matching_names(names or [], match):
+                pairs.update((name, campaign_id) for campaign_id in self._ids_by_name.get(name, ()))
+            for campaign_id in ids or []:
+                pairs.update(self._pairs_by_id.get(str(campaign_id), ()))
+        return sorted(pairs, key=lambda pair: (pair[0], str(pair[1])))
+
+    def recent(self, limit: int) -> List[Tuple[str, Any, Any]]:
+        """Return `(campaign_name, max campaign_id, latest activity)` of the `limit` most recently active names."""
+        with self._lock:
+            if self._recent is None:
+                by_name: Dict[str, Tuple[Any, Any]] = {}
+                for (name, campaign_id), latest in self._latest.items():
+                    current = by_name.get(name)
+                    if current is None:
+                        by_name[name] = (campaign_id, latest)
+                    else:
+                        by_name[name] = (max(current[0], campaign_id), _latest_of(current[1], latest))
+                self._recent = sorted(
+                    ((name, campaign_id, latest) for name, (campaign_id, latest) in by_name.items()),
+                    key=lambda row: (row[2] is not None, row[2] or 0, row[0]),
+                    reverse=True,
+                )
+            return self._recent[: max(0, limit)]
+
+    def _matching_names(self, names: List[str], match: str) -> Iterable[str]:
+        if match == "exact":
+            return names
+        found: Set[str] = set()
+        for name in names:
+            folded = name.casefold()
+            if match == "case_insensitive":
+                keys: Iterable[str] = [folded]
+            elif match == "prefix":
+                start = bisect.bisect_left(self._folded, folded)
+                end = bisect.bisect_left(self._folded, folded + "\U0010ffff", lo=start)
+                keys = self._folded[start:end]
+            elif match == "fuzzy":
+                keys = {key for key in self._folded if folded in key}
+                keys.update(difflib.get_close_matches(folded, self._folded, n=FUZZY_MATCHES, cutoff=FUZZY_CUTOFF))
+            else:
+                raise ValueError(f"Unknown name match mode: {match}")
+            for key in keys:
+                found.update(self._names_by_folded.get(key, ()))
+        return found
+
+
+def _latest_of(a: Any, b: Any) -> Any:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+def _since(high_water: Any, lag: float) -> str:
+    """Return the `since` bound of an incremental refresh: `lag` seconds before the high-water mark."""
+    if isinstance(high_water, datetime):
+        return (high_water - timedelta(seconds=lag)).strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(high_water, date):
+        return (high_water - timedelta(days=math.ceil(lag / 86400))).isoformat()
+    return str(high_water) if high_water is not None else EPOCH
+
+
+class CampaignCatalog:
+    """Memory-bounded LRU of per-account campaign catalogs, refreshed incrementally.
+
+    Attributes:
+        max_bytes (int): Upper bound on the approximate memory of cached entries (`0` disables the catalog).
+        refresh_interval (float): Seconds an entry is served before it is refreshed.
+        lag (float): Seconds before the high-water mark a refresh starts from, to catch late events.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, refresh_interval: float = 60.0, lag: float = 3600.0):
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self.lag = lag
+        self._entries: OrderedDict[str, Tuple[CatalogEntry, int]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._builds = 0
+        self._refreshes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> CampaignCatalog:
+        """Create a catalog from environment variables.
+
+        Reads the following optional environment variables:
+            CAMPAIGN_CATALOG_MAX_BYTES (default 64 MiB; 0 disables the catalog)
+            CAMPAIGN_CATALOG_REFRESH (seconds, default 60)
+            CAMPAIGN_CATALOG_LAG (seconds, default 3600)
+        """
+        return cls(
+            max_bytes=int(os.environ.get("CAMPAIGN_CATALOG_MAX_BYTES", str(64 * 1024 * 1024))),
+            refresh_interval=float(os.environ.get("CAMPAIGN_CATALOG_REFRESH", "60")),
+            lag=float(os.environ.get("CAMPAIGN_CATALOG_LAG", "3600")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether entries are kept between calls."""
+        return self.max_bytes > 0
+
+    def get(self, account_id: str) -> Tuple[Optional[CatalogEntry], Optional[str]]:
+        """Return an account's entry and the `since` bound it needs refreshing from (None when fresh)."""
+        with self._lock:
+            item = self._entries.get(account_id)
+            if item is None:
+                return None, EPOCH
+            self._entries.move_to_end(account_id)
+            entry = item[0]
+            if time.monotonic() - entry.refreshed_at < self.refresh_interval:
+                self._hits += 1
+                return entry, None
+        return entry, _since(entry.high_water, self.lag)
+
+    def merge(
+        self,
+        account_id: str,
+        entry: Optional[CatalogEntry],
+        columns: List[str],
+        db_types: Dict[str, str],
+        rows: List[Any],
+    ) -> CatalogEntry:
+        """Merge catalog query rows into an account's entry (a new one when `entry` is None) and cache it."""
+        built = entry is None
+        if entry is None:
+            entry = CatalogEntry()
+        entry.merge(columns, db_types, rows)
+        size = entry.nbytes
+        with self._lock:
+            if built:
+                self._builds += 1
+            else:
+                self._refreshes += 1
+            previous = self._entries.pop(account_id, None)
+            if previous is not None:
+                self._size -= previous[1]
+            if size > self.max_bytes:
+                return entry
+            self._entries[account_id] = (entry, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+                self._evictions += 1
+        return entry
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the cached account count, campaign pairs, approximate size, hits, builds, refreshes and evictions."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "campaigns": sum(len(entry) for entry, _ in self._entries.values()),
+                "bytes": self._size,
+                "hits": self._hits,
+                "builds": self._builds,
+                "refreshes": self._refreshes,
+                "evictions": self._evictions,
+            }
+
+
+class CampaignCatalogTool(SQLTool):
+    """SQL tool answered from the account's `CampaignCatalog` entry.
+
+    Subclasses turn an entry into result rows with `_answer`. Rows are
+    paged in Python and no progress notifications are sent. When the catalog
+    is disabled, calls that `_needs_catalog` says the tool's own query can
+    answer run that query instead. With a `prefetch_target`, the campaign
+    ids a call returns are handed to the target's prefetcher.
+    """
+
+    def __init__(self, *args: Any, catalog_query: str, catalog: Optional[CampaignCatalog] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.catalog_query = catalog_query
+        self.catalog = catalog if catalog is not None else CampaignCatalog.from_env()
+        self._async_catalog_query = to_pyformat(catalog_query)
+        # Set by `SQLToolFactory` to the tool whose results are prefetched for the returned campaigns.
+        self.prefetch_target: Optional[SQLTool] = None
+
+    @override
+    async def ainvoke(self, **kwargs: Any) -> Any:
+        """Answer the call, then schedule a prefetch of `prefetch_target` for the campaigns it returned."""
+        target = self.prefetch_target
+        if target is None or target.prefetcher is None:
+            return await super().ainvoke(**kwargs)
+        returned: List[Any] = []
+        token = _returned_ids.set(returned)
+        try:
+            result = await super().ainvoke(**kwargs)
+        finally:
+            _returned_ids.reset(token)
+        if returned:
+            target.prefetcher.schedule(target, str(kwargs.get("account_id")), returned)
+        return result
+
+    def _encode(
+        self,
+        args: BaseModel,
+        params: Dict[str, Any],
+        page: Optional[Page],
+        digest: str,
+        columns: List[str],
+        column_types: List[Dict[str, str]],
+        rows: List[Any],
+    ) -> str:
+        """Encode the result, collecting the returned campaign ids when a prefetch is waiting for them."""
+        payload = super()._encode(args, params, page, digest, columns, column_types, rows)
+        returned = _returned_ids.get()
+        if returned is not None and "campaign_id" in columns:
+            index = columns.index("campaign_id")
+            # Paged rows still hold the look-ahead row `SQLTool._encode` trims.
+            returned.extend(row[index] for row in (rows[: page.size] if page is not None else rows))
+        return payload
+
+    def _fetch(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Answer from the catalog entry, refreshing it first when it is missing or stale."""
+        if not self.catalog.enabled and not self._needs_catalog(args):
+            return super()._fetch(args, page, query, params)
+
+        account_id = cast(CatalogArgs, args).account_id
+        entry, since = self.catalog.get(account_id)
+        if since is not None:
+            catalog_params = {"account_id": account_id, "since": since}
+            try:
+                columns, db_types, rows = self._run_flight_sync(
+                    catalog_params, lambda: self._execute(self.catalog_query, catalog_params)
+                )
+            except Exception as e:
+                if entry is None:
+                    raise
+                logger.warning(f"Serving stale campaign catalog for {account_id}: {e}")
+            else:
+                entry = self.catalog.merge(account_id, entry, columns, db_types, rows)
+        assert entry is not None, "get() returns no entry only with a since bound"
+        return self._page(args, page, entry)
+
+    async def _afetch(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Async counterpart of `_fetch`; the catalog query is streamed from the async client."""
+        if not self.catalog.enabled and not self._needs_catalog(args):
+            return await super()._afetch(args, page, query, params)
+
+        account_id = cast(CatalogArgs, args).account_id
+        entry, since = self.catalog.get(account_id)
+        if since is not None:
+            catalog_params = {"account_id": account_id, "since": since}
+            try:
+                columns, db_types, rows = await self._run_flight(
+                    catalog_params, lambda: self._astream(self._async_catalog_query, catalog_params)
+                )
+            except Exception as e:
+                if entry is None:
+                    raise
+                logger.warning(f"Serving stale campaign catalog for {account_id}: {e}")
+            else:
+                entry = self.catalog.merge(account_id, entry, columns, db_types, rows)
+        assert entry is not None, "get() returns no entry only with a since bound"
+        return self._page(args, page, entry)
+
+    def _page(
+        self, args: BaseModel, page: Optional[Page], entry: CatalogEntry
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        columns, rows = self._answer(entry, args)
+        return columns, {column: entry.db_types.get(column, "string") for column in columns}, slice_page(rows, page)
+
+    def _run_flight_sync(self, catalog_params: Dict[str, Any], fn: Any) -> Any:
+        if self.flights is None:
+            return fn()
+        return self.flights.run_sync(self._catalog_key(catalog_params), fn)
+
+    async def _run_flight(self, catalog_params: Dict[str, Any], fn: Any) -> Any:
+        if self.flights is None:
+            return await fn()
+        return await self.flights.run(self._catalog_key(catalog_params), fn)
+
+    @staticmethod
+    def _catalog_key(catalog_params: Dict[str, Any]) -> str:
+        """Return a single-flight key shared by every catalog tool, so they refresh an account once."""
+        return f"campaign_catalog:{fingerprint('campaign_catalog', catalog_params)}"
+
+    async def _report_chunk(self, *args: Any, **kwargs: Any) -> None:
+        """Skip progress notifications; catalog query chunks are not result rows."""
+
+    def _needs_catalog(self, args: BaseModel) -> bool:
+        """Return whether a call can only be answered from catalog pairs (its query cannot)."""
+        return False
+
+    @abstractmethod
+    def _answer(self, entry: CatalogEntry, args: BaseModel) -> Tuple[List[str], List[Any]]:
+        """Return the result columns and rows of a call from the account's catalog entry."""
+
+
+class CampaignLookupTool(CampaignCatalogTool):
+    """`lookup_campaigns`: `(campaign_name, campaign_id)` pairs matching the requested names or ids."""
+
+    def _needs_catalog(self, args: BaseModel) -> bool:
+        return cast(CampaignLookupParams, args).match != "exact"
+
+    def _answer(self, entry: CatalogEntry, args: BaseModel) -> Tuple[List[str], List[Any]]:
+        lookup = cast(CampaignLookupParams, args)
+        return ["campaign_name", "campaign_id"], entry.lookup(lookup.campaign_names, lookup.campaign_ids, lookup.match)
+
+
+class RecentCampaignsTool(CampaignCatalogTool):
+    """`get_recent_campaigns`: the most recently active campaign names."""
+
+    def _answer(self, entry: CatalogEntry, args: BaseModel) -> Tuple[List[str], List[Any]]:
+        return ["campaign_name", "campaign_id", "latest_date"], entry.recent(
+            cast(CampaignRecentParams, args).num_campaigns
+        )
+
+
+# Tool classes by `SQLToolConfig.catalog`.
+CATALOG_TOOLS: Dict[str, Type[CampaignCatalogTool]] = {
+    "lookup": CampaignLookupTool,
+    "recent": RecentCampaignsTool,
+}
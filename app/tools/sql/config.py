@@ -1,7 +1,20 @@
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from ..schemas import AggregateKPIQueryArgs, CampaignLookupParams, CampaignRecentParams, KPIQueryArgs
+from ..budget import QueryBudget
+from ..concurrency import HEAVY, LIGHT, STANDARD
+from ..schemas import (
+    AggregateKPIQueryArgs,
+    BatchAggregateKPIQueryArgs,
+    CampaignLookupParams,
+    CampaignRecentParams,
+    KPIQueryArgs,
+    KPITimeseriesArgs,
+)
+from .variants import CAMPAIGN_FILTER, LOOKUP_FILTER, SEND_DATE_FILTER, SERIES_KEY, TIME_BUCKET, VariantDimension
+
+# Page size of row-heavy tools when a call sets none, so one MCP message never carries an unbounded result.
+DEFAULT_PAGE_SIZE = 1000
 
 
 @dataclass(frozen=True)
@@ -9,11 +22,101 @@ class SQLToolConfig:
     name: str
     args_schema: type
     output_schema: Optional[List[Dict[str, str]]] = None
+    cacheable: bool = True
+    output_format: str = "rows"
+    page_size: Optional[int] = None
+    batched: bool = False
+    day_cached: bool = False
+    # Answer from the campaign catalog with `CATALOG_TOOLS[catalog]` instead of running the query per call.
+    catalog: Optional[str] = None
+    # Prefetch this tool's results for the campaign ids a call returns (catalog tools; see `prefetch`).
+    prefetch: Optional[str] = None
+    variants: Tuple[VariantDimension, ...] = ()
+    cost_class: str = STANDARD
+    # Unset limits fall back to `QueryBudget.from_env()`.
+    budget: QueryBudget = QueryBudget()
+
+
+AGGREGATE_KPI_SCHEMA: List[Dict[str, str]] = [
+    {"column": "human_clicks", "type": "Int64"},
+    {"column": "bot_clicks", "type": "Int64"},
+    {"column": "unique_clicks", "type": "Int64"},
+    {"column": "unique_bot_clicks", "type": "Int64"},
+    {"column": "unique_human_clicks", "type": "Int64"},
+    {"column": "sent", "type": "Int64"},
+    {"column": "soft_bounces", "type": "Int64"},
+    {"column": "hard_bounces", "type": "Int64"},
+    {"column": "total_bounces", "type": "Int64"},
+    {"column": "unsubscribe", "type": "Int64"},
+    {"column": "complaints", "type": "Int64"},
+    {"column": "human_opens", "type": "Int64"},
+    {"column": "bot_opens", "type": "Int64"},
+    {"column": "unique_opens", "type": "Int64"},
+    {"column": "unique_bot_opens", "type": "Int64"},
+    {"column": "unique_human_opens", "type": "Int64"},
+    {"column": "human_readers", "type": "Int64"},
+    {"column": "bot_readers", "type": "Int64"},
+    {"column": "pre_cached_opens_also_readers", "type": "Int64"},
+    {"column": "messages_delivered", "type": "Int64"},
+    {"column": "bounce_rate", "type": "float64"},
+    {"column": "projected_open_denominator", "type": "float64"},
+    {"column": "projected_unique_open_rate", "type": "float64"},
+    {"column": "unique_human_click_rate", "type": "float64"},
+    {"column": "opt_out_rate", "type": "float64"},
+]
 
+# Columns of queries/fragments/kpi_columns.sql followed by kpi_rates.sql.
+CAMPAIGN_KPI_SCHEMA: List[Dict[str, str]] = [
+    {"column": "human_clicks", "type": "Int64"},
+    {"column": "bot_clicks", "type": "Int64"},
+    {"column": "unique_clicks", "type": "Int64"},
+    {"column": "unique_human_clicks", "type": "Int64"},
+    {"column": "sent", "type": "Int64"},
+    {"column": "total_sends", "type": "Int64"},
+    {"column": "soft_bounces", "type": "Int64"},
+    {"column": "hard_bounces", "type": "Int64"},
+    {"column": "unsubscribe", "type": "Int64"},
+    {"column": "total_opens", "type": "Int64"},
+    {"column": "total_clicks", "type": "Int64"},
+    {"column": "human_opens", "type": "Int64"},
+    {"column": "bot_opens", "type": "Int64"},
+    {"column": "unique_opens", "type": "Int64"},
+    {"column": "unique_bot_opens", "type": "Int64"},
+    {"column": "unique_human_opens", "type": "Int64"},
+    {"column": "complaints", "type": "Int64"},
+    {"column": "unique_pre_cached_opens", "type": "Int64"},
+    {"column": "human_readers", "type": "Int64"},
+    {"column": "pre_cached_openers_also_readers", "type": "Int64"},
+    {"column": "complaint_rate", "type": "float64"},
+    {"column": "open_rate", "type": "float64"},
+    {"column": "unique_open_rate", "type": "float64"},
+    {"column": "click_rate", "type": "float64"},
+    {"column": "unique_click_rate", "type": "float64"},
+    {"column": "bounce_rate", "type": "float64"},
+    {"column": "projected_open_rate", "type": "float64"},
+]
 
 CAMPAIGN_TOOL_CONFIGS: List[SQLToolConfig] = [
-    SQLToolConfig("get_recent_campaigns", CampaignRecentParams, None),
-    SQLToolConfig("lookup_campaigns", CampaignLookupParams, None),
+    SQLToolConfig(
+        "get_recent_campaigns",
+        CampaignRecentParams,
+        None,
+        cacheable=False,
+        page_size=DEFAULT_PAGE_SIZE,
+        catalog="recent",
+        prefetch="get_campaign_metrics",
+    ),
+    SQLToolConfig(
+        "lookup_campaigns",
+        CampaignLookupParams,
+        None,
+        cacheable=False,
+        catalog="lookup",
+        prefetch="get_campaign_metrics",
+        variants=(LOOKUP_FILTER,),
+        cost_class=LIGHT,
+        budget=QueryBudget(timeout=15),
+    ),
     SQLToolConfig(
         name="get_campaign_metrics",
         args_schema=KPIQueryArgs,
@@ -22,64 +125,44 @@ CAMPAIGN_TOOL_CONFIGS: List[SQLToolConfig] = [
             {"column": "campaign_id", "type": "Int64"},
             {"column": "anyLast(campaign_name)", "type": "string"},
             {"column": "date", "type": "datetime64[ns]"},
-            {"column": "human_clicks", "type": "Int64"},
-            {"column": "bot_clicks", "type": "Int64"},
-            {"column": "unique_clicks", "type": "Int64"},
-            {"column": "unique_human_clicks", "type": "Int64"},
-            {"column": "sent", "type": "Int64"},
-            {"column": "total_sends", "type": "Int64"},
-            {"column": "soft_bounces", "type": "Int64"},
-            {"column": "hard_bounces", "type": "Int64"},
-            {"column": "unsubscribe", "type": "Int64"},
-            {"column": "total_opens", "type": "Int64"},
-            {"column": "total_clicks", "type": "Int64"},
-            {"column": "human_opens", "type": "Int64"},
-            {"column": "bot_opens", "type": "Int64"},
-            {"column": "unique_opens", "type": "Int64"},
-            {"column": "unique_bot_opens", "type": "Int64"},
-            {"column": "unique_human_opens", "type": "Int64"},
-            {"column": "complaints", "type": "Int64"},
-            {"column": "unique_pre_cached_opens", "type": "Int64"},
-            {"column": "human_readers", "type": "Int64"},
-            {"column": "pre_cached_openers_also_readers", "type": "Int64"},
-            {"column": "complaint_rate", "type": "float64"},
-            {"column": "open_rate", "type": "float64"},
-            {"column": "unique_open_rate", "type": "float64"},
-            {"column": "click_rate", "type": "float64"},
-            {"column": "unique_click_rate", "type": "float64"},
-            {"column": "bounce_rate", "type": "float64"},
-            {"column": "projected_open_rate", "type": "float64"},
+            *CAMPAIGN_KPI_SCHEMA,
+        ],
+        page_size=DEFAULT_PAGE_SIZE,
+        day_cached=True,
+        variants=(SEND_DATE_FILTER, CAMPAIGN_FILTER),
+        cost_class=HEAVY,
+    ),
+    SQLToolConfig(
+        name="get_campaign_metrics_timeseries",
+        args_schema=KPITimeseriesArgs,
+        output_schema=[
+            {"column": "bucket_start", "type": "datetime64[ns]"},
+            {"column": "campaign_id", "type": "Int64"},
+            {"column": "campaign_name", "type": "string"},
+            {"column": "bucket_size", "type": "Int64"},
+            *CAMPAIGN_KPI_SCHEMA,
         ],
+        page_size=DEFAULT_PAGE_SIZE,
+        variants=(SEND_DATE_FILTER, CAMPAIGN_FILTER, TIME_BUCKET, SERIES_KEY),
+        cost_class=HEAVY,
     ),
     SQLToolConfig(
         name="get_aggregate_campaign_metrics",
         args_schema=AggregateKPIQueryArgs,
+        output_schema=AGGREGATE_KPI_SCHEMA,
+        cost_class=HEAVY,
+    ),
+    SQLToolConfig(
+        name="get_batch_aggregate_campaign_metrics",
+        args_schema=BatchAggregateKPIQueryArgs,
         output_schema=[
-            {"column": "human_clicks", "type": "Int64"},
-            {"column": "bot_clicks", "type": "Int64"},
-            {"column": "unique_clicks", "type": "Int64"},
-            {"column": "unique_bot_clicks", "type": "Int64"},
-            {"column": "unique_human_clicks", "type": "Int64"},
-            {"column": "sent", "type": "Int64"},
-            {"column": "soft_bounces", "type": "Int64"},
-            {"column": "hard_bounces", "type": "Int64"},
-            {"column": "total_bounces", "type": "Int64"},
-            {"column": "unsubscribe", "type": "Int64"},
-            {"column": "complaints", "type": "Int64"},
-            {"column": "human_opens", "type": "Int64"},
-            {"column": "bot_opens", "type": "Int64"},
-            {"column": "unique_opens", "type": "Int64"},
-            {"column": "unique_bot_opens", "type": "Int64"},
-            {"column": "unique_human_opens", "type": "Int64"},
-            {"column": "human_readers", "type": "Int64"},
-            {"column": "bot_readers", "type": "Int64"},
-            {"column": "messages_delivered", "type": "Int64"},
-            {"column": "bounce_rate", "type": "float64"},
-            {"column": "projected_open_denominator", "type": "float64"},
-            {"column": "projected_unique_open_rate", "type": "float64"},
-            {"column": "unique_human_click_rate", "type": "float64"},
-            {"column": "opt_out_rate", "type": "float64"},
+            {"column": "account_id", "type": "string"},
+            {"column": "start_date", "type": "date"},
+            {"column": "end_date", "type": "date"},
+            *AGGREGATE_KPI_SCHEMA,
         ],
+        batched=True,
+        cost_class=HEAVY,
     ),
 ]
 
@@ -0,0 +1,373 @@
+"""Day-bucketed partial aggregates for `get_campaign_metrics`.
+
+A date-range request is answered from per-account, per-campaign, per-day
+partial aggregates: the additive counters (sends, clicks, opens, bounces,
+unsubscribes, complaints) and the `uniq` states behind every unique count.
+Closed days are kept in `CampaignDayCache`; only days that are missing,
+expired or still open (recent send days keep receiving opens and clicks)
+are queried, with `get_campaign_metrics_daily.sql`. The days are then
+merged per campaign (counters summed, sketches merged with `uniqMerge`
+semantics) and the derived counts and rates are computed exactly as
+`get_campaign_metrics.sql` computes them.
+
+Ranges longer than `max_days` (e.g. the all-time defaults) bypass the day
+cache and run the original query.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, cast
+
+from pydantic import BaseModel
+
+from ..clickhouse import to_pyformat
+from ..schemas import KPIQueryArgs
+from .base import SQLTool
+from .pagination import Page, slice_page
+from .uniq import UniqSketch
+
+COUNTERS = (
+    "human_clicks",
+    "bot_clicks",
+    "sent",
+    "soft_bounces",
+    "hard_bounces",
+    "unsubscribe",
+    "total_opens",
+    "total_clicks",
+    "human_opens",
+    "bot_opens",
+    "complaints",
+)
+SKETCHES = (
+    "clicks_state",
+    "human_clicks_state",
+    "opens_state",
+    "bot_opens_state",
+    "human_opens_state",
+    "human_readers_state",
+    "opens_or_human_clicks_state",
+)
+
+
+@dataclass(frozen=True)
+class DayAggregate:
+    """Partial aggregates of one campaign on one send day."""
+
+    campaign_name: str
+    counters: Tuple[int, ...]
+    sketches: Tuple[UniqSketch, ...]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the aggregate."""
+        return 200 + sum(sketch.nbytes for sketch in self.sketches)
+
+
+DayRows = Dict[Any, DayAggregate]
+
+
+def _to_date(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def parse_day_rows(columns: List[str], rows: List[Any]) -> Dict[date, DayRows]:
+    """Group rows of the daily query by day and campaign."""
+    index = {column: i for i, column in enumerate(columns)}
+    counters = [index[name] for name in COUNTERS]
+    sketches = [index[name] for name in SKETCHES]
+    days: Dict[date, DayRows] = {}
+    for row in rows:
+        days.setdefault(_to_date(row[index["day"]]), {})[row[index["campaign_id"]]] = DayAggregate(
+            campaign_name=row[index["campaign_name"]],
+            counters=tuple(int(row[i] or 0) for i in counters),
+            sketches=tuple(UniqSketch.from_hex(row[i]) for i in sketches),
+        )
+    return days
+
+
+def _ratio(numerator: int, denominator: int) -> Optional[float]:
+    """`numerator / nullIf(denominator, 0)` as ClickHouse evaluates it."""
+    return numerator / denominator if denominator != 0 else None
+
+
+def kpi_row(campaign_id: Any, aggregates: List[Tuple[date, DayAggregate]]) -> Tuple[Any, ...]:
+    """Merge one campaign's day aggregates into a `get_campaign_metrics` row (in `output_schema` order)."""
+    aggregates = sorted(aggregates, key=lambda item: item[0])
+    last_day, last = aggregates[-1]
+    totals = dict(zip(COUNTERS, (sum(values) for values in zip(*(agg.counters for _, agg in aggregates)))))
+    uniques = {
+        name: UniqSketch.merge([agg.sketches[i] for _, agg in aggregates]).cardinality()
+        for i, name in enumerate(SKETCHES)
+    }
+
+    sent = totals["sent"]
+    soft_bounces, hard_bounces = totals["soft_bounces"], totals["hard_bounces"]
+    unique_pre_cached_opens = uniques["bot_opens_state"]
+    human_readers = uniques["human_readers_state"]
+    pre_cached_openers_also_readers = unique_pre_cached_opens + human_readers - uniques["opens_or_human_clicks_state"]
+    delivered = sent - hard_bounces - soft_bounces
+    return (
+        "kpi",
+        campaign_id,
+        last.campaign_name,
+        last_day,
+        totals["human_clicks"],
+        totals["bot_clicks"],
+        uniques["clicks_state"],
+        uniques["human_clicks_state"],
+        sent,
+        sent,
+        soft_bounces,
+        hard_bounces,
+        totals["unsubscribe"],
+        totals["total_opens"],
+        totals["total_clicks"],
+        totals["human_opens"],
+        totals["bot_opens"],
+        uniques["opens_state"],
+        uniques["bot_opens_state"],
+        uniques["human_opens_state"],
+        totals["complaints"],
+        unique_pre_cached_opens,
+        human_readers,
+        pre_cached_openers_also_readers,
+        _ratio(totals["complaints"], delivered),
+        _ratio(totals["total_opens"], delivered),
+        _ratio(uniques["human_opens_state"], sent),
+        _ratio(totals["human_clicks"], sent),
+        _ratio(uniques["human_clicks_state"], sent),
+        _ratio(soft_bounces + hard_bounces, sent),
+        _ratio(human_readers, delivered - unique_pre_cached_opens + pre_cached_openers_also_readers),
+    )
+
+
+class CampaignDayCache:
+    """Memory-bounded LRU of closed days' partial aggregates, keyed by account and day.
+
+    Attributes:
+        max_bytes (int): Upper bound on the approximate memory of cached days.
+        ttl (float): Seconds a closed day is served before it is queried again.
+        open_days (int): Days up to this many days before today are never cached.
+        max_days (int): Longest range (in days) answered from day buckets.
+    """
+
+    def __init__(
+        self, max_bytes: int = 128 * 1024 * 1024, ttl: float = 86400.0, open_days: int = 7, max_days: int = 400
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.open_days = open_days
+        self.max_days = max_days
+        self._days: OrderedDict[Tuple[str, date], Tuple[float, DayRows, int]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> CampaignDayCache:
+        """Create a cache from environment variables.
+
+        Reads the following optional environment variables:
+            CAMPAIGN_DAY_CACHE_MAX_BYTES (default 128 MiB)
+            CAMPAIGN_DAY_CACHE_TTL (seconds, default 86400)
+            CAMPAIGN_DAY_CACHE_OPEN_DAYS (default 7)
+            CAMPAIGN_DAY_CACHE_MAX_DAYS (default 400; 0 disables the day cache)
+        """
+        return cls(
+            max_bytes=int(os.environ.get("CAMPAIGN_DAY_CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+            ttl=float(os.environ.get("CAMPAIGN_DAY_CACHE_TTL", "86400")),
+            open_days=int(os.environ.get("CAMPAIGN_DAY_CACHE_OPEN_DAYS", "7")),
+            max_days=int(os.environ.get("CAMPAIGN_DAY_CACHE_MAX_DAYS", "400")),
+        )
+
+    def covers(self, start: date, end: date) -> bool:
+        """Return whether a range is short enough to be answered from day buckets."""
+        return start <= end and (end - start).days < self.max_days
+
+    def lookup(
+        self, account_id: str, start: date, end: date, today: Optional[date] = None, max_runs: int = 4
+    ) -> Tuple[Dict[date, DayRows], List[Tuple[date, date]]]:
+        """Return the cached days of a range and the day runs that have to be queried.
+
+        Missing days are grouped into contiguous runs; more than `max_runs`
+        runs are collapsed into one covering range, and cached days inside
+        a queried run are not returned.
+        """
+        closed_until = (today or date.today()) - timedelta(days=self.open_days)
+        now = time.time()
+        cached: Dict[date, DayRows] = {}
+        missing: List[date] = []
+        with self._lock:
+            for offset in range((end - start).days + 1):
+                day = start + timedelta(days=offset)
+                entry = self._days.get((account_id, day)) if day <= closed_until else None
+                if entry is not None and entry[0] > now:
+                    self._days.move_to_end((account_id, day))
+                    cached[day] = entry[1]
+                else:
+                    missing.append(day)
+            self._hits += len(cached)
+            self._misses += len(missing)
+
+        runs: List[Tuple[date, date]] = []
+        for day in missing:
+            if runs and runs[-1][1] == day - timedelta(days=1):
+                runs[-1] = (runs[-1][0], day)
+            else:
+                runs.append((day, day))
+        if len(runs) > max_runs:
+            runs = [(runs[0][0], runs[-1][1])]
+            cached = {day: rows for day, rows in cached.items() if not runs[0][0] <= day <= runs[0][1]}
+        return cached, runs
+
+    def store(
+        self, account_id: str, start: date, end: date, days: Dict[date, DayRows], today: Optional[date] = None
+    ) -> None:
+        """Cache the queried days of `start`..`end` that are closed, including days without data."""
+        closed_until = (today or date.today()) - timedelta(days=self.open_days)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for offset in range((min(end, closed_until) - start).days + 1):
+                day = start + timedelta(days=offset)
+                rows = days.get(day, {})
+                size = 100 + sum(aggregate.nbytes for aggregate in rows.values())
+                key = (account_id, day)
+                if key in self._days:
+                    self._size -= self._days.pop(key)[2]
+                if size > self.max_bytes:
+                    continue
+                self._days[key] = (expires_at, rows, size)
+                self._size += size
+            while self._size > self.max_bytes:
+                _, (_, _, size) = self._days.popitem(last=False)
+                self._size -= size
+                self._evictions += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the cached day count, their approximate size, day hits, day misses and evictions."""
+        with self._lock:
+            return {
+                "entries": len(self._days),
+                "bytes": self._size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+class DayCachedSQLTool(SQLTool):
+    """`get_campaign_metrics`, answered from day buckets for ranges the day cache covers.
+
+    Rows match the original query's (one per campaign, ordered by
+    `campaign_id`); the call's result shape and page are applied to them and
+    no progress notifications are sent on the day-bucket path.
+    """
+
+    def __init__(self, *args: Any, day_query: str, day_cache: Optional[CampaignDayCache] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.day_query = day_query
+        self.day_cache = day_cache if day_cache is not None else CampaignDayCache.from_env()
+        self._async_day_query = to_pyformat(day_query)
+
+    def _fetch(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Merge cached and freshly queried days, or run the original query for uncovered ranges."""
+        window = self._window(args)
+        if window is None:
+            return super()._fetch(args, page, query, params)
+
+        kpi = cast(KPIQueryArgs, args)
+        cached, missing = self.day_cache.lookup(kpi.account_id, *window)
+        days = dict(cached)
+        for start, end in missing:
+            day_params = self._day_params(kpi, start, end)
+            columns, _, rows = self._run_flight_sync(day_params, lambda: self._execute(self.day_query, day_params))
+            days.update(self._store_days(kpi, start, end, columns, rows))
+        return self._rollup(kpi, page, days)
+
+    async def _afetch(
+        self, args: BaseModel, page: Optional[Page], query: str, params: Dict[str, Any]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Async counterpart of `_fetch`; missing day runs are queried concurrently."""
+        window = self._window(args)
+        if window is None:
+            return await super()._afetch(args, page, query, params)
+
+        kpi = cast(KPIQueryArgs, args)
+        cached, missing = self.day_cache.lookup(kpi.account_id, *window)
+
+        async def fetch(start: date, end: date) -> Dict[date, DayRows]:
+            day_params = self._day_params(kpi, start, end)
+            columns, _, rows = await self._run_flight(day_params, lambda: self._astream_days(day_params))
+            return self._store_days(kpi, start, end, columns, rows)
+
+        days = dict(cached)
+        for fetched in await asyncio.gather(*(fetch(start, end) for start, end in missing)):
+            days.update(fetched)
+        return self._rollup(kpi, page, days)
+
+    def _window(self, args: BaseModel) -> Optional[Tuple[date, date]]:
+        """Return the requested date range when the day cache covers it."""
+        kpi = cast(KPIQueryArgs, args)
+        try:
+            start, end = _to_date(kpi.start_date), _to_date(kpi.end_date)
+        except ValueError:
+            return None
+        return (start, end) if self.day_cache.covers(start, end) else None
+
+    @staticmethod
+    def _day_params(args: KPIQueryArgs, start: date, end: date) -> Dict[str, Any]:
+        return {"account_id": args.account_id, "start_date": start.isoformat(), "end_date": end.isoformat()}
+
+    def _run_flight_sync(self, day_params: Dict[str, Any], fn: Any) -> Any:
+        if self.flights is None:
+            return fn()
+        return self.flights.run_sync(self._flight_key({"days": day_params}), fn)
+
+    async def _run_flight(self, day_params: Dict[str, Any], fn: Any) -> Any:
+        if self.flights is None:
+            return await fn()
+        return await self.flights.run(self._flight_key({"days": day_params}), fn)
+
+    async def _astream_days(self, day_params: Dict[str, Any]) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Stream the daily query from the async client, without progress notifications."""
+        return await self._astream(self._async_day_query, day_params)
+
+    def _store_days(
+        self, args: KPIQueryArgs, start: date, end: date, columns: List[str], rows: List[Any]
+    ) -> Dict[date, DayRows]:
+        days = parse_day_rows(columns, rows)
+        self.day_cache.store(args.account_id, start, end, days)
+        return days
+
+    def _rollup(
+        self, args: KPIQueryArgs, page: Optional[Page], days: Dict[date, DayRows]
+    ) -> Tuple[List[str], Dict[str, str], List[Any]]:
+        """Merge day buckets per requested campaign into result rows."""
+        wanted = None if args.campaign_id in (None, ["ALL"]) else {str(c) for c in args.campaign_id}
+        by_campaign: Dict[Any, List[Tuple[date, DayAggregate]]] = {}
+        for day, campaigns in days.items():
+            for campaign_id, aggregate in campaigns.items():
+                if wanted is None or str(campaign_id) in wanted:
+                    by_campaign.setdefault(campaign_id, []).append((day, aggregate))
+
+        columns = [item["column"] for item in self.output_schema or []]
+        rows = [kpi_row(campaign_id, by_campaign[campaign_id]) for campaign_id in sorted(by_campaign)]
+        shape = self._shape(args)
+        if shape is not None:
+            columns, rows = shape.apply(columns, rows)
+        return columns, {}, slice_page(rows, page)
@@ -0,0 +1,277 @@
+"""Result payload encodings for SQL tools.
+
+Four output formats are supported:
+
+- ``rows``: the original payload, a list of row dicts with every value
+  stringified. Kept as the default for backwards compatibility.
+- ``columnar``: one JSON array per column holding native JSON numbers,
+  booleans, ISO-8601 dates and strings typed by ``column_types``.
+- ``arrow``: a zstd-compressed Arrow IPC stream (base64 encoded) that
+  clients load straight into Arrow/pandas without per-cell parsing.
+- ``handle``: no rows at all, only the column metadata and row count;
+  the rows stay server-side behind the payload's ``result_id``.
+
+`payload_to_dataframe` decodes the row-carrying formats back into a typed
+pandas DataFrame, and `rows_to_dataframe` builds the same frame directly
+from query rows.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow as pa
+
+OUTPUT_FORMATS = ("rows", "columnar", "arrow", "handle")
+
+_ARROW_TYPES: Dict[str, pa.DataType] = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "bool": pa.bool_(),
+    "date": pa.date32(),
+    "datetime": pa.timestamp("ns"),
+    "string": pa.string(),
+}
+
+
+def column_kind(type_name: str) -> str:
+    """Map a pandas or ClickHouse type name onto one of the encoder's value kinds."""
+    kind = type_name.strip().lower()
+    for wrapper in ("nullable(", "lowcardinality("):
+        while kind.startswith(wrapper) and kind.endswith(")"):
+            kind = kind.removeprefix(wrapper).removesuffix(")")
+    if kind.startswith(("int", "uint")):
+        return "int"
+    if kind.startswith(("float", "decimal", "double")):
+        return "float"
+    if kind.startswith("datetime"):
+        return "datetime"
+    if kind.startswith("date"):
+        return "date"
+    if kind in ("bool", "boolean"):
+        return "bool"
+    return "string"
+
+
+def _to_int(value: Any) -> Any:
+    """Convert to int, mapping unparseable values to None."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Any) -> Any:
+    """Convert to a finite float, mapping NaN, infinities and unparseable values to None."""
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return None
+    return result if math.isfinite(result) else None
+
+
+def _to_datetime(value: Any) -> Any:
+    """Convert dates and ISO strings to datetimes."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _to_date(value: Any) -> Any:
+    """Convert datetimes and ISO strings to dates."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _to_bool(value: Any) -> Any:
+    """Convert ClickHouse boolean representations to bool."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true")
+    return bool(value)
+
+
+_CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    "int": _to_int,
+    "float": _to_float,
+    "bool": _to_bool,
+    "date": _to_date,
+    "datetime": _to_datetime,
+    "string": str,
+}
+
+
+def _column_kinds(columns: List[str], column_types: List[Dict[str, str]]) -> List[str]:
+    """Return one value kind per column, positionally aligned with `columns`."""
+    kinds = [column_kind(str(item.get("type", "string"))) for item in column_types]
+    return (kinds + ["string"] * len(columns))[: len(columns)]
+
+
+def _typed_columns(
+    columns: List[str], column_types: List[Dict[str, str]], rows: Sequence[Sequence[Any]]
+) -> List[List[Any]]:
+    """Transpose rows into per-column lists of natively typed values."""
+    kinds = _column_kinds(columns, column_types)
+    typed = []
+    for index, kind in enumerate(kinds):
+        convert = _CONVERTERS[kind]
+        typed.append([None if row[index] is None else convert(row[index]) for row in rows])
+    return typed
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize values `json` does not handle natively."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def encode_rows(
+    columns: List[str],
+    column_types: List[Dict[str, str]],
+    rows: Sequence[Sequence[Any]],
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Encode rows as the legacy list of stringified row dicts."""
+    data = [dict(zip(columns, [str(value) for value in row])) for row in rows]
+    return json.dumps(
+        {"columns": columns, "column_types": column_types, "data": data, "row_count": len(data), **(extra or {})}
+    )
+
+
+def encode_columnar(
+    columns: List[str],
+    column_types: List[Dict[str, str]],
+    rows: Sequence[Sequence[Any]],
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Encode rows as typed column arrays."""
+    data = dict(zip(columns, _typed_columns(columns, column_types, rows)))
+    return json.dumps(
+        {
+            "format": "columnar",
+            "columns": columns,
+            "column_types": column_types,
+            "data": data,
+            "row_count": len(rows),
+            **(extra or {}),
+        },
+        default=_json_default,
+    )
+
+
+def _arrow_table(columns: List[str], column_types: List[Dict[str, str]], rows: Sequence[Sequence[Any]]) -> pa.Table:
+    """Build an Arrow table with one typed array per column."""
+    kinds = _column_kinds(columns, column_types)
+    arrays = [
+        pa.array(values, type=_ARROW_TYPES[kind])
+        for values, kind in zip(_typed_columns(columns, column_types, rows), kinds)
+    ]
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+def encode_arrow(
+    columns: List[str],
+    column_types: List[Dict[str, str]],
+    rows: Sequence[Sequence[Any]],
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Encode rows as a base64 Arrow IPC stream wrapped in a small JSON envelope."""
+    table = _arrow_table(columns, column_types, rows)
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return json.dumps(
+        {
+            "format": "arrow",
+            "columns": columns,
+            "column_types": column_types,
+            "row_count": len(rows),
+            "arrow_ipc_base64": base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii"),
+            **(extra or {}),
+        }
+    )
+
+
+def encode_handle(
+    columns: List[str],
+    column_types: List[Dict[str, str]],
+    rows: Sequence[Sequence[Any]],
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Encode only the result metadata, leaving the rows server-side."""
+    return json.dumps(
+        {"format": "handle", "columns": columns, "column_types": column_types, "row_count": len(rows), **(extra or {})}
+    )
+
+
+_ENCODERS: Dict[str, Callable[..., str]] = {
+    "rows": encode_rows,
+    "columnar": encode_columnar,
+    "arrow": encode_arrow,
+    "handle": encode_handle,
+}
+
+
+def encode_payload(
+    output_format: str,
+    columns: List[str],
+    column_types: List[Dict[str, str]],
+    rows: Sequence[Sequence[Any]],
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Encode rows in the requested output format, merging `extra` fields into the envelope."""
+    if output_format not in _ENCODERS:
+        raise ValueError(f"Unknown output format: {output_format}. Expected one of {OUTPUT_FORMATS}")
+    return _ENCODERS[output_format](columns, column_types, rows, extra)
+
+
+def rows_to_dataframe(
+    columns: List[str], column_types: List[Dict[str, str]], rows: Sequence[Sequence[Any]]
+) -> pd.DataFrame:
+    """Build a typed DataFrame from query rows."""
+    return _arrow_table(columns, column_types, rows).to_pandas()
+
+
+def payload_to_dataframe(payload: Union[str, Dict[str, Any]]) -> pd.DataFrame:
+    """Decode a SQL tool payload in any output format into a typed DataFrame."""
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    assert isinstance(payload, dict)
+
+    output_format = payload.get("format", "rows")
+    if output_format == "handle":
+        raise ValueError("Handle payloads carry no rows; pass their result_id to an analysis tool instead")
+    if output_format == "arrow":
+        buffer = base64.b64decode(payload["arrow_ipc_base64"])
+        return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+    columns = payload.get("columns", [])
+    df = pd.DataFrame(payload.get("data", []), columns=columns or None)
+    kinds = _column_kinds(list(df.columns), payload.get("column_types", []))
+    for column, kind in zip(list(df.columns), kinds):
+        if kind == "int":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
+        elif kind == "float":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+        elif kind in ("date", "datetime"):
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
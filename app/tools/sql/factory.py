@@ -1,12 +1,23 @@
 import logging
+import os
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional, Type
 
 from langchain_community.utilities import SQLDatabase
 
+from ..budget import QueryBudget
+from ..clickhouse import AsyncClickHouseClient, EnginePool
+from ..concurrency import ConcurrencyLimiter, limiter_from_env
 from ..registry import get_registry
+from ..results import ResultStore
+from ..singleflight import SingleFlight
 from .base import SQLTool
+from .batch import BatchSQLTool
+from .cache import ResultCache
+from .catalog import CATALOG_TOOLS, CampaignCatalog, CampaignCatalogTool
 from .config import CONFIG_MAP
+from .daily import CampaignDayCache, DayCachedSQLTool
+from .prefetch import MetricsPrefetcher
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +25,33 @@ logger = logging.getLogger(__name__)
 class SQLToolFactory:
     """Creates SQL tools from query and description files."""
 
-    def __init__(self, db: SQLDatabase):
+    def __init__(
+        self,
+        db: SQLDatabase,
+        async_client: Optional[AsyncClickHouseClient] = None,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        cache: Optional[ResultCache] = None,
+        chunk_size: Optional[int] = None,
+        store: Optional[ResultStore] = None,
+        pool: Optional[EnginePool] = None,
+        flights: Optional[SingleFlight] = None,
+        day_cache: Optional[CampaignDayCache] = None,
+        budget: Optional[QueryBudget] = None,
+        catalog: Optional[CampaignCatalog] = None,
+        prefetcher: Optional[MetricsPrefetcher] = None,
+    ):
         self.db = db
+        self.async_client = async_client
+        self.limiter = limiter if limiter is not None else limiter_from_env()
+        self.cache = cache if cache is not None else ResultCache.from_env()
+        self.chunk_size = chunk_size or int(os.environ.get("SQL_TOOL_CHUNK_ROWS", "1000"))
+        self.store = store
+        self.pool = pool
+        self.flights = flights if flights is not None else SingleFlight.from_env()
+        self.day_cache = day_cache if day_cache is not None else CampaignDayCache.from_env()
+        self.budget = budget if budget is not None else QueryBudget.from_env()
+        self.catalog = catalog if catalog is not None else CampaignCatalog.from_env()
+        self.prefetcher = prefetcher if prefetcher is not None else MetricsPrefetcher.from_env()
         self.sql_dir = Path(__file__).parent / "queries"
         self.desc_dir = Path(__file__).parent / "descriptions"
 
@@ -33,17 +69,44 @@ class SQLToolFactory:
         if not desc_file.exists():
             raise FileNotFoundError(f"Description file not found: {desc_file}")
 
-        return SQLTool.from_files(
+        tool_class: Type[SQLTool] = BatchSQLTool if config.batched else SQLTool
+        extra: Dict[str, Any] = {}
+        if config.day_cached:
+            day_file = self.sql_dir / f"{name}_daily.sql"
+            if not day_file.exists():
+                raise FileNotFoundError(f"SQL file not found: {day_file}")
+            tool_class = DayCachedSQLTool
+            extra = {"day_query": day_file.read_text().strip(), "day_cache": self.day_cache}
+        if config.catalog is not None:
+            catalog_file = self.sql_dir / "campaign_catalog.sql"
+            if not catalog_file.exists():
+                raise FileNotFoundError(f"SQL file not found: {catalog_file}")
+            tool_class = CATALOG_TOOLS[config.catalog]
+            extra = {"catalog_query": catalog_file.read_text().strip(), "catalog": self.catalog}
+        return tool_class.from_files(
             name=name,
             args_schema=config.args_schema,
             sql_file=str(sql_file),
             description_file=str(desc_file),
             db=self.db,
             output_schema=config.output_schema,
+            async_client=self.async_client,
+            limiter=self.limiter,
+            cache=self.cache if config.cacheable else None,
+            output_format=config.output_format,
+            page_size=config.page_size,
+            chunk_size=self.chunk_size,
+            store=self.store,
+            pool=self.pool,
+            flights=self.flights,
+            variants=config.variants,
+            cost_class=config.cost_class,
+            budget=config.budget.merged(self.budget),
+            **extra,
         )
 
     def create_all_tools(self) -> List[SQLTool]:
-        """Create all configured SQL tools."""
+        """Create all configured SQL tools, connecting discovery tools to the tools they prefetch."""
         tools = []
         for name in CONFIG_MAP.keys():
             try:
@@ -51,8 +114,21 @@ class SQLToolFactory:
                 tools.append(tool)
             except Exception as e:
                 logger.error(f"Failed to create SQL tool {name}: {e}")
+        self._connect_prefetch(tools)
         return tools
 
+    def _connect_prefetch(self, tools: List[SQLTool]) -> None:
+        """Point each catalog tool configured with `prefetch` at its target, which reports calls to the prefetcher."""
+        if not self.prefetcher.enabled:
+            return
+        by_name = {tool.name: tool for tool in tools}
+        for tool in tools:
+            target = by_name.get(CONFIG_MAP[tool.name].prefetch or "")
+            if target is None or not isinstance(tool, CampaignCatalogTool):
+                continue
+            target.prefetcher = self.prefetcher
+            tool.prefetch_target = target
+
     def autodiscover_and_register(self) -> List[SQLTool]:
         """Discover SQL files and register matching tools."""
         registry = get_registry()
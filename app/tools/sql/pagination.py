@@ -0,0 +1,84 @@
+"""Cursor-based pagination for SQL tools.
+
+A paginated call runs the tool's query wrapped in `LIMIT/OFFSET`, fetching
+one row beyond the page to learn whether more remain. The continuation
+cursor handed back to the client is opaque: a base64 token carrying the
+next offset, the page size and a fingerprint of the bound arguments, so a
+cursor cannot be replayed against a different query.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+LIMIT_PARAM = "page_limit"
+OFFSET_PARAM = "page_offset"
+
+
+@dataclass(frozen=True)
+class Page:
+    """Bounds of one requested page."""
+
+    size: int
+    offset: int = 0
+
+    def bind_params(self) -> Dict[str, int]:
+        """Return the LIMIT/OFFSET bind parameters, including one look-ahead row."""
+        return {LIMIT_PARAM: self.size + 1, OFFSET_PARAM: self.offset}
+
+
+def paginate_query(query: str) -> str:
+    """Wrap a query so it returns a single page selected by the LIMIT/OFFSET binds."""
+    body = query.strip().rstrip(";")
+    return f"SELECT * FROM (\n{body}\n)\nLIMIT :{LIMIT_PARAM} OFFSET :{OFFSET_PARAM}"
+
+
+def slice_page(rows: List[Any], page: Optional[Page]) -> List[Any]:
+    """Cut one page (plus the look-ahead row) from rows assembled in Python."""
+    if page is None:
+        return rows
+    offset, limit = page.offset, page.size + 1
+    return rows[offset:][:limit]
+
+
+def fingerprint(tool_name: str, params: Dict[str, Any]) -> str:
+    """Return a short digest identifying a tool call's bound arguments."""
+    normalized = json.dumps({"tool": tool_name, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(page: Page, digest: str) -> str:
+    """Encode the cursor that resumes after `page`."""
+    token = json.dumps({"fp": digest, "offset": page.offset + page.size, "size": page.size}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def resolve_page(
+    cursor: Optional[str], page_size: Optional[int], default_size: Optional[int], digest: str
+) -> Optional[Page]:
+    """Return the page a call asks for, or None when the call is not paginated.
+
+    The page size is taken from the call, then the cursor, then the tool
+    default.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for different arguments.
+    """
+    offset, cursor_size = 0, None
+    if cursor:
+        try:
+            state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            offset, cursor_size, cursor_digest = int(state["offset"]), int(state["size"]), state["fp"]
+        except (binascii.Error, ValueError, KeyError, TypeError, UnicodeError):
+            raise ValueError("Invalid cursor") from None
+        if cursor_digest != digest or offset < 0:
+            raise ValueError("Cursor does not match this query; restart without a cursor")
+
+    size = page_size or cursor_size or default_size
+    if size is None:
+        return None
+    return Page(size=size, offset=offset)
@@ -0,0 +1,227 @@
+"""Speculative metric prefetch after campaign discovery calls.
+
+Agents usually follow `get_recent_campaigns` or `lookup_campaigns` with
+`get_campaign_metrics` for exactly the campaign ids it returned: two
+serial LLM turns and two serial queries. A discovery tool configured with
+`SQLToolConfig.prefetch` hands the ids it returned to a `MetricsPrefetcher`,
+which calls the metrics tool in the background with those ids (and its
+default date range). The result lands in the result cache and the result
+store; a follow-up call with the same arguments is served from them, or
+joins the prefetch's query through single flight while it still runs.
+
+Prefetching is rate-limited: a per-minute budget, a cap on prefetches in
+flight, and none while callers are queued for an execution slot. An
+account has at most one prefetch. A newer prefetch for the account, or a
+metrics call for it with other arguments, cancels a running one (a caller
+that already joined its query keeps the query running). Whether each
+prefetch was used by a later call, expired unused, was cancelled or
+failed is counted, so the feature can be tuned from the snapshot.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Set
+
+if TYPE_CHECKING:
+    from .base import SQLTool
+
+logger = logging.getLogger(__name__)
+
+# Set inside prefetch tasks so the target tool does not count its own prefetch as a follow-up call.
+_prefetching: ContextVar[bool] = ContextVar("sql_prefetching", default=False)
+
+
+@dataclass
+class _Prefetch:
+    """The latest prefetch of one account."""
+
+    digest: str
+    loop: asyncio.AbstractEventLoop
+    task: Optional[asyncio.Task[Any]] = None
+    # When a finished prefetch stops waiting for its follow-up call (None while running).
+    expires_at: Optional[float] = None
+
+
+class MetricsPrefetcher:
+    """Warms a metrics tool's result for the campaigns a discovery call returned.
+
+    Attributes:
+        enabled (bool): Whether discovery calls schedule prefetches.
+        max_in_flight (int): Most prefetches running at once.
+        per_minute (int): Most prefetches started per minute.
+        max_campaigns (int): Discovery results with more campaigns are not prefetched.
+        ttl (float): Seconds a finished prefetch waits for its follow-up call before it counts as unused.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        max_in_flight: int = 2,
+        per_minute: int = 30,
+        max_campaigns: int = 50,
+        ttl: float = 300.0,
+    ):
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.per_minute = per_minute
+        self.max_campaigns = max_campaigns
+        self.ttl = ttl
+        self._prefetches: Dict[str, _Prefetch] = {}
+        # Prefetch tasks still running, including ones no longer awaiting a call (the loop only holds them weakly).
+        self._tasks: Set[asyncio.Task[Any]] = set()
+        self._tokens = float(per_minute)
+        self._refilled = time.monotonic()
+        self._scheduled = 0
+        self._skipped = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._used = 0
+        self._unused = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> MetricsPrefetcher:
+        """Create a prefetcher from environment variables.
+
+        Reads the following optional environment variables:
+            SQL_PREFETCH (default false)
+            SQL_PREFETCH_MAX_IN_FLIGHT (default 2)
+            SQL_PREFETCH_PER_MINUTE (default 30)
+            SQL_PREFETCH_MAX_CAMPAIGNS (default 50)
+            SQL_PREFETCH_TTL (seconds, default 300)
+        """
+        return cls(
+            enabled=os.environ.get("SQL_PREFETCH", "false").strip().lower() in ("1", "true", "yes", "on"),
+            max_in_flight=int(os.environ.get("SQL_PREFETCH_MAX_IN_FLIGHT", "2")),
+            per_minute=int(os.environ.get("SQL_PREFETCH_PER_MINUTE", "30")),
+            max_campaigns=int(os.environ.get("SQL_PREFETCH_MAX_CAMPAIGNS", "50")),
+            ttl=float(os.environ.get("SQL_PREFETCH_TTL", "300")),
+        )
+
+    def schedule(self, target: SQLTool, account_id: str, campaign_ids: Sequence[Any]) -> bool:
+        """Start prefetching `target` for an account's campaigns on the running loop; return whether it started.
+
+        Nothing is started when the same call is already prefetched, when
+        there are too many campaigns, or when the rate limits are reached.
+        The ids are passed in the order returned; the target's args schema
+        sorts `campaign_id`, so a follow-up naming them in any order matches.
+        """
+        if not self.enabled or not campaign_ids or len(campaign_ids) > self.max_campaigns:
+            return False
+        kwargs = {"account_id": account_id, "campaign_id": [str(campaign_id) for campaign_id in campaign_ids]}
+        try:
+            digest = target.call_fingerprint(target.args_schema(**kwargs))
+        except Exception as e:
+            logger.debug(f"Not prefetching {target.name} for {account_id}: {e}")
+            return False
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            current = self._prefetches.get(account_id)
+            if current is not None and current.digest == digest:
+                return False
+            limiter_busy = target.limiter is not None and target.limiter.waiting > 0
+            if limiter_busy or self._running() >= self.max_in_flight or not self._take_token(now):
+                self._skipped += 1
+                return False
+            if current is not None:
+                self._retire(current)
+            prefetch = _Prefetch(digest=digest, loop=loop)
+            self._prefetches[account_id] = prefetch
+            self._scheduled += 1
+            # A fresh context keeps the prefetch out of the discovery call's metrics, trace and deadline.
+            prefetch.task = loop.create_task(
+                self._run(target, account_id, kwargs, prefetch), context=contextvars.Context()
+            )
+            self._tasks.add(prefetch.task)
+            prefetch.task.add_done_callback(self._tasks.discard)
+        return True
+
+    def observe(self, account_id: Optional[str], digest: str) -> None:
+        """Note a call of the target tool, identified by its `SQLTool.call_fingerprint`.
+
+        A call matching the account's prefetch uses it; any other call for
+        the account makes a running prefetch pointless, so it is cancelled.
+        """
+        if not self.enabled or account_id is None or _prefetching.get():
+            return
+        with self._lock:
+            prefetch = self._prefetches.get(account_id)
+            if prefetch is None:
+                return
+            del self._prefetches[account_id]
+            if prefetch.digest == digest:
+                self._used += 1
+            else:
+                self._retire(prefetch)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return prefetches running and awaiting a call, and counters of their outcomes."""
+        with self._lock:
+            running = self._running()
+            return {
+                "enabled": int(self.enabled),
+                "in_flight": running,
+                "ready": len(self._prefetches) - running,
+                "scheduled": self._scheduled,
+                "skipped": self._skipped,
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "used": self._used,
+                "unused": self._unused,
+            }
+
+    async def _run(self, target: SQLTool, account_id: str, kwargs: Dict[str, Any], prefetch: _Prefetch) -> None:
+        _prefetching.set(True)
+        try:
+            result = await target.ainvoke(**kwargs)
+        except Exception as e:
+            result = f"SQL execution failed: {e}"
+        failed = isinstance(result, str) and result.startswith("SQL execution")
+        with self._lock:
+            if failed:
+                self._failed += 1
+                if self._prefetches.get(account_id) is prefetch:
+                    del self._prefetches[account_id]
+            else:
+                self._completed += 1
+                prefetch.expires_at = time.monotonic() + self.ttl
+        if failed:
+            logger.info(f"Prefetch of {target.name} for {account_id} failed: {result}")
+
+    def _retire(self, prefetch: _Prefetch) -> None:
+        """Cancel a running prefetch, or count a finished one as unused (lock held)."""
+        if prefetch.expires_at is not None:
+            self._unused += 1
+        elif prefetch.task is not None:
+            self._cancelled += 1
+            prefetch.loop.call_soon_threadsafe(prefetch.task.cancel)
+
+    def _expire(self, now: float) -> None:
+        for account_id, prefetch in list(self._prefetches.items()):
+            if prefetch.expires_at is not None and prefetch.expires_at <= now:
+                del self._prefetches[account_id]
+                self._unused += 1
+
+    def _running(self) -> int:
+        return sum(1 for prefetch in self._prefetches.values() if prefetch.expires_at is None)
+
+    def _take_token(self, now: float) -> bool:
+        """Spend one prefetch from the per-minute budget, refilled continuously."""
+        self._tokens = min(float(self.per_minute), self._tokens + (now - self._refilled) * self.per_minute / 60)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
@@ -0,0 +1,11 @@
+SELECT
+    campaign_id,
+    campaign_name,
+    MAX(date) AS latest_date
+FROM event
+WHERE account_id = :account_id
+    AND domain = 'event.campaignactivity'
+    AND platform = 'msg:na'
+    AND event IN ('message_send', 'message_click', 'message_open', 'message_soft_bounce', 'message_hard_bounce', 'message_unsubscribe')
+    AND date >= :since
+GROUP BY campaign_id, campaign_name
@@ -0,0 +1,21 @@
+sumIf(count, (event = 'message_click') AND (NOT is_machine)) AS human_clicks,
+sumIf(count, (event = 'message_click') AND is_machine) AS bot_clicks,
+uniqMergeIf(member_state, event = 'message_click') AS unique_clicks,
+uniqMergeIf(member_state, (event = 'message_click') AND (NOT is_machine)) AS unique_human_clicks,
+sumIf(count, event = 'message_send') AS sent,
+sent AS total_sends,
+sumIf(count, event = 'message_soft_bounce') AS soft_bounces,
+sumIf(count, event = 'message_hard_bounce') AS hard_bounces,
+sumIf(count, event = 'message_unsubscribe') AS unsubscribe,
+sumIf(count, event = 'message_open') AS total_opens,
+sumIf(count, event = 'message_click') AS total_clicks,
+sumIf(count, (event = 'message_open') AND (NOT is_machine)) AS human_opens,
+sumIf(count, (event = 'message_open') AND is_machine) AS bot_opens,
+uniqMergeIf(member_state, event = 'message_open') AS unique_opens,
+uniqMergeIf(member_state, (event = 'message_open') AND is_machine) AS unique_bot_opens,
+uniqMergeIf(member_state, (event = 'message_open') AND (NOT is_machine)) AS unique_human_opens,
+-- Twice, as the former two-scan (UNION ALL) form counted feedback-loop unsubscribes once per scan.
+2 * sumIf(count, event = 'message_unsubscribe' AND event_reason = 'unsub-feedback-loop') AS complaints,
+uniqMergeIf(member_state, event = 'message_open' AND is_machine) AS unique_pre_cached_opens,
+uniqMergeIf(member_state, (event = 'message_open' OR event = 'message_click') AND NOT is_machine) AS human_readers,
+unique_pre_cached_opens + human_readers - uniqMergeIf(member_state, event = 'message_open' OR (event = 'message_click' AND NOT is_machine)) AS pre_cached_openers_also_readers
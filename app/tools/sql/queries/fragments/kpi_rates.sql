@@ -0,0 +1,7 @@
+complaints / nullIf(total_sends - hard_bounces - soft_bounces, 0) AS complaint_rate,
+total_opens / nullIf(total_sends - hard_bounces - soft_bounces, 0) AS open_rate,
+unique_human_opens / nullIf(sent, 0) AS unique_open_rate,
+human_clicks / nullIf(sent, 0) AS click_rate,
+unique_human_clicks / nullIf(sent, 0) AS unique_click_rate,
+(soft_bounces + hard_bounces) / nullIf(sent, 0) AS bounce_rate,
+human_readers / nullIf(total_sends - hard_bounces - soft_bounces - unique_pre_cached_opens + pre_cached_openers_also_readers, 0) AS projected_open_rate
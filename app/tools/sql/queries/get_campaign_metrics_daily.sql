@@ -0,0 +1,49 @@
+SELECT
+    campaign_id,
+    day,
+    anyLast(campaign_name) AS campaign_name,
+    sumIf(count, (event = 'message_click') AND (NOT is_machine)) AS human_clicks,
+    sumIf(count, (event = 'message_click') AND is_machine) AS bot_clicks,
+    sumIf(count, event = 'message_send') AS sent,
+    sumIf(count, event = 'message_soft_bounce') AS soft_bounces,
+    sumIf(count, event = 'message_hard_bounce') AS hard_bounces,
+    sumIf(count, event = 'message_unsubscribe') AS unsubscribe,
+    sumIf(count, event = 'message_open') AS total_opens,
+    sumIf(count, event = 'message_click') AS total_clicks,
+    sumIf(count, (event = 'message_open') AND (NOT is_machine)) AS human_opens,
+    sumIf(count, (event = 'message_open') AND is_machine) AS bot_opens,
+    -- Matches get_campaign_metrics.sql, which counts feedback-loop unsubscribes twice.
+    2 * sumIf(count, event = 'message_unsubscribe' AND event_reason = 'unsub-feedback-loop') AS complaints,
+    hex(toString(uniqMergeStateIf(member_state, event = 'message_click'))) AS clicks_state,
+    hex(toString(uniqMergeStateIf(member_state, (event = 'message_click') AND (NOT is_machine)))) AS human_clicks_state,
+    hex(toString(uniqMergeStateIf(member_state, event = 'message_open'))) AS opens_state,
+    hex(toString(uniqMergeStateIf(member_state, (event = 'message_open') AND is_machine))) AS bot_opens_state,
+    hex(toString(uniqMergeStateIf(member_state, (event = 'message_open') AND (NOT is_machine)))) AS human_opens_state,
+    hex(toString(uniqMergeStateIf(member_state, (event = 'message_open' OR event = 'message_click') AND NOT is_machine))) AS human_readers_state,
+    hex(toString(uniqMergeStateIf(member_state, event = 'message_open' OR (event = 'message_click' AND NOT is_machine)))) AS opens_or_human_clicks_state
+FROM
+(
+    SELECT
+        event,
+        event_reason,
+        is_machine,
+        campaign_id,
+        send_date AS day,
+        anyLast(campaign_name) AS campaign_name,
+        sum(count) AS count,
+        uniqMergeState(member_state) as member_state
+    FROM msg_totals_bysenddate
+    WHERE
+        (domain = 'event.campaignactivity') AND
+        (platform = 'msg:na') AND
+        (account_id = :account_id) AND
+        (event IN ('message_send', 'message_click', 'message_open', 'message_soft_bounce', 'message_hard_bounce', 'message_unsubscribe')) AND
+        (send_date BETWEEN :start_date AND :end_date)
+    GROUP BY
+        event,
+        event_reason,
+        is_machine,
+        campaign_id,
+        day
+)
+GROUP BY campaign_id, day
@@ -0,0 +1,57 @@
+SELECT
+    *,
+    {{ include kpi_rates }}
+FROM
+(
+    SELECT
+        bucket_start,
+        series_id AS campaign_id,
+        if(isNull(series_id), '', anyLast(campaign_name)) AS campaign_name,
+        any(bucket_step) AS bucket_size,
+        {{ include kpi_columns }}
+    FROM
+    (
+        WITH
+            (
+                SELECT (min(send_date), max(send_date))
+                FROM msg_totals_bysenddate
+                WHERE
+                    (domain = 'event.campaignactivity') AND
+                    (platform = 'msg:na') AND
+                    (account_id = :account_id) AND
+                    (event IN ('message_send', 'message_click', 'message_open', 'message_soft_bounce', 'message_hard_bounce', 'message_unsubscribe'))
+                    {{ send_date_filter }}
+                    {{ campaign_filter }}
+            ) AS sent_span,
+            greatest(tupleElement(sent_span, 1), toDate(:start_date)) AS first_day,
+            least(tupleElement(sent_span, 2), toDate(:end_date)) AS last_day,
+            {{ time_bucket }}
+        SELECT
+            bucket_start,
+            {{ series_key }} AS series_id,
+            event,
+            event_reason,
+            is_machine,
+            campaign_id,
+            anyLast(campaign_name) AS campaign_name,
+            any(step) AS bucket_step,
+            sum(count) AS count,
+            uniqMergeState(member_state) as member_state
+        FROM msg_totals_bysenddate
+        WHERE
+            (domain = 'event.campaignactivity') AND
+            (platform = 'msg:na') AND
+            (account_id = :account_id) AND
+            (event IN ('message_send', 'message_click', 'message_open', 'message_soft_bounce', 'message_hard_bounce', 'message_unsubscribe'))
+            {{ send_date_filter }}
+            {{ campaign_filter }}
+        GROUP BY
+            bucket_start,
+            event,
+            event_reason,
+            is_machine,
+            campaign_id
+    )
+    GROUP BY bucket_start, series_id
+)
+ORDER BY campaign_id, bucket_start
@@ -0,0 +1,197 @@
+"""Column projection, filters, sorting and top-N for SQL tool results.
+
+Tools whose args include `ResultShapeArgs` accept `fields`, `where`,
+`order_by` and `limit`. Column names are validated against the tool's
+`output_schema`, and the query is wrapped in an outer
+`SELECT <fields> FROM (...) WHERE ... ORDER BY ... LIMIT` so ClickHouse
+drops the aggregates nobody asked for and returns only the matching rows.
+Filter values are bound parameters; only validated column names and
+operators reach the SQL text, so shaped queries are compiled once per
+structure and reused.
+
+Tools that assemble rows in Python (the day-bucket rollup, batched
+groups) apply the same shape to their rows with `ResultShape.apply`.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from ..clickhouse import to_pyformat
+from .pagination import paginate_query
+from .variants import CompiledVariant
+
+# Bound alongside the query so cursors, result ids and single-flight keys tell shapes apart.
+SHAPE_PARAM = "result_shape"
+LIMIT_PARAM = "shape_limit"
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+_SQL_OPERATORS = {"==": "=", "!=": "!=", ">": ">", ">=": ">=", "<": "<", "<=": "<=", "in": "IN", "not_in": "NOT IN"}
+
+
+@dataclass(frozen=True)
+class ResultShape:
+    """Validated projection, filters, sort keys and row limit of one call.
+
+    Attributes:
+        fields (Tuple[str, ...]): Output columns, in order.
+        where (Tuple[Tuple[str, str, Any], ...]): `(column, op, value)` filters, combined with AND.
+        order_by (Tuple[Tuple[str, bool], ...]): `(column, descending)` sort keys.
+        limit (Optional[int]): Maximum rows returned.
+    """
+
+    fields: Tuple[str, ...]
+    where: Tuple[Tuple[str, str, Any], ...] = ()
+    order_by: Tuple[Tuple[str, bool], ...] = ()
+    limit: Optional[int] = None
+
+    @classmethod
+    def from_args(cls, args: BaseModel, columns: Sequence[str]) -> Optional[ResultShape]:
+        """Return the shape a call asks for, or None when it asks for the full result.
+
+        Raises:
+            ValueError: If a field, filter or sort key names a column the tool does not return.
+        """
+        fields = getattr(args, "fields", None)
+        where = getattr(args, "where", None) or []
+        order_by = getattr(args, "order_by", None) or []
+        limit = getattr(args, "limit", None)
+        if not fields and not where and not order_by and limit is None:
+            return None
+
+        known = set(columns)
+        for kind, names in (
+            ("fields", fields or []),
+            ("where", [w.column for w in where]),
+            ("order_by", [s.column for s in order_by]),
+        ):
+            unknown = [name for name in names if name not in known]
+            if unknown:
+                raise ValueError(f"Unknown column(s) in {kind}: {unknown}; available: {list(columns)}")
+        if fields and len(set(fields)) != len(fields):
+            raise ValueError(f"Duplicate columns in fields: {fields}")
+
+        return cls(
+            fields=tuple(fields or columns),
+            where=tuple((w.column, w.op, _freeze(w.value)) for w in where),
+            order_by=tuple((s.column, s.descending) for s in order_by),
+            limit=limit,
+        )
+
+    @property
+    def structure(self) -> Tuple[Any, ...]:
+        """Return everything that shapes the SQL text; filter values are bound, not part of it."""
+        return self.fields, tuple((column, op) for column, op, _ in self.where), self.order_by, self.limit is not None
+
+    def key(self) -> str:
+        """Return a canonical description of the shape."""
+        return json.dumps([self.fields, self.where, self.order_by, self.limit], default=str, separators=(",", ":"))
+
+    def bind_params(self) -> Dict[str, Any]:
+        """Return the filter values and row limit bound into the shaped query."""
+        params: Dict[str, Any] = {SHAPE_PARAM: self.key()}
+        for i, (_, op, value) in enumerate(self.where):
+            if op == "between":
+                params[f"shape_where_{i}_low"], params[f"shape_where_{i}_high"] = value
+            else:
+                params[f"shape_where_{i}"] = list(value) if isinstance(value, tuple) else value
+        if self.limit is not None:
+            params[LIMIT_PARAM] = self.limit
+        return params
+
+    def output_schema(self, schema: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Return the entries of a tool's output schema for the projected fields, in field order."""
+        by_column = {item["column"]: item for item in schema}
+        return [by_column[field] for field in self.fields]
+
+    def apply(self, columns: List[str], rows: List[Any]) -> Tuple[List[str], List[Any]]:
+        """Filter, sort, limit and project rows assembled in Python, as the shaped query would."""
+        index = {column: i for i, column in enumerate(columns)}
+        for column, op, value in self.where:
+            position = index[column]
+            rows = [row for row in rows if _matches(row[position], op, value)]
+        for column, descending in reversed(self.order_by):
+            position = index[column]
+            present = [row for row in rows if row[position] is not None]
+            present.sort(key=lambda row: row[position], reverse=descending)
+            rows = present + [row for row in rows if row[position] is None]
+        if self.limit is not None:
+            rows = rows[: self.limit]
+        positions = [index[field] for field in self.fields]
+        return list(self.fields), [tuple(row[i] for i in positions) for row in rows]
+
+
+def shape_query(query: str, structure: Tuple[Any, ...]) -> str:
+    """Wrap a `:name` query in the projection, filters, sort keys and limit of a shape structure."""
+    fields, where, order_by, limited = structure
+    sql = f"SELECT {', '.join(_quote(f) for f in fields)}\nFROM (\n{query.strip().rstrip(';')}\n)"
+    predicates = []
+    for i, (column, op) in enumerate(where):
+        if op == "between":
+            predicates.append(f"{_quote(column)} BETWEEN :shape_where_{i}_low AND :shape_where_{i}_high")
+        else:
+            predicates.append(f"{_quote(column)} {_SQL_OPERATORS[op]} :shape_where_{i}")
+    if predicates:
+        sql += "\nWHERE " + " AND ".join(predicates)
+    if order_by:
+        keys = ", ".join(
+            f"{_quote(column)} {'DESC' if descending else 'ASC'} NULLS LAST" for column, descending in order_by
+        )
+        sql += f"\nORDER BY {keys}"
+    if limited:
+        sql += f"\nLIMIT :{LIMIT_PARAM}"
+    return sql
+
+
+@lru_cache(maxsize=256)
+def shaped_variant(variant: CompiledVariant, structure: Tuple[Any, ...]) -> CompiledVariant:
+    """Return `variant` wrapped for a shape structure, compiled once per variant and structure."""
+    query = shape_query(variant.query, structure)
+    page_query = paginate_query(query)
+    return CompiledVariant(
+        name=f"{variant.name}+shaped",
+        query=query,
+        page_query=page_query,
+        async_query=to_pyformat(query),
+        async_page_query=to_pyformat(page_query),
+    )
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _freeze(value: Any) -> Any:
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _matches(cell: Any, op: str, value: Any) -> bool:
+    """Evaluate one filter like SQL does: comparisons with NULL are false."""
+    if cell is None:
+        return False
+    try:
+        if op in ("in", "not_in"):
+            found = any(_comparable(cell, v) == v for v in value)
+            return found if op == "in" else not found
+        if op == "between":
+            low, high = value
+            return _comparable(cell, low) >= low and _comparable(cell, high) <= high
+        return _COMPARISONS[op](_comparable(cell, value), value)
+    except TypeError:
+        return False
+
+
+def _comparable(cell: Any, value: Any) -> Any:
+    """Compare dates and other non-string cells with string values by their text, as ClickHouse casts them."""
+    return str(cell) if isinstance(value, str) and not isinstance(cell, str) else cell
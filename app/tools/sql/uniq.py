@@ -0,0 +1,127 @@
+"""Mergeable `uniq` sketches, compatible with ClickHouse's serialized states.
+
+ClickHouse's `uniq` aggregate keeps a `UniquesHashSet`: up to 65536 32-bit
+hashes of the values seen, keeping only hashes whose lowest `skip_degree`
+bits are zero once that limit is exceeded. Its serialized state (as
+returned by `hex(toString(uniqState(...)))`) is the skip degree as one
+byte, the number of hashes as a LEB128 varint and the hashes as
+little-endian UInt32s.
+
+`UniqSketch.merge` reproduces `uniqMerge` (the union of the hash sets,
+thinned to the smallest common skip degree that fits), and `cardinality`
+reproduces the estimate `uniq` returns, so cardinalities of merged day
+states match what ClickHouse computes over the whole range.
+"""
+from __future__ import annotations
+
+import math
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+MAX_SIZE_DEGREE = 17
+MAX_SIZE = 1 << (MAX_SIZE_DEGREE - 1)
+BITS_FOR_SKIP = 32 - MAX_SIZE_DEGREE
+
+
+def _crc32c_table() -> List[int]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC32C_TABLE = _crc32c_table()
+
+
+def int_hash_crc32(value: int) -> int:
+    """ClickHouse's `intHashCRC32`: one SSE4.2 CRC32C step over a UInt64, seeded with all ones."""
+    crc = 0xFFFFFFFF
+    for byte in (value & 0xFFFFFFFFFFFFFFFF).to_bytes(8, "little"):
+        crc = _CRC32C_TABLE[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc
+
+
+def _thin(hashes: np.ndarray, skip_degree: int) -> np.ndarray:
+    """Keep the hashes whose lowest `skip_degree` bits are zero."""
+    if skip_degree == 0:
+        return hashes
+    return hashes[(hashes & np.uint32((1 << skip_degree) - 1)) == 0]
+
+
+class UniqSketch:
+    """Set of retained 32-bit hashes plus the skip degree they were thinned to.
+
+    Attributes:
+        skip_degree (int): Number of low hash bits that must be zero for a hash to be kept.
+        hashes (np.ndarray): Sorted, distinct retained hashes (uint32).
+    """
+
+    __slots__ = ("skip_degree", "hashes")
+
+    def __init__(self, skip_degree: int = 0, hashes: Optional[np.ndarray] = None):
+        self.skip_degree = skip_degree
+        self.hashes = hashes if hashes is not None else np.empty(0, dtype=np.uint32)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> UniqSketch:
+        """Parse a serialized ClickHouse `uniq` state.
+
+        Raises:
+            ValueError: If `data` is not a well-formed state.
+        """
+        if not data:
+            raise ValueError("Empty uniq state")
+        skip_degree, size, shift, pos = data[0], 0, 0, 1
+        while True:
+            if pos >= len(data):
+                raise ValueError("Truncated uniq state size")
+            byte = data[pos]
+            pos += 1
+            size |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+        if size > MAX_SIZE or len(data) != pos + 4 * size:
+            raise ValueError(f"Malformed uniq state: {size} hashes in {len(data) - pos} bytes")
+        hashes = np.unique(np.frombuffer(data, dtype="<u4", count=size, offset=pos).astype(np.uint32))
+        return cls(skip_degree, hashes)
+
+    @classmethod
+    def from_hex(cls, text: str) -> UniqSketch:
+        """Parse a state returned by `hex(toString(uniqState(...)))`."""
+        return cls.from_bytes(bytes.fromhex(text))
+
+    @classmethod
+    def merge(cls, sketches: Sequence[UniqSketch]) -> UniqSketch:
+        """Return the union of `sketches`, as `uniqMerge` would compute it."""
+        if not sketches:
+            return cls()
+        if len(sketches) == 1:
+            return sketches[0]
+        skip_degree = max(sketch.skip_degree for sketch in sketches)
+        hashes = _thin(np.unique(np.concatenate([sketch.hashes for sketch in sketches])), skip_degree)
+        while len(hashes) > MAX_SIZE:
+            skip_degree += 1
+            if skip_degree > BITS_FOR_SKIP:
+                raise ValueError("uniq skip degree overflow")
+            hashes = _thin(hashes, skip_degree)
+        return cls(skip_degree, hashes)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the sketch."""
+        return int(self.hashes.nbytes) + 64
+
+    def cardinality(self) -> int:
+        """Return the distinct-count estimate ClickHouse's `uniq` reports for this state."""
+        size = len(self.hashes)
+        if self.skip_degree == 0:
+            return size
+        result = size * (1 << self.skip_degree) + (int_hash_crc32(size) & ((1 << self.skip_degree) - 1))
+        # Correct for collisions of distinct values in the 32-bit hash space.
+        p32 = float(1 << 32)
+        return math.floor(p32 * (math.log(p32) - math.log(p32 - result)) + 0.5)
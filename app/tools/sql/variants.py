@@ -0,0 +1,224 @@
+"""Query variants chosen by the shape of a call's arguments.
+
+A tool's SQL file may contain `{{ slot }}` placeholders. Each
+`VariantDimension` maps the validated arguments to a shape (for example
+`all` or `ids` campaigns) and supplies the SQL fragment of its slot for
+every shape, so a call only sends the predicates its arguments need. There
+are no `:campaign_id = ['ALL']` tautologies that keep ClickHouse from
+pruning granules by the primary key.
+
+Every combination of shapes is rendered and compiled when the tool is
+created; selecting a variant is a dictionary lookup.
+
+SQL shared between queries (such as the KPI definitions) lives in
+`queries/fragments/<name>.sql` and is pulled in with `{{ include name }}`,
+indented like the placeholder's line, before slots are rendered.
+"""
+from __future__ import annotations
+
+import itertools
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, Sequence, Tuple, Union, cast
+
+from pydantic import BaseModel
+
+from ..clickhouse import to_pyformat
+from ..schemas import CampaignLookupParams, KPIQueryArgs, KPITimeseriesArgs
+from .pagination import paginate_query
+
+SLOT_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+INCLUDE_PATTERN = re.compile(r"^([ \t]*)\{\{\s*include\s+(\w+)\s*\}\}", re.MULTILINE)
+FRAGMENT_DIR = Path(__file__).parent / "queries" / "fragments"
+DEFAULT_VARIANT = "default"
+EPOCH = "1970-01-01"
+
+
+@dataclass(frozen=True)
+class VariantDimension:
+    """One `{{ slot }}` of a query template and its fragment per argument shape.
+
+    Attributes:
+        slot (str): Placeholder name in the SQL template.
+        shape (Callable[[BaseModel], str]): Maps validated arguments to a key of `fragments`.
+        fragments (Mapping[str, str]): SQL substituted for the slot, per shape.
+    """
+
+    slot: str
+    shape: Callable[[BaseModel], str]
+    fragments: Mapping[str, str]
+
+
+@dataclass(frozen=True)
+class CompiledVariant:
+    """One rendered variant: `:name` SQL for the pooled engine, pyformat SQL for the async client."""
+
+    name: str
+    query: str
+    page_query: str
+    async_query: str
+    async_page_query: str
+
+
+def render(template: str, fragments: Mapping[str, str]) -> str:
+    """Substitute `{{ slot }}` placeholders.
+
+    Raises:
+        ValueError: If the template uses a slot without a fragment.
+    """
+
+    def substitute(match: re.Match) -> str:
+        slot = match.group(1)
+        if slot not in fragments:
+            raise ValueError(f"No fragment for query slot '{slot}'")
+        return fragments[slot]
+
+    return SLOT_PATTERN.sub(substitute, template)
+
+
+@lru_cache(maxsize=None)
+def _fragment(name: str) -> str:
+    path = FRAGMENT_DIR / f"{name}.sql"
+    if not path.exists():
+        raise ValueError(f"No SQL fragment '{name}' in {FRAGMENT_DIR}")
+    return path.read_text().strip()
+
+
+def expand_includes(template: str) -> str:
+    """Replace `{{ include name }}` lines with the shared fragment, indenting each line like the placeholder.
+
+    Raises:
+        ValueError: If a fragment file does not exist.
+    """
+
+    def substitute(match: re.Match) -> str:
+        indent = match.group(1)
+        return "\n".join(indent + line if line else line for line in _fragment(match.group(2)).splitlines())
+
+    return INCLUDE_PATTERN.sub(substitute, template)
+
+
+class QueryVariants:
+    """All compiled variants of a tool's query, selected per call by argument shape."""
+
+    def __init__(self, template: str, dimensions: Sequence[VariantDimension] = ()):
+        template = expand_includes(template)
+        self.template = template
+        self.dimensions = tuple(dimensions)
+        self._variants: Dict[Tuple[str, ...], CompiledVariant] = {}
+        for shapes in itertools.product(*(sorted(d.fragments) for d in self.dimensions)):
+            query = render(template, {d.slot: d.fragments[s] for d, s in zip(self.dimensions, shapes)})
+            page_query = paginate_query(query)
+            self._variants[shapes] = CompiledVariant(
+                name="/".join(shapes) or DEFAULT_VARIANT,
+                query=query,
+                page_query=page_query,
+                async_query=to_pyformat(query),
+                async_page_query=to_pyformat(page_query),
+            )
+
+    def select(self, args: BaseModel) -> CompiledVariant:
+        """Return the variant for a call's arguments.
+
+        Raises:
+            ValueError: If a dimension reports a shape it has no fragment for.
+        """
+        shapes = tuple(d.shape(args) for d in self.dimensions)
+        try:
+            return self._variants[shapes]
+        except KeyError:
+            raise ValueError(f"No query variant for argument shape {'/'.join(shapes)}") from None
+
+    def __iter__(self) -> Iterator[CompiledVariant]:
+        return iter(self._variants.values())
+
+    def names(self) -> List[str]:
+        """Return the names of all variants."""
+        return [variant.name for variant in self]
+
+
+# Arguments of the tools filtering by `campaign_id` and a send date range.
+CampaignRangeArgs = Union[KPIQueryArgs, KPITimeseriesArgs]
+
+
+def campaign_shape(args: BaseModel) -> str:
+    """`all` when `campaign_id` is unset or `['ALL']`, otherwise `ids`."""
+    return "all" if cast(CampaignRangeArgs, args).campaign_id in (None, ["ALL"]) else "ids"
+
+
+def date_shape(args: BaseModel) -> str:
+    """`until` when the range starts at the epoch (the smallest ClickHouse `Date`), otherwise `range`."""
+    return "until" if cast(CampaignRangeArgs, args).start_date <= EPOCH else "range"
+
+
+def lookup_shape(args: BaseModel) -> str:
+    """Which of `campaign_names` / `campaign_ids` a lookup filters by: `names`, `ids`, `both` or `none`."""
+    lookup = cast(CampaignLookupParams, args)
+    names, ids = lookup.campaign_names is not None, lookup.campaign_ids is not None
+    return {(True, True): "both", (True, False): "names", (False, True): "ids"}.get((names, ids), "none")
+
+
+def bucket_shape(args: BaseModel) -> str:
+    """The requested time bucket: `day`, `week` or `month`."""
+    return cast(KPITimeseriesArgs, args).bucket
+
+
+def series_shape(args: BaseModel) -> str:
+    """`campaign` for one series per campaign, otherwise `total`."""
+    return "campaign" if cast(KPITimeseriesArgs, args).per_campaign else "total"
+
+
+CAMPAIGN_FILTER = VariantDimension(
+    slot="campaign_filter",
+    shape=campaign_shape,
+    fragments={"all": "", "ids": "AND (campaign_id IN :campaign_id)"},
+)
+SEND_DATE_FILTER = VariantDimension(
+    slot="send_date_filter",
+    shape=date_shape,
+    fragments={"range": "AND (send_date BETWEEN :start_date AND :end_date)", "until": "AND (send_date <= :end_date)"},
+)
+LOOKUP_FILTER = VariantDimension(
+    slot="lookup_filter",
+    shape=lookup_shape,
+    fragments={
+        "names": "campaign_name IN :campaign_names",
+        "ids": "campaign_id IN :campaign_ids",
+        "both": "(campaign_name IN :campaign_names OR campaign_id IN :campaign_ids)",
+        "none": "0",
+    },
+)
+
+
+def _bucket_fragment(unit: str, truncate: str, add: str) -> str:
+    """Return the `step` and `bucket_start` definitions for buckets of `step` whole `unit`s.
+
+    `step` is the smallest number of units that keeps the series within
+    `:max_points` buckets over the days that actually have sends, so long
+    ranges are downsampled by merging adjacent buckets on the server.
+    """
+    origin = f"{truncate}(first_day)"
+    span = f"dateDiff('{unit}', {origin}, {truncate}(last_day)) + 1"
+    return (
+        f"toUInt32(greatest(1, ceil(({span}) / :max_points))) AS step,\n"
+        f"            {add}({origin}, intDiv(dateDiff('{unit}', {origin}, {truncate}(send_date)), step) * step)"
+        " AS bucket_start"
+    )
+
+
+TIME_BUCKET = VariantDimension(
+    slot="time_bucket",
+    shape=bucket_shape,
+    fragments={
+        "day": _bucket_fragment("day", "toDate", "addDays"),
+        "week": _bucket_fragment("week", "toMonday", "addWeeks"),
+        "month": _bucket_fragment("month", "toStartOfMonth", "addMonths"),
+    },
+)
+SERIES_KEY = VariantDimension(
+    slot="series_key",
+    shape=series_shape,
+    fragments={"campaign": "toNullable(toInt64(campaign_id))", "total": "CAST(NULL, 'Nullable(Int64)')"},
+)
@@ -0,0 +1,275 @@
+"""Per-call phase tracing, the slow-call log and on-demand sampling profiles.
+
+`trace_call` opens a `CallTrace` for a tool call (`instrument_tool` does
+this for every adapted tool). Code running on behalf of the call, in the
+same task or in threads it hands work to, adds to it through module
+functions that find the current trace via a context variable:
+
+- `phase` times a named phase (validation, connection wait, execution,
+  fetch, encoding, ...); repeated phases of one name add up,
+- `record_query_id` attaches the id of a ClickHouse query the call ran.
+
+Phases do not nest; whatever the call spent outside them (MCP argument
+handling, the LangChain wrapper, thread hand-offs, waiting on a coalesced
+execution) is reported as `other`.
+
+Calls slower than `SlowCallLog.threshold` are logged as one JSON line on
+the `app.tools.slow_calls` logger with their arguments, phase breakdown
+and query ids. `arm_profiling(n)` profiles the next `n` calls with a
+stack sampler and writes each profile to `CallProfiler.directory` in the
+folded-stack format flame graph tools read.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+slow_call_logger = logging.getLogger("app.tools.slow_calls")
+
+# Longest repr of a single argument written to the slow-call log.
+MAX_ARGUMENT_CHARS = 200
+# Most calls one `arm_profiling` request may profile.
+MAX_PROFILED_CALLS = 100
+
+
+@dataclass
+class CallTrace:
+    """Phase timings and ClickHouse query ids of the tool call in progress."""
+
+    tool: str
+    arguments: Dict[str, Any]
+    started: float = field(default_factory=time.perf_counter)
+    phases: Dict[str, float] = field(default_factory=dict)
+    query_ids: List[str] = field(default_factory=list)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def breakdown(self, elapsed: float) -> Dict[str, float]:
+        """Return milliseconds per phase, with the untraced remainder of `elapsed` as `other`."""
+        phases = {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()}
+        phases["other"] = round(max(0.0, elapsed - sum(self.phases.values())) * 1000, 3)
+        return phases
+
+
+_current_trace: ContextVar[Optional[CallTrace]] = ContextVar("current_call_trace", default=None)
+
+
+def current_trace() -> Optional[CallTrace]:
+    """Return the trace of the tool call in progress, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block as phase `name` of the current call (a no-op outside a traced call)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started)
+
+
+def record_query_id(query_id: Optional[str]) -> None:
+    """Attach a ClickHouse query id to the current call."""
+    trace = _current_trace.get()
+    if trace is not None and query_id:
+        trace.query_ids.append(query_id)
+
+
+def _summarize_argument(value: Any) -> Any:
+    """Return a JSON-friendly argument, with long values cut to `MAX_ARGUMENT_CHARS`."""
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= MAX_ARGUMENT_CHARS:
+        return text
+    return f"{text[:MAX_ARGUMENT_CHARS]}... ({len(text)} chars)"
+
+
+class SlowCallLog:
+    """Logs tool calls that took longer than `threshold` seconds.
+
+    Attributes:
+        threshold (float): Seconds above which a call is logged (0 logs none).
+    """
+
+    def __init__(self, threshold: float = 5.0):
+        self.threshold = threshold
+        self._logged = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> SlowCallLog:
+        """Create a slow-call log from environment variables.
+
+        Reads the following optional environment variable:
+            MCP_SLOW_CALL_SECONDS (default 5, 0 disables the log)
+        """
+        return cls(threshold=float(os.environ.get("MCP_SLOW_CALL_SECONDS", "5")))
+
+    def observe(self, trace: CallTrace, elapsed: float, error: Optional[BaseException] = None) -> None:
+        """Log a finished call when it was slow."""
+        if self.threshold <= 0 or elapsed < self.threshold:
+            return
+        with self._lock:
+            self._logged += 1
+        entry = {
+            "tool": trace.tool,
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "phases_ms": trace.breakdown(elapsed),
+            "query_ids": trace.query_ids,
+            "arguments": {name: _summarize_argument(value) for name, value in trace.arguments.items()},
+        }
+        if error is not None:
+            entry["error"] = str(error) or type(error).__name__
+        slow_call_logger.warning(json.dumps(entry, default=str))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the threshold and the number of calls logged."""
+        with self._lock:
+            return {"threshold_seconds": self.threshold, "logged": self._logged}
+
+
+class _StackSampler:
+    """Samples the stacks of every thread in the process at a fixed interval until stopped."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="call-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        me = threading.get_ident()
+        names: Dict[Optional[int], str] = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = [f"{f.name} ({Path(f.filename).name}:{f.lineno})" for f in traceback.extract_stack(frame)]
+                self.samples[";".join([names.get(ident, str(ident)), *stack])] += 1
+
+
+class CallProfiler:
+    """Profiles the next calls it is armed for with a stack sampler.
+
+    A profile samples every thread of the process while the call runs, so
+    it covers work the call hands to threads and the event loop alike (and
+    whatever concurrent calls do meanwhile).
+
+    Attributes:
+        directory (Path): Where profiles are written, one `.folded` file per call.
+        interval (float): Seconds between stack samples.
+    """
+
+    def __init__(self, directory: Path, interval: float = 0.005):
+        self.directory = directory
+        self.interval = interval
+        self._armed = 0
+        self._written = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> CallProfiler:
+        """Create a profiler from environment variables.
+
+        Reads the following optional environment variables:
+            MCP_PROFILE_DIR (default <tmp>/mcp-profiles)
+            MCP_PROFILE_INTERVAL (default 0.005 seconds)
+        """
+        directory = os.environ.get("MCP_PROFILE_DIR") or str(Path(tempfile.gettempdir()) / "mcp-profiles")
+        return cls(Path(directory), interval=float(os.environ.get("MCP_PROFILE_INTERVAL", "0.005")))
+
+    def arm(self, calls: int) -> int:
+        """Profile the next `calls` calls (at most `MAX_PROFILED_CALLS`; 0 disarms) and return the number armed."""
+        with self._lock:
+            self._armed = max(0, min(calls, MAX_PROFILED_CALLS))
+            return self._armed
+
+    @contextmanager
+    def profile(self, trace: CallTrace) -> Iterator[None]:
+        """Profile the enclosed call when the profiler is armed."""
+        with self._lock:
+            armed = self._armed > 0
+            if armed:
+                self._armed -= 1
+        if not armed:
+            yield
+            return
+        sampler = _StackSampler(self.interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            self._write(trace, sampler.samples)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return the calls still to profile and the profiles written."""
+        with self._lock:
+            return {"armed": self._armed, "written": self._written}
+
+    def _write(self, trace: CallTrace, samples: Counter[str]) -> None:
+        path = self.directory / f"{trace.tool}-{int(time.time() * 1000)}-{os.getpid()}.folded"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path.write_text("".join(f"{stack} {count}\n" for stack, count in samples.items()))
+        except OSError as e:
+            logger.warning(f"Failed to write profile {path}: {e}")
+            return
+        with self._lock:
+            self._written += 1
+        logger.info(f"Wrote profile of {trace.tool} ({sum(samples.values())} samples) to {path}")
+
+
+slow_calls = SlowCallLog.from_env()
+profiler = CallProfiler.from_env()
+
+
+def arm_profiling(calls: int) -> int:
+    """Profile the next `calls` tool calls of this process and return the number armed."""
+    return profiler.arm(calls)
+
+
+@contextmanager
+def trace_call(tool: str, arguments: Dict[str, Any]) -> Iterator[CallTrace]:
+    """Trace a tool call: collect its phases, log it when slow and profile it when armed."""
+    trace = CallTrace(tool=tool, arguments=arguments)
+    token = _current_trace.set(trace)
+    error: Optional[BaseException] = None
+    try:
+        with profiler.profile(trace):
+            yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_trace.reset(token)
+        slow_calls.observe(trace, time.perf_counter() - trace.started, error)
@@ -0,0 +1 @@
+"""Standalone performance benchmarks; run individual modules with `python -m benchmarks.<name>`."""
@@ -0,0 +1,128 @@
+"""Compare CSV loading paths used by `AnalyticsTool`.
+
+Generates a synthetic `get_campaign_metrics`-shaped CSV and measures, for
+the previous `pd.read_csv(StringIO(...))` path and the schema-driven
+`load_csv`, the parse time, the peak RSS growth while parsing and the
+resulting frame's memory footprint. Each measurement runs in a fresh
+process so allocations of one loader cannot hide those of the other.
+
+Run with:
+    uv run python -m benchmarks.csv_loading --rows 100000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import multiprocessing as mp
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+
+from app.tools.analytics.loading import load_csv
+from app.tools.sql.config import CONFIG_MAP
+
+
+def _read_csv_default(df_data: str) -> pd.DataFrame:
+    """The loading path `AnalyticsTool` used before `load_csv`."""
+    return pd.read_csv(StringIO(df_data))
+
+
+LOADERS: Dict[str, Callable[[str], pd.DataFrame]] = {
+    "pandas read_csv (inferred)": _read_csv_default,
+    "load_csv (schema, pyarrow)": load_csv,
+}
+
+
+def make_csv(rows: int, campaigns: int, seed: int = 0) -> str:
+    """Build a CSV shaped like `get_campaign_metrics` output."""
+    rng = random.Random(seed)
+    schema = CONFIG_MAP["get_campaign_metrics"].output_schema or []
+    start = datetime(2024, 1, 1)
+    data: Dict[str, list] = {}
+    for item in schema:
+        column, kind = item["column"], item["type"]
+        if column == "event":
+            data[column] = ["kpi"] * rows
+        elif column == "campaign_id":
+            data[column] = [rng.randrange(campaigns) for _ in range(rows)]
+        elif column == "anyLast(campaign_name)":
+            names = [
+                f"Campaign {i} - {rng.choice(['Spring', 'Summer', 'Autumn', 'Winter'])} Sale" for i in range(campaigns)
+            ]
+            data[column] = [names[i] for i in data["campaign_id"]]
+        elif kind.startswith("datetime"):
+            data[column] = [start + timedelta(days=rng.randrange(365)) for _ in range(rows)]
+        elif kind == "Int64":
+            data[column] = [rng.randrange(100_000) for _ in range(rows)]
+        else:
+            data[column] = [rng.random() for _ in range(rows)]
+    return pd.DataFrame(data).to_csv(index=False)
+
+
+def _status_bytes(field: str) -> int:
+    """Return a memory field (e.g. VmRSS, VmHWM) of /proc/self/status in bytes."""
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith(f"{field}:"):
+            return int(line.split()[1]) * 1024
+    raise KeyError(field)
+
+
+def _reset_peak_rss() -> int:
+    """Reset the peak RSS high-water mark and return the current RSS in bytes (Linux only)."""
+    gc.collect()
+    Path("/proc/self/clear_refs").write_text("5")
+    return _status_bytes("VmRSS")
+
+
+def _measure(loader_name: str, path: str, results: "mp.Queue[Tuple[float, int, int]]") -> None:
+    """Load the CSV at `path` once with the named loader and report time and memory."""
+    df_data = Path(path).read_text()
+    loader = LOADERS[loader_name]
+    loader(df_data[: df_data.find("\n", 4096) + 1])  # warm up lazy imports
+    baseline = _reset_peak_rss()
+    started = time.perf_counter()
+    df = loader(df_data)
+    elapsed = time.perf_counter() - started
+    results.put((elapsed, _status_bytes("VmHWM") - baseline, int(df.memory_usage(deep=True).sum())))
+
+
+def run(rows: int, campaigns: int, repeat: int) -> None:
+    """Run every loader `repeat` times and print a summary table."""
+    df_data = make_csv(rows, campaigns)
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "data.csv")
+        Path(path).write_text(df_data)
+        print(f"{rows} rows, {len(df_data) / 1e6:.1f} MB CSV, best of {repeat}")
+        print(f"{'loader':<30} {'parse ms':>10} {'peak MB':>10} {'frame MB':>10}")
+        for name in LOADERS:
+            samples = []
+            for _ in range(repeat):
+                results = ctx.Queue()
+                proc = ctx.Process(target=_measure, args=(name, path, results))
+                proc.start()
+                samples.append(results.get())
+                proc.join()
+            elapsed = min(s[0] for s in samples)
+            peak = min(s[1] for s in samples)
+            frame = samples[0][2]
+            print(f"{name:<30} {elapsed * 1000:>10.1f} {peak / 1e6:>10.1f} {frame / 1e6:>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--campaigns", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.campaigns, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Compare the rows read by each query variant of `get_campaign_metrics`.
+
+Every argument shape (all campaigns or a list of ids, with or without a
+start date) compiles to its own query variant. This benchmark reports
+how many rows each variant makes the database read:
+
+* `--clickhouse` runs `EXPLAIN ESTIMATE` for every variant of the real
+  query against the server configured by the `CLICKHOUSE_*` variables,
+  giving the rows ClickHouse expects to read after primary-key pruning.
+* Without it, the variants of a SQLite stand-in (indexed on
+  `account_id, campaign_id, send_date`) run against synthetic events and
+  the rows the engine visits are counted. The former single query, which
+  `OR`-ed the shape checks into the predicate, runs as the baseline.
+
+Run with:
+    uv run python -m benchmarks.query_variants --rows 200000 --campaigns 2000
+    uv run python -m benchmarks.query_variants --clickhouse --account-id <id> --campaign-ids 1 2 3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import TextClause
+
+from app.tools.clickhouse import build_clickhouse_uri
+from app.tools.sql.config import CONFIG_MAP
+from app.tools.sql.variants import QueryVariants
+from benchmarks.standin import ACCOUNT_ID, create_standin_engine
+from benchmarks.tool_stages import environment
+
+TOOL_NAME = "get_campaign_metrics"
+SORT_KEY = "account_id, campaign_id, send_date"
+SQL_DIR = Path(__file__).resolve().parent.parent / "app" / "tools" / "sql" / "queries"
+
+_STANDIN_SELECT = """
+SELECT campaign_id, SUM(count) AS events, COUNT(DISTINCT member_id) AS members
+FROM msg_totals_bysenddate
+WHERE
+    visit()
+    AND domain = 'event.campaignactivity'
+    AND platform = 'msg:na'
+    AND account_id = :account_id
+    {where}
+GROUP BY campaign_id
+"""
+STANDIN_TEMPLATE = _STANDIN_SELECT.format(where="{{ send_date_filter }}\n    {{ campaign_filter }}")
+STANDIN_LEGACY = _STANDIN_SELECT.format(
+    where="AND send_date BETWEEN :start_date AND :end_date\n"
+    "    AND ((:all_campaigns = 0 AND campaign_id IN :campaign_id) OR :all_campaigns = 1)"
+)
+
+
+def shape_kwargs(account_id: str, campaign_ids: List[str], start_date: str, end_date: str) -> Dict[str, Dict]:
+    """Return one set of tool arguments per argument shape."""
+    dates = {"start_date": start_date, "end_date": end_date}
+    return {
+        "all campaigns, all time": {"account_id": account_id},
+        "all campaigns, date range": {"account_id": account_id, **dates},
+        "campaign ids, all time": {"account_id": account_id, "campaign_id": campaign_ids},
+        "campaign ids, date range": {"account_id": account_id, "campaign_id": campaign_ids, **dates},
+    }
+
+
+def estimate_clickhouse(engine: Engine, shapes: Dict[str, Dict]) -> List[Dict[str, Any]]:
+    """Return ClickHouse's `EXPLAIN ESTIMATE` rows and marks for the variant of each shape."""
+    config = CONFIG_MAP[TOOL_NAME]
+    variants = QueryVariants((SQL_DIR / f"{TOOL_NAME}.sql").read_text().strip(), config.variants)
+    results = []
+    with engine.connect() as connection:
+        for shape, kwargs in shapes.items():
+            args = config.args_schema(**kwargs)
+            variant = variants.select(args)
+            parts = list(connection.execute(text(f"EXPLAIN ESTIMATE {variant.query}"), args.model_dump()).mappings())
+            results.append(
+                {
+                    "shape": shape,
+                    "variant": variant.name,
+                    "rows": sum(int(part["rows"]) for part in parts),
+                    "marks": sum(int(part["marks"]) for part in parts),
+                }
+            )
+    return results
+
+
+def _standin_clause(query: str) -> TextClause:
+    """Compile a stand-in query, expanding the `campaign_id` list for SQLite."""
+    clause = text(query)
+    return clause.bindparams(bindparam("campaign_id", expanding=True)) if ":campaign_id" in query else clause
+
+
+def count_standin(engine: Engine, shapes: Dict[str, Dict]) -> List[Dict[str, Any]]:
+    """Return the stand-in rows visited by each shape's variant and by the former `OR`-ed query."""
+    config = CONFIG_MAP[TOOL_NAME]
+    variants = QueryVariants(STANDIN_TEMPLATE, config.variants)
+    legacy = _standin_clause(STANDIN_LEGACY)
+    visited = [0]
+
+    def visit() -> int:
+        visited[0] += 1
+        return 1
+
+    results = []
+    with engine.connect() as connection:
+        sqlite = connection.connection.driver_connection
+        assert sqlite is not None, "the stand-in engine hands out live sqlite3 connections"
+        sqlite.create_function("visit", 0, visit)
+        for shape, kwargs in shapes.items():
+            args = config.args_schema(**kwargs)
+            variant = variants.select(args)
+            params = args.model_dump()
+            counts = {}
+            for name, clause, bound in (
+                ("variant_rows", _standin_clause(variant.query), params),
+                ("legacy_rows", legacy, {**params, "all_campaigns": int(variant.name.endswith("all"))}),
+            ):
+                visited[0] = 0
+                result_rows = len(connection.execute(clause, bound).fetchall())
+                counts[name] = visited[0]
+            results.append({"shape": shape, "variant": variant.name, "result_rows": result_rows, **counts})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clickhouse", action="store_true", help="estimate against the configured ClickHouse")
+    parser.add_argument("--account-id", default=ACCOUNT_ID)
+    parser.add_argument("--campaign-ids", nargs="+", default=["1", "2", "3"])
+    parser.add_argument("--start-date", default="2024-03-01")
+    parser.add_argument("--end-date", default="2024-03-31")
+    parser.add_argument("--rows", type=int, default=200_000, help="synthetic events in the stand-in table")
+    parser.add_argument("--campaigns", type=int, default=2_000, help="campaigns in the stand-in")
+    args = parser.parse_args()
+
+    shapes = shape_kwargs(args.account_id, args.campaign_ids, args.start_date, args.end_date)
+    if args.clickhouse:
+        results = estimate_clickhouse(create_engine(build_clickhouse_uri()), shapes)
+    else:
+        engine = create_standin_engine(args.rows, args.campaigns)
+        with engine.begin() as connection:
+            connection.execute(text(f"CREATE INDEX ix_account_campaign_date ON msg_totals_bysenddate ({SORT_KEY})"))
+        results = count_standin(engine, shapes)
+
+    report = {
+        "benchmark": "query_variants",
+        "environment": environment(),
+        "params": {"tool": TOOL_NAME, "clickhouse": args.clickhouse, "rows": args.rows, "campaigns": args.campaigns},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    for item in results:
+        counts = ", ".join(f"{k}={v}" for k, v in item.items() if k not in ("shape", "variant"))
+        print(f"{item['shape']:<26} {item['variant']:<12} {counts}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Local stand-in for ClickHouse with synthetic campaign activity.
+
+Builds an in-memory SQLite database holding a `msg_totals_bysenddate`
+table filled with generated events, plus SQLite versions of the SQL tool
+queries that return the same columns (in the same order) as the
+ClickHouse originals. Uniq-state columns are replaced by a plain
+`member_id`, so unique counts become `COUNT(DISTINCT ...)`.
+
+The stand-in exercises the Python side of the tools (binding, fetching,
+type resolution, encoding) at realistic result sizes; its query timings
+say nothing about ClickHouse itself.
+"""
+from __future__ import annotations
+
+import itertools
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+ACCOUNT_ID = "acct-0"
+# Events generated and inserted per `executemany` batch.
+INSERT_CHUNK = 10_000
+
+EVENTS = (
+    ("message_send", 0.55),
+    ("message_open", 0.25),
+    ("message_click", 0.12),
+    ("message_soft_bounce", 0.03),
+    ("message_hard_bounce", 0.02),
+    ("message_unsubscribe", 0.03),
+)
+
+_TABLE = """
+CREATE TABLE msg_totals_bysenddate (
+    domain TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    campaign_id INTEGER NOT NULL,
+    campaign_name TEXT NOT NULL,
+    send_date TEXT NOT NULL,
+    event TEXT NOT NULL,
+    event_reason TEXT NOT NULL,
+    is_machine INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    count INTEGER NOT NULL
+)
+"""
+
+
+def _uniq(condition: str) -> str:
+    return f"COUNT(DISTINCT CASE WHEN {condition} THEN member_id END)"
+
+
+def _sum(condition: str) -> str:
+    return f"SUM(CASE WHEN {condition} THEN count ELSE 0 END)"
+
+
+def _rate(numerator: str, denominator: str) -> str:
+    return f"CAST({numerator} AS REAL) / NULLIF({denominator}, 0)"
+
+
+_CAMPAIGN_METRICS = f"""
+SELECT
+    'kpi' AS event, campaign_id, "anyLast(campaign_name)", date, human_clicks, bot_clicks, unique_clicks,
+    unique_human_clicks, sent, sent AS total_sends, soft_bounces, hard_bounces, unsubscribe, total_opens,
+    total_clicks, human_opens, bot_opens, unique_opens, unique_bot_opens, unique_human_opens, complaints,
+    unique_pre_cached_opens, human_readers,
+    unique_pre_cached_opens + human_readers - open_or_human_click_members AS pre_cached_openers_also_readers,
+    {_rate("complaints", "sent - hard_bounces - soft_bounces")} AS complaint_rate,
+    {_rate("total_opens", "sent - hard_bounces - soft_bounces")} AS open_rate,
+    {_rate("unique_human_opens", "sent")} AS unique_open_rate,
+    {_rate("human_clicks", "sent")} AS click_rate,
+    {_rate("unique_human_clicks", "sent")} AS unique_click_rate,
+    {_rate("soft_bounces + hard_bounces", "sent")} AS bounce_rate,
+    {_rate(
+        "human_readers",
+        "sent - hard_bounces - soft_bounces - unique_pre_cached_opens"
+        " + unique_pre_cached_opens + human_readers - open_or_human_click_members",
+    )} AS projected_open_rate
+FROM (
+    SELECT
+        campaign_id,
+        MAX(campaign_name) AS "anyLast(campaign_name)",
+        MAX(send_date) AS date,
+        {_sum("event = 'message_click' AND NOT is_machine")} AS human_clicks,
+        {_sum("event = 'message_click' AND is_machine")} AS bot_clicks,
+        {_uniq("event = 'message_click'")} AS unique_clicks,
+        {_uniq("event = 'message_click' AND NOT is_machine")} AS unique_human_clicks,
+        {_sum("event = 'message_send'")} AS sent,
+        {_sum("event = 'message_soft_bounce'")} AS soft_bounces,
+        {_sum("event = 'message_hard_bounce'")} AS hard_bounces,
+        {_sum("event = 'message_unsubscribe'")} AS unsubscribe,
+        {_sum("event = 'message_open'")} AS total_opens,
+        {_sum("event = 'message_click'")} AS total_clicks,
+        {_sum("event = 'message_open' AND NOT is_machine")} AS human_opens,
+        {_sum("event = 'message_open' AND is_machine")} AS bot_opens,
+        {_uniq("event = 'message_open'")} AS unique_opens,
+        {_uniq("event = 'message_open' AND is_machine")} AS unique_bot_opens,
+        {_uniq("event = 'message_open' AND NOT is_machine")} AS unique_human_opens,
+        {_sum("event = 'message_unsubscribe' AND event_reason = 'unsub-feedback-loop'")} AS complaints,
+        {_uniq("event = 'message_open' AND is_machine")} AS unique_pre_cached_opens,
+        {_uniq("event IN ('message_open', 'message_click') AND NOT is_machine")} AS human_readers,
+        {_uniq("event = 'message_open' OR (event = 'message_click' AND NOT is_machine)")}
+            AS open_or_human_click_members
+    FROM msg_totals_bysenddate
+    WHERE
+        domain = 'event.campaignactivity'
+        AND platform = 'msg:na'
+        AND account_id = :account_id
+        AND send_date BETWEEN :start_date AND :end_date
+    GROUP BY campaign_id
+)
+ORDER BY campaign_id
+"""
+
+STANDIN_QUERIES: Dict[str, str] = {"get_campaign_metrics": _CAMPAIGN_METRICS}
+
+
+def generate_events(
+    rows: int, campaigns: int, accounts: int = 1, members: int = 50_000, days: int = 365, seed: int = 0
+) -> Iterator[Tuple]:
+    """Yield `rows` synthetic `msg_totals_bysenddate` rows.
+
+    Campaigns are spread over `accounts` (account `acct-0` always owns the
+    first share) and each row records one event for one member on one day.
+    """
+    rng = random.Random(seed)
+    events, weights = zip(*EVENTS)
+    start = date(2024, 1, 1)
+    names = [f"Campaign {i} - {rng.choice(['Spring', 'Summer', 'Autumn', 'Winter'])} Sale" for i in range(campaigns)]
+    send_days = [start + timedelta(days=rng.randrange(days)) for _ in range(campaigns)]
+    for _ in range(rows):
+        campaign = rng.randrange(campaigns)
+        event = rng.choices(events, weights)[0]
+        reason = "unsub-feedback-loop" if event == "message_unsubscribe" and rng.random() < 0.1 else ""
+        yield (
+            "event.campaignactivity",
+            "email",
+            "msg:na",
+            f"acct-{campaign % accounts}",
+            campaign,
+            names[campaign],
+            (send_days[campaign] + timedelta(days=rng.randrange(3))).isoformat(),
+            event,
+            reason,
+            int(event in ("message_open", "message_click") and rng.random() < 0.3),
+            rng.randrange(members),
+            1,
+        )
+
+
+def create_standin_engine(rows: int, campaigns: int, accounts: int = 1, seed: int = 0) -> Engine:
+    """Create an in-memory SQLite engine holding `rows` synthetic events."""
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(_TABLE)
+        events = generate_events(rows, campaigns, accounts, seed=seed)
+        while chunk := list(itertools.islice(events, INSERT_CHUNK)):
+            cursor.executemany(f"INSERT INTO msg_totals_bysenddate VALUES ({', '.join('?' * 12)})", chunk)
+        cursor.execute("CREATE INDEX ix_account_date ON msg_totals_bysenddate (account_id, send_date)")
+        raw.commit()
+    finally:
+        raw.close()
+    return engine
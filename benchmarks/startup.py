@@ -0,0 +1,143 @@
+"""Measure server cold start: import time and time to first request.
+
+Each sample starts a fresh interpreter, so module caches never carry over:
+
+* `import` times `import app.server` (plus, for eager startup, the
+  analytics stack `run_server` then imports up front).
+* `first_request` starts the server and polls `GET /metrics` until it
+  answers, timing from process start to the first response.
+
+Both are measured with `MCP_LAZY_STARTUP` on and off. Without
+`--clickhouse` the `CLICKHOUSE_*` variables point at a closed local port:
+lazy startup still serves requests (warmup fails in the background), while
+eager startup fails on table reflection, which is reported as an error.
+
+Run with:
+    uv run python -m benchmarks.startup --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from benchmarks.tool_stages import ROOT, environment
+
+_IMPORT_SCRIPT = """
+import importlib, os, time
+started = time.perf_counter()
+import app.server
+if os.environ["MCP_LAZY_STARTUP"] == "false":
+    importlib.import_module("langchain_aws")
+    importlib.import_module("langchain_experimental.agents")
+print(time.perf_counter() - started)
+"""
+_SERVE_SCRIPT = "from app.server import run_server; run_server(host='127.0.0.1', port={port})"
+
+UNREACHABLE_CLICKHOUSE = {
+    "CLICKHOUSE_USER": "default",
+    "CLICKHOUSE_PASSWORD": "benchmark",
+    "CLICKHOUSE_HOST": "127.0.0.1",
+    "CLICKHOUSE_PORT": "1",
+    "CLICKHOUSE_NATIVE_PORT": "1",
+    "CLICKHOUSE_DATABASE": "default",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env: Dict[str, str]) -> float:
+    """Return the seconds a fresh interpreter spends importing the server."""
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def measure_first_request(env: Dict[str, str], timeout: float) -> Optional[float]:
+    """Return the seconds from process start to the first `GET /metrics` response, or None if it never came."""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", _SERVE_SCRIPT.format(port=port)],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout and process.poll() is None:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1):
+                    return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.02)
+        return None
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _summary(samples: List[Optional[float]]) -> Dict[str, Any]:
+    ok = sorted(s * 1000 for s in samples if s is not None)
+    if not ok:
+        return {"samples": len(samples), "failures": len(samples)}
+    return {
+        "samples": len(samples),
+        "failures": len(samples) - len(ok),
+        "min_ms": round(ok[0], 1),
+        "median_ms": round(statistics.median(ok), 1),
+        "max_ms": round(ok[-1], 1),
+    }
+
+
+def run(repeat: int, timeout: float, clickhouse: bool) -> Dict[str, Any]:
+    """Measure both startup modes `repeat` times and return the report."""
+    results = []
+    for lazy in (True, False):
+        env = {**os.environ, "MCP_LAZY_STARTUP": "true" if lazy else "false", "PYTHONPATH": str(ROOT)}
+        if not clickhouse:
+            env.update(UNREACHABLE_CLICKHOUSE)
+        mode = "lazy" if lazy else "eager"
+        results.append({"stage": f"{mode}.import", **_summary([measure_import(env) for _ in range(repeat)])})
+        samples = [measure_first_request(env, timeout) for _ in range(repeat)]
+        results.append({"stage": f"{mode}.first_request", **_summary(samples)})
+    return {
+        "benchmark": "startup",
+        "environment": environment(),
+        "params": {"repeat": repeat, "timeout": timeout, "clickhouse": clickhouse},
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for the first response")
+    parser.add_argument("--clickhouse", action="store_true", help="use the configured ClickHouse")
+    args = parser.parse_args()
+
+    report = run(args.repeat, args.timeout, args.clickhouse)
+    print(json.dumps(report, indent=2))
+    for item in report["results"]:
+        median = f"{item['median_ms']:>10.1f} ms" if "median_ms" in item else "    failed"
+        print(f"{item['stage']:<22} {median} ({item['failures']}/{item['samples']} failed)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Time the hot paths of the MCP tools without a live ClickHouse.
+
+Runs `get_campaign_metrics` against the SQLite stand-in from
+`benchmarks.standin` and times every stage of `SQLTool.invoke` separately
+(argument validation, binding, execution, fetch, column-type resolution,
+stringification, `json.dumps`), each output encoder, the whole `invoke`,
+the `to_fastmcp` adapter around it, and `load_csv` as used by
+`AnalyticsTool`.
+
+Results are written as JSON (one entry per stage with min/median/p95/mean
+in milliseconds, plus the environment and scale) so runs can be compared
+across releases; `--baseline` compares against an earlier JSON file and
+exits non-zero when a stage's median regressed beyond `--tolerance`.
+
+Run with:
+    uv run python -m benchmarks.tool_stages --rows 200000 --campaigns 2000 --output stages.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_community.utilities import SQLDatabase
+from langchain_mcp_adapters.tools import to_fastmcp
+
+from app.tools.analytics.loading import load_csv
+from app.tools.metrics import instrument_tool
+from app.tools.sql import SQLTool
+from app.tools.sql.config import CONFIG_MAP
+from app.tools.sql.encoding import OUTPUT_FORMATS, encode_payload
+from benchmarks.csv_loading import make_csv
+from benchmarks.standin import ACCOUNT_ID, STANDIN_QUERIES, create_standin_engine
+
+ROOT = Path(__file__).resolve().parent.parent
+TOOL_NAME = "get_campaign_metrics"
+
+
+class StageTimer:
+    """Collect wall-clock samples per named stage."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def time(self, stage: str, fn: Callable[[], Any]) -> Any:
+        """Run `fn`, record its duration under `stage` and return its result."""
+        started = time.perf_counter()
+        result = fn()
+        self.samples[stage].append(time.perf_counter() - started)
+        return result
+
+    async def atime(self, stage: str, fn: Callable[[], Any]) -> Any:
+        """Await `fn()`, record its duration under `stage` and return its result."""
+        started = time.perf_counter()
+        result = await fn()
+        self.samples[stage].append(time.perf_counter() - started)
+        return result
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Return per-stage statistics in milliseconds."""
+        results = []
+        for stage, samples in self.samples.items():
+            ordered = sorted(s * 1000 for s in samples)
+            results.append(
+                {
+                    "stage": stage,
+                    "samples": len(ordered),
+                    "min_ms": round(ordered[0], 4),
+                    "median_ms": round(statistics.median(ordered), 4),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+                    "mean_ms": round(statistics.fmean(ordered), 4),
+                }
+            )
+        return results
+
+
+def build_tool(db: SQLDatabase) -> SQLTool:
+    """Create the benchmarked tool with its real config and the stand-in query, without cache or store."""
+    config = CONFIG_MAP[TOOL_NAME]
+    return SQLTool(
+        name=TOOL_NAME,
+        description=f"{TOOL_NAME} (benchmark stand-in)",
+        query=STANDIN_QUERIES[TOOL_NAME],
+        args_schema=config.args_schema,
+        db=db,
+        output_schema=config.output_schema,
+        output_format=config.output_format,
+    )
+
+
+def time_invoke_stages(tool: SQLTool, kwargs: Dict[str, Any], timer: StageTimer) -> int:
+    """Run the steps of `SQLTool.invoke` one by one, timing each; return the result row count."""
+    args = timer.time("sql.validate", lambda: tool.args_schema(**kwargs))
+    variant = tool.variants.select(args)
+    query, params, _, _ = timer.time("sql.bind", lambda: tool._prepare(args, variant.query, variant.page_query))
+    with tool._begin() as connection:
+        connection.execution_options(yield_per=tool.chunk_size)
+        result = timer.time("sql.execute", lambda: connection.execute(tool._text(query), params))
+        columns = list(result.keys())
+        rows = timer.time("sql.fetch", lambda: [row for chunk in result.partitions() for row in chunk])
+    columns, column_types = timer.time(
+        "sql.resolve_types", lambda: tool._resolve_columns(columns, tool._result_types(result, columns))
+    )
+    data = timer.time("sql.stringify", lambda: [dict(zip(columns, [str(value) for value in row])) for row in rows])
+    timer.time(
+        "sql.json_dumps",
+        lambda: json.dumps({"columns": columns, "column_types": column_types, "data": data, "row_count": len(data)}),
+    )
+    for output_format in OUTPUT_FORMATS:
+        if output_format != "handle":
+            timer.time(f"encode.{output_format}", lambda: encode_payload(output_format, columns, column_types, rows))
+    return len(rows)
+
+
+async def time_adapters(tool: SQLTool, kwargs: Dict[str, Any], timer: StageTimer, repeat: int) -> None:
+    """Time a call through `ainvoke` directly and through the instrumented `to_fastmcp` wrapper."""
+    fastmcp_tool = timer.time("mcp.adapt", lambda: instrument_tool(to_fastmcp(tool.get_langchain_tool())))
+    for _ in range(repeat):
+        await timer.atime("mcp.ainvoke_direct", lambda: tool.ainvoke(**kwargs))
+        await timer.atime("mcp.fastmcp_run", lambda: fastmcp_tool.run(kwargs))
+
+
+def run(rows: int, campaigns: int, csv_rows: int, repeat: int) -> Dict[str, Any]:
+    """Build the stand-in, run every stage `repeat` times and return the report."""
+    started = time.perf_counter()
+    engine = create_standin_engine(rows, campaigns)
+    setup_seconds = time.perf_counter() - started
+
+    tool = build_tool(SQLDatabase(engine, sample_rows_in_table_info=0))
+    kwargs = {"account_id": ACCOUNT_ID, "start_date": "2024-01-01", "end_date": "2025-12-31"}
+    timer = StageTimer()
+
+    result_rows = time_invoke_stages(tool, kwargs, timer)  # warm up statement and import caches
+    timer.samples.clear()
+    for _ in range(repeat):
+        time_invoke_stages(tool, kwargs, timer)
+        timer.time("sql.invoke_total", lambda: tool.invoke(**kwargs))
+
+    asyncio.run(time_adapters(tool, kwargs, timer, repeat))
+
+    df_data = make_csv(csv_rows, campaigns)
+    load_csv(df_data[: df_data.find("\n", 4096) + 1])
+    for _ in range(repeat):
+        timer.time("analytics.load_csv", lambda: load_csv(df_data))
+
+    return {
+        "benchmark": "tool_stages",
+        "environment": environment(),
+        "params": {
+            "tool": TOOL_NAME,
+            "rows": rows,
+            "campaigns": campaigns,
+            "result_rows": result_rows,
+            "csv_rows": csv_rows,
+            "csv_bytes": len(df_data),
+            "repeat": repeat,
+            "standin_setup_seconds": round(setup_seconds, 3),
+        },
+        "results": timer.summary(),
+    }
+
+
+def environment() -> Dict[str, Any]:
+    """Describe the code and interpreter the numbers were measured on."""
+    try:
+        commit: Optional[str] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    match = re.search(r'^version = "([^"]+)"', (ROOT / "pyproject.toml").read_text(), re.MULTILINE)
+    return {
+        "version": match.group(1) if match else None,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Return the stages whose median is more than `tolerance` slower than in `baseline`."""
+    previous = {item["stage"]: item for item in baseline.get("results", [])}
+    regressions = []
+    for item in report["results"]:
+        before = previous.get(item["stage"])
+        if before is None or before["median_ms"] <= 0:
+            continue
+        ratio = item["median_ms"] / before["median_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append({"stage": item["stage"], "baseline_ms": before["median_ms"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="synthetic events in the stand-in table")
+    parser.add_argument("--campaigns", type=int, default=2_000, help="campaigns (result rows) in the stand-in")
+    parser.add_argument("--csv-rows", type=int, default=100_000, help="rows in the CSV parsed by load_csv")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="earlier JSON report to compare medians against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed median slowdown (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = run(args.rows, args.campaigns, args.csv_rows, args.repeat)
+    if args.baseline is not None:
+        report["regressions"] = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+
+    rendered = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(rendered + "\n")
+    else:
+        print(rendered)
+    for item in report["results"]:
+        print(f"{item['stage']:<22} {item['median_ms']:>10.2f} ms (p95 {item['p95_ms']:.2f})", file=sys.stderr)
+    if report.get("regressions"):
+        print(f"Regressed stages: {[r['stage'] for r in report['regressions']]}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@
 
 Creates a MultiMCPClient (configured for a local Streamable HTTP MCP),
 connects, discovers the `get_campaign_metrics` tool, runs it with a
-date range, and converts the returned payload into a pandas DataFrame.
+date range in the typed columnar format, and converts the returned
+payload into a pandas DataFrame.
 
 Run with:
     uv run python run_mcp.py
@@ -14,10 +15,11 @@ import inspect
 import json
 from typing import Any
 
-import pandas as pd
 from langchain_mcp_adapters.clients import MultiMCPClient
 from langchain_mcp_adapters.tools import load_mcp_tools
 
+from app.tools.sql.encoding import payload_to_dataframe
+
 client = MultiMCPClient({"local_tools": {"url": "http://localhost:8080/mcp", "transport": "streamable_http"}})
 
 
@@ -32,7 +34,12 @@ async def main() -> None:
         if mcp_tool is None:
             raise RuntimeError("Tool 'get_campaign_metrics' not found on MCP server")
 
-        args: dict[str, Any] = {"account_id": "920", "start_date": "2024-01-01", "end_date": "2024-12-31"}
+        args: dict[str, Any] = {
+            "account_id": "920",
+            "start_date": "2024-01-01",
+            "end_date": "2024-12-31",
+            "output_format": "columnar",
+        }
 
         # Prefer an async entrypoint if available
         if hasattr(mcp_tool, "run"):
@@ -61,7 +68,7 @@ async def main() -> None:
         if not isinstance(payload, dict) or "data" not in payload:
             raise RuntimeError(f"Unexpected payload format: {payload}")
 
-        df = pd.DataFrame(payload["data"])
+        df = payload_to_dataframe(payload)
         print(df.head())
 
 
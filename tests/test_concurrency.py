@@ -0,0 +1,90 @@
+"""Synchronous executions are admitted through the limiter's async queue."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.tools.concurrency import ConcurrencyLimiter, FairScheduler, ToolBusyError, to_thread_admitted
+
+
+def _run_all(limiter: ConcurrencyLimiter, calls: int, hold: float = 0.05):
+    lock = threading.Lock()
+    active = peak = 0
+
+    def execute(account: str) -> str:
+        nonlocal active, peak
+        with limiter.blocking_slot(account):
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(hold)
+            with lock:
+                active -= 1
+        return account
+
+    async def main():
+        return await asyncio.gather(
+            *[to_thread_admitted(execute, f"acc{i % 2}") for i in range(calls)], return_exceptions=True
+        )
+
+    return asyncio.run(main()), peak
+
+
+@pytest.mark.parametrize("limiter", [ConcurrencyLimiter(max_concurrency=2), FairScheduler(max_concurrency=2)])
+def test_blocking_slots_share_the_limit(limiter):
+    results, peak = _run_all(limiter, 6)
+    assert results == [f"acc{i % 2}" for i in range(6)]
+    assert peak == 2
+    assert (limiter.in_flight, limiter.waiting) == (0, 0)
+
+
+@pytest.mark.parametrize("limiter_class", [ConcurrencyLimiter, FairScheduler])
+def test_blocking_slot_rejects_when_the_queue_is_full(limiter_class):
+    results, _ = _run_all(limiter_class(max_concurrency=1, max_waiting=1), 4, hold=0.2)
+    assert sum(isinstance(result, ToolBusyError) for result in results) == 2
+
+
+@pytest.mark.parametrize("limiter_class", [ConcurrencyLimiter, FairScheduler])
+def test_no_queue_admits_while_slots_are_free(limiter_class):
+    results, _ = _run_all(limiter_class(max_concurrency=2, max_waiting=0), 3, hold=0.2)
+    assert sum(isinstance(result, ToolBusyError) for result in results) == 1
+
+
+def test_burst_is_bounded_by_the_queue():
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_waiting=2)
+
+    async def call():
+        async with limiter.slot():
+            await asyncio.sleep(0.01)
+
+    async def main():
+        return await asyncio.gather(*[call() for _ in range(6)], return_exceptions=True)
+
+    assert sum(isinstance(result, ToolBusyError) for result in asyncio.run(main())) == 3
+
+
+def test_blocking_slot_times_out():
+    limiter = ConcurrencyLimiter(max_concurrency=1)
+    holding = threading.Event()
+
+    def hold() -> None:
+        with limiter.blocking_slot():
+            holding.set()
+            time.sleep(0.3)
+
+    def wait() -> None:
+        holding.wait()
+        with limiter.blocking_slot(timeout=0.05):
+            pass
+
+    async def main():
+        return await asyncio.gather(to_thread_admitted(hold), to_thread_admitted(wait), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(main())] == [type(None), TimeoutError]
+
+
+def test_blocking_slot_without_a_calling_loop_is_unadmitted():
+    limiter = ConcurrencyLimiter(max_concurrency=1)
+    with limiter.blocking_slot(), limiter.blocking_slot():
+        assert limiter.in_flight == 0
@@ -0,0 +1,119 @@
+"""`kpi_row` merges day buckets into the row `get_campaign_metrics.sql` returns.
+
+The rates are checked against `fragments/kpi_rates.sql` itself, evaluated
+by SQLite over the row's counts (cast to REAL, as ClickHouse's `/` is
+floating-point division).
+"""
+import re
+import sqlite3
+import struct
+from datetime import date
+from typing import Dict, Iterable
+
+import pytest
+
+from app.tools.sql.config import CONFIG_MAP
+from app.tools.sql.daily import COUNTERS, SKETCHES, DayAggregate, kpi_row
+from app.tools.sql.uniq import UniqSketch
+from app.tools.sql.variants import FRAGMENT_DIR
+
+OUTPUT_SCHEMA = CONFIG_MAP["get_campaign_metrics"].output_schema
+assert OUTPUT_SCHEMA is not None
+COLUMNS = [item["column"] for item in OUTPUT_SCHEMA]
+RATE = re.compile(r"^(.*)\s+AS\s+(\w+),?$", re.IGNORECASE)
+RATES = dict(
+    (match.group(2), match.group(1))
+    for match in map(RATE.match, (FRAGMENT_DIR / "kpi_rates.sql").read_text().splitlines())
+    if match
+)
+
+
+def _sketch(members: Iterable[int]) -> UniqSketch:
+    hashes = sorted(set(members))
+    return UniqSketch.from_bytes(bytes([0, len(hashes)]) + struct.pack(f"<{len(hashes)}I", *hashes))
+
+
+def _day(campaign_name: str, counters: Dict[str, int], members: Dict[str, Iterable[int]]) -> DayAggregate:
+    return DayAggregate(
+        campaign_name=campaign_name,
+        counters=tuple(counters.get(name, 0) for name in COUNTERS),
+        sketches=tuple(_sketch(members.get(name, ())) for name in SKETCHES),
+    )
+
+
+def _sql_rates(row: Dict[str, object]) -> Dict[str, object]:
+    """Evaluate kpi_rates.sql over the non-rate columns of a row."""
+    inputs = ", ".join(f"CAST(? AS REAL) AS {name}" for name in row if name not in RATES and name.isidentifier())
+    values = [value for name, value in row.items() if name not in RATES and name.isidentifier()]
+    select = ", ".join(f"{expression} AS {name}" for name, expression in RATES.items())
+    with sqlite3.connect(":memory:") as connection:
+        cursor = connection.execute(f"SELECT {select} FROM (SELECT {inputs})", [str(v) for v in values])
+        return dict(zip(RATES, cursor.fetchone()))
+
+
+# Members by event: bot opens {1, 2, 3}; human opens {3, 4} on Monday and {4, 5} on Tuesday;
+# human clicks {5, 6}; bot clicks {7}.
+MONDAY = _day(
+    "Spring sale",
+    {"sent": 100, "soft_bounces": 3, "hard_bounces": 2, "total_opens": 9, "human_opens": 4, "bot_opens": 5},
+    {
+        "opens_state": [1, 2, 3, 4],
+        "bot_opens_state": [1, 2, 3],
+        "human_opens_state": [3, 4],
+        "human_readers_state": [3, 4],
+        "opens_or_human_clicks_state": [1, 2, 3, 4],
+    },
+)
+TUESDAY = _day(
+    "Spring sale (resend)",
+    {
+        "sent": 20,
+        "hard_bounces": 1,
+        "unsubscribe": 3,
+        "complaints": 2,
+        "total_opens": 3,
+        "human_opens": 3,
+        "human_clicks": 4,
+        "bot_clicks": 1,
+        "total_clicks": 5,
+    },
+    {
+        "clicks_state": [5, 6, 7],
+        "human_clicks_state": [5, 6],
+        "opens_state": [4, 5],
+        "human_opens_state": [4, 5],
+        "human_readers_state": [4, 5, 6],
+        "opens_or_human_clicks_state": [4, 5, 6],
+    },
+)
+
+
+def test_counts_merge_across_days():
+    row = dict(zip(COLUMNS, kpi_row(42, [(date(2024, 5, 7), TUESDAY), (date(2024, 5, 6), MONDAY)])))
+    assert row["event"] == "kpi"
+    assert (row["campaign_id"], row["anyLast(campaign_name)"], row["date"]) == (
+        42,
+        "Spring sale (resend)",
+        date(2024, 5, 7),
+    )
+    assert (row["sent"], row["total_sends"], row["soft_bounces"], row["hard_bounces"]) == (120, 120, 3, 3)
+    assert (row["total_opens"], row["human_opens"], row["bot_opens"], row["complaints"]) == (12, 7, 5, 2)
+    # Unique counts are of the union of the days' members, not the sum of the days' counts.
+    assert (row["unique_opens"], row["unique_human_opens"], row["unique_bot_opens"]) == (5, 3, 3)
+    assert (row["unique_clicks"], row["unique_human_clicks"]) == (3, 2)
+    assert (row["unique_pre_cached_opens"], row["human_readers"]) == (3, 4)
+    # Member 3 opened by a bot and read by a human: 3 + 4 - |{1, 2, 3, 4, 5, 6}|.
+    assert row["pre_cached_openers_also_readers"] == 1
+
+
+def test_rates_match_kpi_rates_sql():
+    row = dict(zip(COLUMNS, kpi_row(42, [(date(2024, 5, 6), MONDAY), (date(2024, 5, 7), TUESDAY)])))
+    assert list(RATES) == [column for column in COLUMNS if column.endswith("_rate")]
+    for name, expected in _sql_rates(row).items():
+        assert row[name] == pytest.approx(expected), name
+
+
+def test_zero_denominators_are_null():
+    row = dict(zip(COLUMNS, kpi_row(7, [(date(2024, 5, 6), _day("Empty", {}, {}))])))
+    assert all(value is None for value in _sql_rates(row).values())
+    assert all(row[name] is None for name in RATES)
@@ -0,0 +1,81 @@
+"""Every configured SQL tool's query returns as many columns as its `output_schema` labels.
+
+Result rows are labelled from `output_schema` by position, so a missing or
+extra schema entry silently shifts every later column.
+"""
+import re
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from app.tools.sql.config import CONFIG_MAP
+from app.tools.sql.variants import QueryVariants
+
+QUERY_DIR = Path(__file__).resolve().parent.parent / "app" / "tools" / "sql" / "queries"
+# Columns `BatchSQLTool` adds to each row: the account's start_date and end_date.
+BATCH_COLUMNS = 2
+FROM = re.compile(r"FROM\b", re.IGNORECASE)
+
+
+def _split_top_level(sql: str, start: int) -> Tuple[List[str], int]:
+    """Return the comma-separated items from `start` up to the first top-level FROM, and where FROM begins."""
+    items: List[str] = []
+    depth = 0
+    quote = ""
+    item_start = start
+    i = start
+    while i < len(sql):
+        char = sql[i]
+        if quote:
+            if char == quote:
+                quote = ""
+        elif char in "'\"`":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append(sql[item_start:i].strip())
+            item_start = i + 1
+        elif depth == 0 and FROM.match(sql, i) and not sql[i - 1].isalnum():
+            items.append(sql[item_start:i].strip())
+            return items, i
+        i += 1
+    raise AssertionError("No top-level FROM")
+
+
+def _subquery(sql: str, from_at: int) -> str:
+    """Return the text inside the parentheses following FROM."""
+    open_at = sql.index("(", from_at)
+    depth = 0
+    for i in range(open_at, len(sql)):
+        if sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return sql[open_at:i].removeprefix("(")
+    raise AssertionError("Unbalanced parentheses")
+
+
+def select_width(sql: str) -> int:
+    """Return the number of columns the outermost SELECT returns, expanding `*` from its FROM subquery."""
+    sql = re.sub(r"--[^\n]*", "", sql).strip()
+    match = re.match(r"SELECT\b", sql, re.IGNORECASE)
+    assert match is not None, "Query does not start with SELECT"
+    items, from_at = _split_top_level(sql, match.end())
+    width = 0
+    for item in items:
+        width += select_width(_subquery(sql, from_at)) if item == "*" else 1
+    return width
+
+
+@pytest.mark.parametrize("name", sorted(name for name, config in CONFIG_MAP.items() if config.output_schema))
+def test_query_columns_match_output_schema(name: str) -> None:
+    config = CONFIG_MAP[name]
+    assert config.output_schema is not None
+    expected = len(config.output_schema) - (BATCH_COLUMNS if config.batched else 0)
+    for variant in QueryVariants((QUERY_DIR / f"{name}.sql").read_text().strip(), config.variants):
+        assert select_width(variant.query) == expected, f"{name} ({variant.name})"
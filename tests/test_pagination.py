@@ -0,0 +1,46 @@
+"""Row-heavy tools page their results even when a call asks for no page size."""
+import asyncio
+import json
+
+from langchain_community.utilities import SQLDatabase
+
+from app.tools.schemas import KPITimeseriesArgs
+from app.tools.sql import SQLTool
+from app.tools.sql.config import CONFIG_MAP, DEFAULT_PAGE_SIZE
+from app.tools.sql.encoding import payload_to_dataframe
+
+ROWS = 2 * DEFAULT_PAGE_SIZE + 500
+QUERY = f"""
+WITH RECURSIVE series(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM series WHERE n + 1 < {ROWS})
+SELECT n AS bucket_id, :account_id AS account_id FROM series ORDER BY n
+"""
+
+
+def test_row_heavy_tools_default_to_a_bounded_page():
+    for name in ("get_campaign_metrics", "get_campaign_metrics_timeseries", "get_recent_campaigns"):
+        assert CONFIG_MAP[name].page_size == DEFAULT_PAGE_SIZE, name
+
+
+def test_unpaged_call_returns_one_page_and_a_cursor(tmp_path):
+    config = CONFIG_MAP["get_campaign_metrics_timeseries"]
+    tool = SQLTool(
+        name=config.name,
+        description="Campaign metrics over time",
+        query=QUERY,
+        args_schema=KPITimeseriesArgs,
+        db=SQLDatabase.from_uri(f"sqlite:///{tmp_path / 'events.sqlite'}"),
+        page_size=config.page_size,
+    )
+
+    async def main():
+        pages, cursor = [], None
+        while True:
+            payload = json.loads(await tool.ainvoke(account_id="acc", cursor=cursor))
+            pages.append(payload_to_dataframe(payload)["bucket_id"].tolist())
+            cursor = payload["next_cursor"]
+            if cursor is None:
+                return pages
+
+    pages = asyncio.run(main())
+    assert [len(page) for page in pages] == [DEFAULT_PAGE_SIZE, DEFAULT_PAGE_SIZE, 500]
+    assert sum(pages, []) == [str(n) for n in range(ROWS)]
@@ -0,0 +1,38 @@
+"""A prefetch is used by the follow-up call whatever order it names the campaigns in."""
+import asyncio
+
+from langchain_community.utilities import SQLDatabase
+
+from app.tools.schemas import KPIQueryArgs
+from app.tools.sql import MetricsPrefetcher, SQLTool
+from app.tools.sql.cache import ResultCache
+
+
+def test_follow_up_with_reordered_campaign_ids_uses_the_prefetch(tmp_path):
+    db = SQLDatabase.from_uri(f"sqlite:///{tmp_path / 'events.sqlite'}")
+    executed = []
+
+    class Metrics(SQLTool):
+        def _execute(self, query, params):
+            executed.append(params["campaign_id"])
+            return super()._execute(query, params)
+
+    prefetcher = MetricsPrefetcher(enabled=True)
+    metrics = Metrics(
+        name="get_campaign_metrics",
+        description="Campaign metrics",
+        query="SELECT :account_id AS account_id",
+        args_schema=KPIQueryArgs,
+        db=db,
+        cache=ResultCache(),
+    )
+    metrics.prefetcher = prefetcher
+
+    async def main():
+        assert prefetcher.schedule(metrics, "acc", [30, 4, 120])
+        await asyncio.gather(*prefetcher._tasks)
+        return await metrics.ainvoke(account_id="acc", campaign_id=["4", "120", "30"])
+
+    assert asyncio.run(main()).startswith("{")
+    assert executed == [["120", "30", "4"]]
+    assert prefetcher.snapshot()["used"] == 1
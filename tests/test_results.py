@@ -0,0 +1,37 @@
+"""The result store's disk tier only holds well-formed ids and stays within its size bound."""
+import pandas as pd
+
+from app.tools.results import ResultStore
+
+
+def _frame(rows: int = 100) -> pd.DataFrame:
+    return pd.DataFrame({"a": range(rows), "b": [f"row {i}" for i in range(rows)]})
+
+
+def test_ids_outside_the_result_id_format_never_touch_disk(tmp_path):
+    disk = tmp_path / "store"
+    store = ResultStore(disk_dir=str(disk))
+    outside = tmp_path / "outside.arrow"
+    outside.write_bytes(b"not a frame")
+
+    assert store.put("../outside", _frame())
+    assert outside.read_bytes() == b"not a frame"
+    assert list(disk.iterdir()) == []
+
+    other = ResultStore(disk_dir=str(disk))
+    assert other.get("../outside") is None
+    assert "../outside" not in other
+
+
+def test_disk_tier_is_shared_and_trimmed(tmp_path):
+    store = ResultStore(disk_dir=str(tmp_path), disk_max_bytes=10**9)
+    store.put("res_0000000000000001", _frame())
+    one_file = (tmp_path / "res_0000000000000001.arrow").stat().st_size
+
+    assert ResultStore(disk_dir=str(tmp_path)).get("res_0000000000000001") is not None
+
+    store.disk_max_bytes = 3 * one_file
+    for i in range(2, 8):
+        store.put(f"res_{i:016x}", _frame())
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.arrow")) <= store.disk_max_bytes
+    assert (tmp_path / "res_0000000000000007.arrow").exists()
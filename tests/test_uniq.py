@@ -0,0 +1,132 @@
+"""`UniqSketch` decodes ClickHouse `uniq` states and reports the cardinality ClickHouse does.
+
+States are built byte for byte in ClickHouse's `UniquesHashSet` wire format
+(skip degree byte, LEB128 hash count, little-endian UInt32 hashes), as
+`hex(toString(uniqMergeStateIf(...)))` returns them.
+"""
+import math
+import struct
+
+import numpy as np
+import pytest
+
+from app.tools.sql.uniq import MAX_SIZE, UniqSketch, int_hash_crc32
+
+
+def _crc32c(data: bytes) -> int:
+    """Bitwise CRC-32C (Castagnoli, reflected), independent of the module's table."""
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ (0x82F63B78 if crc & 1 else 0)
+    return crc ^ 0xFFFFFFFF
+
+
+def _state(skip_degree: int, hashes) -> str:
+    """Return the hex of a serialized `UniquesHashSet`."""
+    size, varint = len(hashes), bytearray()
+    while True:
+        byte = size & 0x7F
+        size >>= 7
+        varint.append(byte | (0x80 if size else 0))
+        if not size:
+            break
+    return (bytes([skip_degree]) + bytes(varint) + struct.pack(f"<{len(hashes)}I", *hashes)).hex().upper()
+
+
+def _clickhouse_size(skip_degree: int, size: int) -> int:
+    """`UniquesHashSet::size()` as ClickHouse computes it."""
+    if skip_degree == 0:
+        return size
+    res = size * (1 << skip_degree) + (int_hash_crc32(size) & ((1 << skip_degree) - 1))
+    p32 = 1 << 32
+    return round(p32 * (math.log(p32) - math.log(p32 - res)))
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        # Published CRC-32C check values (the "123456789" check and RFC 3720 B.4 iSCSI vectors).
+        (b"123456789", 0xE3069283),
+        (bytes(32), 0x8A9136AA),
+        (b"\xff" * 32, 0x62A8AB43),
+        (bytes(range(32)), 0x46DD794E),
+    ],
+)
+def test_crc32c_reference(data, expected):
+    assert _crc32c(data) == expected
+
+
+@pytest.mark.parametrize("value", [0, 1, 2, 127, 65536, 40000, 2**32 + 5, 2**64 - 1])
+def test_int_hash_crc32_is_one_crc32c_step_without_final_xor(value):
+    assert int_hash_crc32(value) == _crc32c(value.to_bytes(8, "little")) ^ 0xFFFFFFFF
+
+
+def test_empty_state():
+    sketch = UniqSketch.from_hex("0000")
+    assert (sketch.skip_degree, sketch.cardinality()) == (0, 0)
+
+
+def test_exact_state_counts_its_hashes():
+    # Hash 0 is a valid member (ClickHouse keeps it in a separate zero cell and serializes it like any other).
+    state = _state(0, [0, 0x12345678, 0xDEADBEEF])
+    assert state == "00030000000078563412EFBEADDE"
+    assert UniqSketch.from_hex(state).cardinality() == 3
+
+
+def test_multibyte_size_varint():
+    hashes = list(range(0, 300 * 4, 4))
+    state = _state(2, hashes)
+    assert state.startswith("02AC02")
+    sketch = UniqSketch.from_hex(state)
+    assert len(sketch.hashes) == 300
+    assert sketch.cardinality() == _clickhouse_size(2, 300)
+
+
+@pytest.mark.parametrize(
+    "skip_degree, size, expected",
+    [
+        # size * 2^skip + (intHashCRC32(size) & (2^skip - 1)), then the 32-bit collision correction.
+        (1, 3, 6 + (int_hash_crc32(3) & 1)),
+        (2, 40000, 160003 + (int_hash_crc32(40000) & 3)),
+        (4, MAX_SIZE, 1048704 + (int_hash_crc32(MAX_SIZE) & 15)),
+    ],
+)
+def test_thinned_state_estimate(skip_degree, size, expected):
+    hashes = [i << skip_degree for i in range(size)]
+    sketch = UniqSketch.from_hex(_state(skip_degree, hashes))
+    assert sketch.cardinality() == expected == _clickhouse_size(skip_degree, size)
+
+
+def test_malformed_states_are_rejected():
+    with pytest.raises(ValueError):
+        UniqSketch.from_hex("")
+    with pytest.raises(ValueError):
+        UniqSketch.from_hex("0080")
+    with pytest.raises(ValueError):
+        UniqSketch.from_hex("000201000000")
+
+
+def test_merge_is_the_union_of_day_states():
+    monday = UniqSketch.from_hex(_state(0, [1, 2, 3]))
+    tuesday = UniqSketch.from_hex(_state(0, [3, 4]))
+    assert UniqSketch.merge([monday, tuesday]).cardinality() == 4
+
+
+def test_merge_thins_to_the_coarser_state():
+    fine = UniqSketch.from_hex(_state(0, [1, 2, 4, 8]))
+    coarse = UniqSketch.from_hex(_state(2, [12, 16]))
+    merged = UniqSketch.merge([fine, coarse])
+    assert merged.skip_degree == 2
+    assert merged.hashes.tolist() == [4, 8, 12, 16]
+
+
+def test_merge_past_max_size_raises_the_skip_degree_and_estimates_the_union():
+    rng = np.random.default_rng(7)
+    hashes = np.unique(rng.integers(0, 2**32, size=150_000, dtype=np.uint64).astype(np.uint32))
+    halves = [UniqSketch(0, np.sort(part)) for part in np.array_split(rng.permutation(hashes), 2)]
+    merged = UniqSketch.merge(halves)
+    assert merged.skip_degree == 2
+    assert len(merged.hashes) <= MAX_SIZE
+    assert abs(merged.cardinality() - len(hashes)) / len(hashes) < 0.02